@@ -0,0 +1,115 @@
+"""執行微基準測試，輸出 JSON 並與基準比較。
+
+用法：python -m bench [--out FILE] [--baseline FILE] [--save-baseline FILE]
+                      [--repeats N] [name ...]
+      micropython -m bench ...（unix port）
+
+在 CPython 上會以 tools/stubs 代替 machine 及 bluetooth 模組。
+與基準比較有退步時，結束代碼為 1。
+"""
+
+import json
+import sys
+
+if sys.implementation.name != "micropython":
+    import tools.cpython
+
+    tools.cpython.install()
+
+import bench.cases
+import bench.runner
+
+
+def _parse_args(argv: list[str]) -> dict:
+    # MicroPython 沒有 argparse
+    args = {
+        "out": None,
+        "baseline": None,
+        "save_baseline": None,
+        "repeats": 50,
+        "names": [],
+    }
+
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+
+        if arg in ("--out", "--baseline", "--save-baseline", "--repeats"):
+            i += 1
+            key = arg[2:].replace("-", "_")
+            args[key] = int(argv[i]) if key == "repeats" else argv[i]
+        else:
+            args["names"].append(arg)
+
+        i += 1
+
+    return args
+
+
+def _platform() -> str:
+    return f"{sys.implementation.name}-{sys.platform}"
+
+
+def _measure(func, inner: int, repeats: int) -> dict:
+    if sys.implementation.name == "micropython":
+        return bench.runner.measure(func, inner=inner, repeats=repeats)
+
+    # CPython 上丟棄 common.logger.write() 等的輸出
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return bench.runner.measure(func, inner=inner, repeats=repeats)
+
+
+def _load_json(path: str) -> dict:
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def _save_json(path: str, data: dict):
+    with open(path, "w") as fp:
+        json.dump(data, fp)
+
+
+def main(argv: list[str]):
+    args = _parse_args(argv)
+
+    results = {}
+    print(f"{'name':<20} {'min_us':>9} {'median_us':>10} {'p99_us':>9} {'alloc':>7}")
+
+    for name, func, inner in bench.cases.load(args["names"]):
+        r = _measure(func, inner, args["repeats"])
+        results[name] = r
+        print(
+            f"{name:<20} {r['min_us']:9.2f} {r['median_us']:10.2f} "
+            f"{r['p99_us']:9.2f} {r['alloc_bytes']:7d}"
+        )
+
+    for name, reason in bench.cases.skipped().items():
+        print(f"{name:<20} skipped ({reason})")
+
+    data = {"platform": _platform(), "results": results}
+
+    if args["out"]:
+        _save_json(args["out"], data)
+
+    if args["save_baseline"]:
+        _save_json(args["save_baseline"], data)
+
+    if args["baseline"]:
+        baseline = _load_json(args["baseline"])
+
+        if baseline["platform"] != data["platform"]:
+            print(f"Baseline is from {baseline['platform']}, not compared")
+            return
+
+        regressions = bench.runner.compare(results, baseline["results"])
+        for line in regressions:
+            print("Regression:", line)
+
+        if regressions:
+            sys.exit(1)
+
+
+main(sys.argv[1:])
@@ -0,0 +1,107 @@
+"""要量測的熱點，每個函數返回 (名稱, 無參數的 callable, inner 次數)"""
+
+# 匯入失敗或建立時發生錯誤的項目，記錄原因後略過
+_skipped = {}
+
+
+def _crc_fill():
+    import ble.e2e
+
+    buf = bytearray(range(20))
+    return lambda: ble.e2e.Crc.fill_crc(buf, 18, 20), 100
+
+
+def _float_to_sfloat():
+    import common.sfloat
+
+    return lambda: common.sfloat.float_to_sfloat(123.45), 100
+
+
+def _sfloat_encode():
+    import common.sfloat
+
+    return lambda: common.sfloat.encode(123.45), 100
+
+
+def _build_read_rsp():
+    import ble.ids.features
+    import config
+
+    features = ble.ids.features.E2EIddFeatures(config.Config())
+    features.buf = memoryview(bytearray(features.buf_size))
+    features.on_registered()
+    buf = features.buf
+
+    return lambda: features._build_read_rsp(buf), 100
+
+
+def _append_adv_packet():
+    import ble.utils
+
+    name = "IDS".encode()
+    return lambda: ble.utils.append_adv_packet(bytearray(), 0x09, name), 100
+
+
+def _logger_write():
+    import common.logger
+
+    return lambda: common.logger.write("bench"), 1
+
+
+def _logger_log():
+    import common.logger
+    import common.logmsg
+
+    def func():
+        common.logger.log(common.logmsg.NOTIFY, 1, 20)
+        common.logger._log_tail = common.logger._log_head
+
+    return func, 100
+
+
+# 未使用的 BLE 事件，只量測 ble.stack._ble_isr 的分派
+_BENCH_EVENT = 0x7F
+
+
+def _ble_isr_dispatch():
+    import ble.stack
+
+    ble.stack.register_irq_handler(lambda event, data: None, (_BENCH_EVENT,))
+    data = (0, 1)
+    return lambda: ble.stack._ble_isr(_BENCH_EVENT, data), 100
+
+
+CASES = (
+    ("crc_fill_20", _crc_fill),
+    ("float_to_sfloat", _float_to_sfloat),
+    ("sfloat_encode", _sfloat_encode),
+    ("features_read_rsp", _build_read_rsp),
+    ("append_adv_packet", _append_adv_packet),
+    ("logger_write", _logger_write),
+    ("logger_log", _logger_log),
+    ("ble_isr_dispatch", _ble_isr_dispatch),
+)
+
+
+def load(names=None) -> list[tuple]:
+    """建立要量測的項目，names 為 None 時包含全部"""
+
+    cases = []
+
+    for name, factory in CASES:
+        if names and name not in names:
+            continue
+
+        try:
+            func, inner = factory()
+        except Exception as e:
+            _skipped[name] = f"{type(e).__name__}: {e}"
+            continue
+
+        cases.append((name, func, inner))
+
+    return cases
+
+
+def skipped() -> dict:
+    return _skipped
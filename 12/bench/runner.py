@@ -0,0 +1,117 @@
+"""微基準測試的計時及記憶體量測，可在 MicroPython unix port 及 CPython 上執行"""
+
+import gc
+import sys
+import time
+
+
+_IS_MICROPYTHON = sys.implementation.name == "micropython"
+
+if not _IS_MICROPYTHON:
+    import tracemalloc
+
+
+if _IS_MICROPYTHON:
+
+    def _now() -> int:
+        return time.ticks_us()
+
+    def _elapsed_us(start: int, end: int) -> float:
+        return time.ticks_diff(end, start)
+
+    def _alloc_begin() -> int:
+        # 停用 GC，以 gc.mem_alloc() 的差值作為配置的記憶體
+        gc.collect()
+        gc.disable()
+        return gc.mem_alloc()
+
+    def _alloc_end(start: int) -> int:
+        used = gc.mem_alloc() - start
+        gc.enable()
+        return used
+
+else:
+
+    def _now() -> int:
+        return time.perf_counter_ns()
+
+    def _elapsed_us(start: int, end: int) -> float:
+        return (end - start) / 1000
+
+    def _alloc_begin() -> int:
+        # tracemalloc 的峰值包含已釋放的暫時物件
+        gc.collect()
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def _alloc_end(start: int) -> int:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak - start
+
+
+def _percentile(samples: list, ratio: float):
+    return samples[min(len(samples) - 1, int(len(samples) * ratio))]
+
+
+def measure(func, *, inner: int = 1, warmup: int = 5, repeats: int = 50) -> dict:
+    """執行 func() 多次，返回每次呼叫的時間 (µs) 統計及配置的記憶體 (bytes)。
+
+    每個樣本連續呼叫 inner 次再平均，以降低計時器解析度的影響。"""
+
+    for _ in range(warmup):
+        func()
+
+    samples = []
+
+    for _ in range(repeats):
+        start = _now()
+        for _ in range(inner):
+            func()
+
+        samples.append(_elapsed_us(start, _now()) / inner)
+
+    samples.sort()
+
+    # 單獨量測一次呼叫配置的記憶體，避免計時受到影響
+    start = _alloc_begin()
+    func()
+    alloc = _alloc_end(start)
+
+    return {
+        "min_us": samples[0],
+        "median_us": _percentile(samples, 0.5),
+        "p99_us": _percentile(samples, 0.99),
+        "alloc_bytes": alloc,
+        "repeats": repeats,
+        "inner": inner,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """與基準比較，返回退步的項目。
+
+    中位數時間超過基準 tolerance 比例，或配置的記憶體增加時視為退步。
+    不同平台的結果不能比較，只比較相同名稱的項目。"""
+
+    regressions = []
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if result["median_us"] > base["median_us"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: median {result['median_us']:.2f} us "
+                f"(baseline {base['median_us']:.2f} us)"
+            )
+
+        if result["alloc_bytes"] > base["alloc_bytes"]:
+            regressions.append(
+                f"{name}: alloc {result['alloc_bytes']} bytes "
+                f"(baseline {base['alloc_bytes']} bytes)"
+            )
+
+    return regressions
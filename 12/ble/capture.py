@@ -0,0 +1,198 @@
+# MicroPython modules
+import asyncio
+import micropython
+import struct
+import time
+
+# Custom modules
+import ble.stack
+
+
+# ATT PDU 的 opcode
+ATT_READ_REQ = micropython.const(0x0A)
+ATT_READ_RSP = micropython.const(0x0B)
+ATT_WRITE_REQ = micropython.const(0x12)
+ATT_NOTIFY = micropython.const(0x1B)
+ATT_INDICATE = micropython.const(0x1D)
+
+# btsnoop 檔案格式，datalink 為 HCI UART (H4)
+_BTSNOOP_HEADER = b"btsnoop\x00\x00\x00\x00\x01\x00\x00\x03\xea"
+_RECORD_HEADER_SIZE = micropython.const(24)
+
+# H4 packet type (1) + ACL header (4) + L2CAP header (4) + ATT opcode (1)
+_PDU_HEADER_SIZE = micropython.const(10)
+_HCI_H4_ACL = micropython.const(0x02)
+_ACL_PB_FIRST_FLUSHABLE = micropython.const(0x2000)
+_L2CAP_CID_ATT = micropython.const(0x0004)
+
+# 記錄的方向
+_FLAG_SENT = micropython.const(0)
+_FLAG_RECEIVED = micropython.const(1)
+
+# btsnoop 的時間為西元 0 年起的微秒數，此為 1970-01-01 的值
+_BTSNOOP_EPOCH_1970_US = micropython.const(0x00DCDDB30F2F8000)
+_SECONDS_1970_TO_2000 = micropython.const(946_684_800)
+
+
+class Capture:
+    """將 GATT 流量以 btsnoop 格式記錄到 RAM ring，可存檔後以 Wireshark 開啟。
+
+    每筆記錄佔用固定大小的欄位，超過 snaplen 的 ATT 資料會被截斷；
+    ring 滿了時會覆蓋最舊的記錄。兩筆記錄的間隔不可超過 time.ticks_us()
+    循環週期的一半（約 9 分鐘），否則時間會不正確。"""
+
+    def __init__(self, slots: int = 64, snaplen: int = 64):
+        self._slots = slots
+        self._snaplen = snaplen
+        self._slot_size = _RECORD_HEADER_SIZE + _PDU_HEADER_SIZE + 2 + snaplen
+        self._buf = bytearray(slots * self._slot_size)
+        self._mv = memoryview(self._buf)
+
+        # 已記錄及已輸出的總筆數
+        self._count = 0
+        self._drained = 0
+        self._drops = 0
+
+        # 最近一筆記錄的 btsnoop 時間，big-endian 64 位元
+        self._now = bytearray(struct.pack(">Q", _start_time_us()))
+        self._last_ticks = time.ticks_us()
+
+    def record(
+        self,
+        opcode: int,
+        conn_handle: int,
+        value_handle: int | None,
+        data: bytes | bytearray | memoryview | None,
+        received: bool = False,
+    ):
+        """記錄一個 ATT PDU，value_handle 為 None 代表 PDU 中沒有 handle"""
+
+        self._tick()
+
+        data_len = 0 if data is None else len(data)
+        incl_len = min(data_len, self._snaplen)
+        handle_len = 0 if value_handle is None else 2
+        att_len = 1 + handle_len + data_len
+
+        offset = (self._count % self._slots) * self._slot_size
+        buf = self._buf
+
+        if self._count - self._drained >= self._slots:
+            self._drained += 1
+            self._drops += 1
+
+        struct.pack_into(
+            ">IIII",
+            buf,
+            offset,
+            _PDU_HEADER_SIZE - 1 + att_len,
+            _PDU_HEADER_SIZE + handle_len + incl_len,
+            _FLAG_RECEIVED if received else _FLAG_SENT,
+            self._drops,
+        )
+
+        now = self._now
+        for i in range(8):
+            buf[offset + 16 + i] = now[i]
+
+        offset += _RECORD_HEADER_SIZE
+        struct.pack_into(
+            "<BHHHHB",
+            buf,
+            offset,
+            _HCI_H4_ACL,
+            (conn_handle & 0x0FFF) | _ACL_PB_FIRST_FLUSHABLE,
+            att_len + 4,
+            att_len,
+            _L2CAP_CID_ATT,
+            opcode,
+        )
+        offset += _PDU_HEADER_SIZE
+
+        if value_handle is not None:
+            struct.pack_into("<H", buf, offset, value_handle)
+            offset += 2
+
+        if incl_len == data_len:
+            if data_len:
+                self._mv[offset : offset + incl_len] = data
+        else:
+            for i in range(incl_len):
+                buf[offset + i] = data[i]
+
+        self._count += 1
+
+    def _tick(self):
+        # 將經過的微秒數加到 big-endian 的 self._now，避免產生大整數
+        ticks = time.ticks_us()
+        us = time.ticks_diff(ticks, self._last_ticks)
+        self._last_ticks = ticks
+
+        now = self._now
+        i = 7
+        while us and i >= 0:
+            us += now[i]
+            now[i] = us & 0xFF
+            us >>= 8
+            i -= 1
+
+    def _record_len(self, offset: int) -> int:
+        return _RECORD_HEADER_SIZE + struct.unpack_from(">I", self._buf, offset + 4)[0]
+
+    def drain(self, fp) -> int:
+        """將尚未輸出的記錄寫入 fp，返回寫入的筆數。不可在 ISR 內呼叫。"""
+
+        n = 0
+
+        while self._drained < self._count:
+            offset = (self._drained % self._slots) * self._slot_size
+            fp.write(self._mv[offset : offset + self._record_len(offset)])
+            self._drained += 1
+            n += 1
+
+        return n
+
+    def save(self, path: str):
+        """將 ring 中所有記錄存為 btsnoop 檔"""
+
+        with open(path, "wb") as fp:
+            fp.write(_BTSNOOP_HEADER)
+
+            first = max(0, self._count - self._slots)
+            for i in range(first, self._count):
+                offset = (i % self._slots) * self._slot_size
+                fp.write(self._mv[offset : offset + self._record_len(offset)])
+
+    async def run(self, path: str, interval_ms: int = 1000):
+        """定期將新記錄附加到 btsnoop 檔的 asyncio task"""
+
+        with open(path, "wb") as fp:
+            fp.write(_BTSNOOP_HEADER)
+
+            while True:
+                if self.drain(fp):
+                    fp.flush()
+
+                await asyncio.sleep_ms(interval_ms)
+
+
+def _start_time_us() -> int:
+    seconds = int(time.time())
+
+    # MicroPython 部分 port 的 epoch 為 2000-01-01
+    if time.gmtime(0)[0] == 2000:
+        seconds += _SECONDS_1970_TO_2000
+
+    return _BTSNOOP_EPOCH_1970_US + seconds * 1_000_000
+
+
+def start(slots: int = 64, snaplen: int = 64) -> Capture:
+    """開始記錄 GATT 流量"""
+
+    capture = Capture(slots, snaplen)
+    ble.stack.set_capture(capture)
+    return capture
+
+
+def stop():
+    ble.stack.set_capture(None)
@@ -0,0 +1,103 @@
+# MicroPython modules
+import micropython
+
+# Custom modules
+import ble.ids.controlpoint
+import ble.ids.state
+import common.utils
+
+
+# IDD Command Control Point 的 Op Code
+_OP_RESPONSE_CODE = micropython.const(0x0F55)
+_OP_SET_THERAPY_CONTROL_STATE = micropython.const(0x0F5A)
+_OP_SET_FLIGHT_MODE = micropython.const(0x0F66)
+_OP_SNOOZE_ANNUNCIATION = micropython.const(0x0F69)
+_OP_SNOOZE_ANNUNCIATION_RESPONSE = micropython.const(0x0F96)
+_OP_CONFIRM_ANNUNCIATION = micropython.const(0x0F99)
+_OP_CONFIRM_ANNUNCIATION_RESPONSE = micropython.const(0x0FA5)
+
+# Op Code (2) + Annunciation Instance ID (2) 或 Response Code (3)
+_MAX_RSP_SIZE = micropython.const(5)
+
+
+class IddCommandCp(ble.ids.controlpoint.ControlPoint):
+    """IDD Command Control Point，依要求修改 state"""
+
+    rsp_code_opcode = _OP_RESPONSE_CODE
+
+    def __init__(self, state: ble.ids.state.IddState):
+        ble.ids.controlpoint.ControlPoint.__init__(self, 0x2B25, _MAX_RSP_SIZE)
+
+        self._state = state
+
+        self._add_handler(
+            _OP_SET_THERAPY_CONTROL_STATE, 1, self._set_therapy_control_state
+        )
+        self._add_handler(_OP_SET_FLIGHT_MODE, 0, self._set_flight_mode)
+        self._add_handler(_OP_SNOOZE_ANNUNCIATION, 2, self._snooze_annunciation)
+        self._add_handler(_OP_CONFIRM_ANNUNCIATION, 2, self._confirm_annunciation)
+
+    def _set_therapy_control_state(self, data: memoryview) -> int:
+        therapy_control_state = data[2]
+
+        if therapy_control_state not in (
+            ble.ids.state.THERAPY_STOP,
+            ble.ids.state.THERAPY_PAUSE,
+            ble.ids.state.THERAPY_RUN,
+        ):
+            return self._build_rsp_code(
+                _OP_SET_THERAPY_CONTROL_STATE,
+                ble.ids.controlpoint.RSP_PARAMETER_OUT_OF_RANGE,
+            )
+
+        self._state.therapy_control_state = therapy_control_state
+        return self._build_rsp_code(
+            _OP_SET_THERAPY_CONTROL_STATE, ble.ids.controlpoint.RSP_SUCCESS
+        )
+
+    def _set_flight_mode(self, data: memoryview) -> int:
+        self._state.flight_mode = True
+        return self._build_rsp_code(
+            _OP_SET_FLIGHT_MODE, ble.ids.controlpoint.RSP_SUCCESS
+        )
+
+    def _check_annunciation(self, opcode: int, data: memoryview) -> int:
+        """Annunciation Instance ID 不符時返回 Response Code 的長度，否則返回 0"""
+
+        annunciation_id = common.utils.read_uint16(data, 2)
+        if annunciation_id == 0 or annunciation_id != self._state.annunciation_id:
+            return self._build_rsp_code(
+                opcode, ble.ids.controlpoint.RSP_PARAMETER_OUT_OF_RANGE
+            )
+
+        return 0
+
+    def _build_annunciation_rsp(self, rsp_opcode: int) -> int:
+        buf = self._rsp_buf
+        common.utils.write_uint16(buf, 0, rsp_opcode)
+        common.utils.write_uint16(buf, 2, self._state.annunciation_id)
+        return 4
+
+    def _snooze_annunciation(self, data: memoryview) -> int:
+        n = self._check_annunciation(_OP_SNOOZE_ANNUNCIATION, data)
+        if n:
+            return n
+
+        self._state.annunciation_snoozed = True
+        return self._build_annunciation_rsp(_OP_SNOOZE_ANNUNCIATION_RESPONSE)
+
+    def _confirm_annunciation(self, data: memoryview) -> int:
+        n = self._check_annunciation(_OP_CONFIRM_ANNUNCIATION, data)
+        if n:
+            return n
+
+        rsp_len = self._build_annunciation_rsp(_OP_CONFIRM_ANNUNCIATION_RESPONSE)
+        self._state.annunciation_id = 0
+        self._state.annunciation_snoozed = False
+        return rsp_len
+
+
+class E2EIddCommandCp(ble.ids.controlpoint.E2EControlPointMixin, IddCommandCp):
+    def __init__(self, state: ble.ids.state.IddState):
+        ble.ids.controlpoint.E2EControlPointMixin.__init__(self)
+        IddCommandCp.__init__(self, state)
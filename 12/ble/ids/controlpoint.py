@@ -0,0 +1,108 @@
+# MicroPython modules
+import micropython
+
+# Custom modules
+import ble.mixin
+import ble.stack
+import ble.txqueue
+import common.logger
+import common.logmsg
+import common.utils
+
+
+# IDD Status Reader / Command Control Point 共用的 Response Code
+RSP_SUCCESS = micropython.const(0x0F)
+RSP_OP_CODE_NOT_SUPPORTED = micropython.const(0x70)
+RSP_INVALID_OPERAND = micropython.const(0x71)
+RSP_PROCEDURE_NOT_COMPLETED = micropython.const(0x72)
+RSP_PARAMETER_OUT_OF_RANGE = micropython.const(0x73)
+RSP_PROCEDURE_NOT_APPLICABLE = micropython.const(0x74)
+
+# Op Code (2)
+OPCODE_SIZE = micropython.const(2)
+
+# E2E-Counter (1) + E2E-CRC (2)
+_E2E_SIZE = micropython.const(3)
+
+
+class ControlPoint(ble.mixin.WriteMixin, ble.mixin.TxMixin, ble.stack.Characteristic):
+    """以 Op Code 查表分派的 Control Point。
+
+    子類別以 _add_handler() 登記每個 Op Code 的處理函式及 Operand 長度。
+    處理函式在 ISR 中執行，直接讀取寫入的 memoryview，將回覆寫入
+    預先配置的 _rsp_buf 並返回回覆長度，再以 indication 送出。
+    每種回覆長度的切片也已預先建立，處理要求時不需配置記憶體。"""
+
+    # 子類別設定 Response Code 的 Op Code
+    rsp_code_opcode = 0
+
+    def __init__(self, uuid: int, max_rsp_size: int):
+        ble.stack.Characteristic.__init__(self, uuid, write=True, indicate=True)
+
+        self._rsp_buf = bytearray(max_rsp_size + _E2E_SIZE)
+        rsp_mv = memoryview(self._rsp_buf)
+        self._rsp_mv = rsp_mv
+        self._rsp_views = [rsp_mv[:n] for n in range(len(self._rsp_buf) + 1)]
+
+        # Op Code -> (處理函式, Operand 長度)
+        self._handlers = {}
+
+    def _add_handler(self, opcode: int, operand_len: int, handler):
+        """handler(data) 返回寫入 _rsp_buf 的回覆長度"""
+        self._handlers[opcode] = (handler, operand_len)
+
+    def _handle_write(self, conn_handle: int, data: memoryview):
+        self._dispatch(conn_handle, data, len(data))
+
+    def _dispatch(self, conn_handle: int, data: memoryview, n: int):
+        """處理 data[:n] 中的要求，n 不含 E2E 欄位"""
+
+        if n < OPCODE_SIZE:
+            return
+
+        opcode = common.utils.read_uint16(data, 0)
+        entry = self._handlers.get(opcode)
+
+        if entry is None:
+            rsp_len = self._build_rsp_code(opcode, RSP_OP_CODE_NOT_SUPPORTED)
+        elif n - OPCODE_SIZE != entry[1]:
+            rsp_len = self._build_rsp_code(opcode, RSP_INVALID_OPERAND)
+        else:
+            rsp_len = entry[0](data)
+
+            # 回覆不分段，超過協商後的 MTU 時改回覆 Procedure Not Completed
+            max_payload = ble.stack.get_max_payload(conn_handle)
+            if rsp_len + self._e2e_size > max_payload:
+                common.logger.log(
+                    common.logmsg.TOO_LONG,
+                    self.value_handle,
+                    rsp_len + self._e2e_size,
+                    max_payload,
+                )
+                rsp_len = self._build_rsp_code(opcode, RSP_PROCEDURE_NOT_COMPLETED)
+
+        self._respond(conn_handle, rsp_len)
+
+    def _build_rsp_code(self, request_opcode: int, rsp_code: int) -> int:
+        buf = self._rsp_buf
+        common.utils.write_uint16(buf, 0, self.rsp_code_opcode)
+        common.utils.write_uint16(buf, 2, request_opcode)
+        buf[4] = rsp_code
+        return 5
+
+    def _respond(self, conn_handle: int, n: int):
+        # 在 ISR 中送出回覆，佇列已滿時放棄
+        queue = ble.txqueue.get(conn_handle)
+        if queue is not None:
+            n = self._append_e2e(self._rsp_mv, n)
+            queue.indicate(self.value_handle, self._rsp_views[n])
+
+
+class E2EControlPointMixin(ble.mixin.E2ERxMixin, ble.mixin.E2ETxMixin):
+    def __init__(self):
+        ble.mixin.E2ERxMixin.__init__(self)
+        ble.mixin.E2ETxMixin.__init__(self)
+
+    def _handle_e2e_write(self, conn_handle: int, data: memoryview, n: int):
+        # E2E 欄位已檢查過，直接以長度排除，不需切片
+        self._dispatch(conn_handle, data, n)
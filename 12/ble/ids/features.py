@@ -1,3 +1,6 @@
+# MicroPython modules
+import array
+
 # Custom modules
 import ble.e2e
 import ble.mixin
@@ -8,31 +11,63 @@ import config
 
 
 class IddFeatures(ble.mixin.ReadMixin, ble.stack.Characteristic):
+    buf_size = 8
+
     def __init__(self, config: config.Config):
         ble.stack.Characteristic.__init__(self, 0x2B23, read=True)
 
         self._config = config
+        self._is_rsp_valid = False
+
+    def on_registered(self):
+        self._build_read_rsp(self.buf)
+
+    def invalidate(self):
+        """設定改變時呼叫，下次讀取時重建回覆資料"""
+        self._is_rsp_valid = False
 
     def _build_read_rsp(self, buf: memoryview) -> int:
+        # 回覆資料只與設定有關，buffer 為本物件專用，只需建立一次
+        if not self._is_rsp_valid:
+            self._build_rsp_body(buf)
+            self._is_rsp_valid = True
+
+        return 8
+
+    def _build_rsp_body(self, buf: memoryview):
         buf[0] = 0xFF  # Low byte of E2E-CRC
         buf[1] = 0xFF  # High byte of E2E-CRC
         buf[2] = 0x00  # E2E-Counter
 
-        t = common.sfloat.float_to_sfloat(self._config.idd_features_insulin_conc)
+        t = common.sfloat.encode(self._config.idd_features_insulin_conc)
         common.utils.write_uint16(buf, 3, t)
 
         common.utils.write_uint24(buf, 5, self._config.idd_features_flags)
 
-        return 8
-
 
 class E2EIddFeatures(ble.mixin.E2ETxMixin, IddFeatures):
     def __init__(self, config: config.Config):
         ble.mixin.E2ETxMixin.__init__(self)
         IddFeatures.__init__(self, config)
 
+        # 以 E2E-Counter 為索引的 E2E-CRC
+        self._crcs = array.array("H", range(256))
+
+    def _build_rsp_body(self, buf: memoryview):
+        super()._build_rsp_body(buf)
+
+        # 預先計算每個 E2E-Counter 值的 CRC，讀取時只需查表
+        for counter in range(256):
+            buf[2] = counter
+            ble.e2e.Crc.fill_crc(buf, 0, 8)
+            self._crcs[counter] = buf[0] | (buf[1] << 8)
+
     def _build_read_rsp(self, buf: memoryview) -> int:
         data_len = super()._build_read_rsp(buf)
-        buf[2] = self._tx_counter.value
-        ble.e2e.Crc.fill_crc(buf, 0, data_len)
+
+        counter = self._tx_counter.value
+        crc = self._crcs[counter]
+        buf[0] = crc & 0xFF
+        buf[1] = crc >> 8
+        buf[2] = counter
         return data_len
@@ -0,0 +1,61 @@
+# MicroPython modules
+import micropython
+
+# Custom modules
+import ble.mixin
+import ble.stack
+import ble.txqueue
+import common.logger
+import common.logmsg
+
+
+# IDD History Data 的 Event Type (2) + Sequence Number (4) + Relative Offset (2)
+HISTORY_HEADER_SIZE = 8
+
+# IddHistoryData.send() 的結果
+SEND_OK = micropython.const(0)
+SEND_DISCONNECTED = micropython.const(1)
+SEND_TOO_LONG = micropython.const(2)
+
+
+class IddHistoryData(ble.mixin.TxMixin, ble.stack.Characteristic):
+    def __init__(self, max_record_size: int):
+        ble.stack.Characteristic.__init__(self, 0x2B28, notify=True)
+
+        # 記錄及 E2E 欄位
+        self._buf = bytearray(max_record_size + 3)
+        self._mv = memoryview(self._buf)
+
+    async def send(self, queue: ble.txqueue.TxQueue, history, i: int) -> int:
+        """以 notification 送出 index 中第 i 筆記錄，返回 SEND_* 之一"""
+
+        n = history.read(history.index.offset_at(i), self._mv)
+        if n == 0:
+            # 毀損的記錄，略過
+            return SEND_OK
+
+        # IDS 的記錄不分段，每筆需放得進一個 notification，
+        # 超過協商後的 MTU 時不送出，由 RACP 回覆 Procedure Not Completed
+        conn_handle = queue.conn_handle
+        if conn_handle is not None:
+            max_payload = ble.stack.get_max_payload(conn_handle)
+            if n + self._e2e_size > max_payload:
+                common.logger.log(
+                    common.logmsg.TOO_LONG,
+                    self.value_handle,
+                    n + self._e2e_size,
+                    max_payload,
+                )
+                return SEND_TOO_LONG
+
+        n = self._append_e2e(self._mv, n)
+        if await queue.put_notify(self.value_handle, self._mv[:n]):
+            return SEND_OK
+
+        return SEND_DISCONNECTED
+
+
+class E2EIddHistoryData(ble.mixin.E2ETxMixin, IddHistoryData):
+    def __init__(self, max_record_size: int):
+        ble.mixin.E2ETxMixin.__init__(self)
+        IddHistoryData.__init__(self, max_record_size)
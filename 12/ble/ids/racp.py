@@ -0,0 +1,306 @@
+# MicroPython modules
+import asyncio
+import micropython
+
+# Custom modules
+import ble.ids.history
+import ble.mixin
+import ble.stack
+import ble.txqueue
+import common.utils
+
+
+# IDD Record Access Control Point 的 Op Code
+_OP_REPORT_STORED_RECORDS = micropython.const(0x33)
+_OP_DELETE_STORED_RECORDS = micropython.const(0x3C)
+_OP_ABORT_OPERATION = micropython.const(0x55)
+_OP_REPORT_NUMBER_OF_STORED_RECORDS = micropython.const(0x5A)
+_OP_NUMBER_OF_STORED_RECORDS_RESPONSE = micropython.const(0x66)
+_OP_RESPONSE_CODE = micropython.const(0x0F)
+
+# Operator
+_OPERATOR_NULL = micropython.const(0x0F)
+_OPERATOR_ALL = micropython.const(0x33)
+_OPERATOR_LESS_OR_EQUAL = micropython.const(0x3C)
+_OPERATOR_GREATER_OR_EQUAL = micropython.const(0x55)
+_OPERATOR_WITHIN_RANGE = micropython.const(0x5A)
+_OPERATOR_FIRST = micropython.const(0x66)
+_OPERATOR_LAST = micropython.const(0x69)
+
+# Filter Type
+_FILTER_SEQUENCE_NUMBER = micropython.const(0x0F)
+
+# Response Code
+_RSP_SUCCESS = micropython.const(0xF0)
+_RSP_OP_CODE_NOT_SUPPORTED = micropython.const(0x0F)
+_RSP_INVALID_OPERATOR = micropython.const(0x33)
+_RSP_OPERATOR_NOT_SUPPORTED = micropython.const(0x3C)
+_RSP_INVALID_OPERAND = micropython.const(0x55)
+_RSP_NO_RECORDS_FOUND = micropython.const(0x5A)
+_RSP_PROCEDURE_NOT_COMPLETED = micropython.const(0x69)
+_RSP_OPERAND_NOT_SUPPORTED = micropython.const(0x96)
+
+# 計算記錄數時，每讀取這麼多筆讓出一次執行權
+_COUNT_BATCH = micropython.const(32)
+
+# Op Code (1) + Operator (1) + Operand 最多 5 bytes + E2E (3)
+_RSP_BUF_SIZE = micropython.const(10)
+
+
+class IddRacp(ble.mixin.WriteMixin, ble.mixin.TxMixin, ble.stack.Characteristic):
+    """IDD Record Access Control Point。
+
+    寫入時只檢查格式並記下要求，由 run() 以 history.index
+    換算出序號範圍，再經由 IDD History Data 送出記錄。"""
+
+    def __init__(self, history, history_data: ble.ids.history.IddHistoryData):
+        ble.stack.Characteristic.__init__(self, 0x2B27, write=True, indicate=True)
+
+        self._history = history
+        self._history_data = history_data
+
+        self._rsp_buf = bytearray(_RSP_BUF_SIZE)
+        self._rsp_mv = memoryview(self._rsp_buf)
+
+        # 在 ISR 中回覆錯誤時使用，避免覆蓋 run() 尚未送出的回覆
+        self._isr_rsp_buf = bytearray(_RSP_BUF_SIZE)
+        self._isr_rsp_mv = memoryview(self._isr_rsp_buf)
+
+        # 目前的要求
+        self._busy = False
+        self._abort = False
+        self._conn_handle = 0
+        self._opcode = 0
+        self._operator = 0
+        self._min_seq = 0
+        self._max_seq = 0
+        self._request = asyncio.ThreadSafeFlag()
+
+    def _handle_write(self, conn_handle: int, data: memoryview):
+        if len(data) < 2:
+            return
+
+        opcode = data[0]
+        operator = data[1]
+
+        # 開機後 history 尚未開啟前，記錄數量及序號都不正確
+        busy = self._busy or not self._history.is_open
+        if busy and opcode != _OP_ABORT_OPERATION:
+            self._respond_now(conn_handle, opcode, _RSP_PROCEDURE_NOT_COMPLETED)
+            return
+
+        rsp = self._parse_request(opcode, operator, data)
+        if rsp != _RSP_SUCCESS:
+            self._respond_now(conn_handle, opcode, rsp)
+            return
+
+        if self._busy:
+            # 中止目前的程序，由 run() 停止後回覆
+            self._abort = True
+            return
+
+        self._busy = True
+        self._conn_handle = conn_handle
+        self._opcode = opcode
+        self._operator = operator
+        self._request.set()
+
+    def _parse_request(self, opcode: int, operator: int, data: memoryview) -> int:
+        """檢查要求的格式，並取出序號範圍，返回 Response Code"""
+
+        if opcode == _OP_ABORT_OPERATION:
+            return _RSP_SUCCESS if operator == _OPERATOR_NULL else _RSP_INVALID_OPERATOR
+
+        if opcode not in (
+            _OP_REPORT_STORED_RECORDS,
+            _OP_DELETE_STORED_RECORDS,
+            _OP_REPORT_NUMBER_OF_STORED_RECORDS,
+        ):
+            return _RSP_OP_CODE_NOT_SUPPORTED
+
+        if operator in (_OPERATOR_ALL, _OPERATOR_FIRST, _OPERATOR_LAST):
+            return _RSP_SUCCESS if len(data) == 2 else _RSP_INVALID_OPERAND
+
+        if operator in (
+            _OPERATOR_LESS_OR_EQUAL,
+            _OPERATOR_GREATER_OR_EQUAL,
+            _OPERATOR_WITHIN_RANGE,
+        ):
+            if len(data) < 3:
+                return _RSP_INVALID_OPERAND
+
+            if data[2] != _FILTER_SEQUENCE_NUMBER:
+                return _RSP_OPERAND_NOT_SUPPORTED
+
+            expected_len = 11 if operator == _OPERATOR_WITHIN_RANGE else 7
+            if len(data) != expected_len:
+                return _RSP_INVALID_OPERAND
+
+            self._min_seq = common.utils.read_uint32(data, 3)
+            self._max_seq = self._min_seq
+
+            if operator == _OPERATOR_WITHIN_RANGE:
+                self._max_seq = common.utils.read_uint32(data, 7)
+                if self._min_seq > self._max_seq:
+                    return _RSP_INVALID_OPERAND
+
+            return _RSP_SUCCESS
+
+        if operator == _OPERATOR_NULL:
+            return _RSP_INVALID_OPERATOR
+
+        return _RSP_OPERATOR_NOT_SUPPORTED
+
+    def _find_range(self) -> tuple[int, int]:
+        """找出符合要求的記錄在 index 中的範圍 [lo, hi)，其中可能有毀損的欄位"""
+
+        index = self._history.index
+        n = len(index)
+        operator = self._operator
+
+        if operator == _OPERATOR_ALL:
+            return 0, n
+
+        elif operator == _OPERATOR_LESS_OR_EQUAL:
+            return 0, index.upper_bound(self._min_seq)
+
+        elif operator == _OPERATOR_GREATER_OR_EQUAL:
+            return index.lower_bound(self._min_seq), n
+
+        elif operator == _OPERATOR_WITHIN_RANGE:
+            return index.lower_bound(self._min_seq), index.upper_bound(self._max_seq)
+
+        elif operator == _OPERATOR_FIRST:
+            return 0, min(n, 1)
+
+        else:
+            return max(n - 1, 0), n
+
+    async def run(self):
+        """處理 RACP 要求的 asyncio task"""
+
+        while True:
+            await self._request.wait()
+
+            queue = ble.txqueue.get(self._conn_handle)
+            if queue is not None:
+                try:
+                    await self._run_request(queue)
+
+                    # 送出最後的回覆時才收到的 Abort Operation，也要回覆
+                    while self._abort:
+                        self._abort = False
+                        await self._respond(queue, _OP_ABORT_OPERATION, _RSP_SUCCESS)
+                finally:
+                    # 先清除 _busy，之後收到的 Abort Operation 會當作新的要求
+                    self._busy = False
+                    self._abort = False
+            else:
+                self._busy = False
+                self._abort = False
+
+    async def _run_request(self, queue: ble.txqueue.TxQueue):
+        opcode = self._opcode
+
+        if opcode == _OP_ABORT_OPERATION:
+            await self._respond(queue, opcode, _RSP_SUCCESS)
+            return
+
+        lo, hi = self._find_range()
+
+        if opcode == _OP_REPORT_NUMBER_OF_STORED_RECORDS:
+            count = await self._count_records(lo, hi)
+            if count < 0:
+                # 以 Abort Operation 的回覆取代原本要求的回覆
+                await self._respond(queue, _OP_ABORT_OPERATION, _RSP_SUCCESS)
+                return
+
+            buf = self._rsp_buf
+            buf[0] = _OP_NUMBER_OF_STORED_RECORDS_RESPONSE
+            buf[1] = _OPERATOR_NULL
+            common.utils.write_uint32(buf, 2, count)
+            await self._indicate(queue, 6)
+            return
+
+        if lo >= hi:
+            await self._respond(queue, opcode, _RSP_NO_RECORDS_FOUND)
+            return
+
+        if opcode == _OP_DELETE_STORED_RECORDS:
+            # 只能刪除最舊的連續記錄
+            if lo != 0:
+                await self._respond(queue, opcode, _RSP_OPERATOR_NOT_SUPPORTED)
+                return
+
+            self._history.delete(hi)
+            await self._respond(queue, opcode, _RSP_SUCCESS)
+            return
+
+        for i in range(lo, hi):
+            if self._abort:
+                # 以 Abort Operation 的回覆取代原本要求的回覆
+                self._abort = False
+                await self._respond(queue, _OP_ABORT_OPERATION, _RSP_SUCCESS)
+                return
+
+            result = await self._history_data.send(queue, self._history, i)
+            if result == ble.ids.history.SEND_TOO_LONG:
+                # 記錄放不進目前 MTU 的 notification，傳送不完整不能回覆 Success
+                await self._respond(queue, opcode, _RSP_PROCEDURE_NOT_COMPLETED)
+                return
+
+            if result != ble.ids.history.SEND_OK:
+                return
+
+        await self._respond(queue, opcode, _RSP_SUCCESS)
+
+    async def _count_records(self, lo: int, hi: int) -> int:
+        """範圍內 Report Stored Records 實際會送出的記錄數，不含毀損的欄位。
+        需逐筆讀取，每讀取一批就讓出執行權；收到 Abort Operation 時返回 -1"""
+
+        history = self._history
+        index = history.index
+        count = 0
+
+        for i in range(lo, hi):
+            if history.is_valid(index.offset_at(i)):
+                count += 1
+
+            if (i - lo) % _COUNT_BATCH == _COUNT_BATCH - 1:
+                await asyncio.sleep_ms(0)
+
+                if self._abort:
+                    self._abort = False
+                    return -1
+
+        return count
+
+    def _build_rsp_code(self, buf, request_opcode: int, rsp_code: int) -> int:
+        buf[0] = _OP_RESPONSE_CODE
+        buf[1] = _OPERATOR_NULL
+        buf[2] = request_opcode
+        buf[3] = rsp_code
+        return 4
+
+    async def _respond(self, queue: ble.txqueue.TxQueue, request_opcode, rsp_code):
+        n = self._build_rsp_code(self._rsp_buf, request_opcode, rsp_code)
+        await self._indicate(queue, n)
+
+    async def _indicate(self, queue: ble.txqueue.TxQueue, n: int):
+        n = self._append_e2e(self._rsp_mv, n)
+        await queue.put_indicate(self.value_handle, self._rsp_mv[:n])
+
+    def _respond_now(self, conn_handle: int, request_opcode: int, rsp_code: int):
+        # 在 ISR 中回覆錯誤，佇列已滿時放棄
+        queue = ble.txqueue.get(conn_handle)
+        if queue is not None:
+            n = self._build_rsp_code(self._isr_rsp_buf, request_opcode, rsp_code)
+            n = self._append_e2e(self._isr_rsp_mv, n)
+            queue.indicate(self.value_handle, self._isr_rsp_mv[:n])
+
+
+class E2EIddRacp(ble.mixin.E2ERxMixin, ble.mixin.E2ETxMixin, IddRacp):
+    def __init__(self, history, history_data: ble.ids.history.IddHistoryData):
+        ble.mixin.E2ERxMixin.__init__(self)
+        ble.mixin.E2ETxMixin.__init__(self)
+        IddRacp.__init__(self, history, history_data)
@@ -0,0 +1,287 @@
+# MicroPython modules
+import os
+import struct
+
+# Custom modules
+import ble.e2e
+import ble.ids.history
+import common.utils
+
+
+# 每筆記錄的欄位：長度 (1) + 記錄 + E2E-CRC (2)
+_SLOT_OVERHEAD = 3
+
+# 毀損的欄位以此值填滿，讀取時會略過
+_PAD_BYTE = 0xFF
+
+# 記錄已刪除到哪個序號的檔案
+_HEAD_FILE = "head"
+
+
+def _exists(path: str) -> bool:
+    # MicroPython 沒有 os.path.exists()
+    try:
+        os.stat(path)
+        return True
+    except OSError:
+        return False
+
+
+class RingLogIndex:
+    """RingLog 的記錄序號為連續的，第 i 筆的序號即為 first_seq + i，
+    記錄的位置以序號表示。lower_bound() 及 upper_bound() 直接由序號相減得出，
+    不需搜尋。
+
+    毀損的欄位仍佔用序號，所以 len() 及範圍會包含它們；
+    需要實際的記錄數時，以 RingLog.is_valid() 逐筆檢查。"""
+
+    def __init__(self, log: "RingLog"):
+        self._log = log
+
+    def __len__(self) -> int:
+        return self._log.next_seq - self._log.first_seq
+
+    def seq_at(self, i: int) -> int:
+        return self._log.first_seq + i
+
+    def offset_at(self, i: int) -> int:
+        return self._log.first_seq + i
+
+    def lower_bound(self, seq: int) -> int:
+        return min(max(seq - self._log.first_seq, 0), len(self))
+
+    def upper_bound(self, seq: int) -> int:
+        return min(max(seq + 1 - self._log.first_seq, 0), len(self))
+
+
+class RingLog:
+    """存於檔案系統、只會附加的歷史記錄。
+
+    記錄分存於多個區段檔案，檔名為區段第一筆記錄的序號。每筆記錄佔用固定大小的
+    欄位，並帶有自己的 CRC；區段滿了就開新檔，超過 max_segments 個時刪除最舊的
+    區段檔，不會覆寫舊資料。
+
+    open() 時只需列出目錄，並檢查最新區段的最後一筆記錄：寫入到一半的欄位會被填滿
+    成無效欄位，之後的記錄由下一個欄位繼續寫入。讀取時會略過 CRC 錯誤的欄位。
+    建構時不會存取檔案系統，open() 之前記錄為空。"""
+
+    def __init__(
+        self,
+        path: str,
+        max_record_size: int,
+        records_per_segment: int = 256,
+        max_segments: int = 16,
+    ):
+        self.index = RingLogIndex(self)
+        self.first_seq = 0
+        self.next_seq = 0
+
+        # open() 之後才能查詢及讀取記錄
+        self.is_open = False
+
+        self._path = path
+        self._slot_size = max_record_size + _SLOT_OVERHEAD
+        self._records_per_segment = records_per_segment
+        self._max_segments = max_segments
+
+        self._slot = bytearray(self._slot_size)
+        self._slot_mv = memoryview(self._slot)
+
+        # 依序號排序的區段第一筆序號
+        self._segments: list[int] = []
+
+        self._writer = None
+        self._writer_count = 0
+
+        self._reader = None
+        self._reader_segment = -1
+
+    def _segment_path(self, first_seq: int) -> str:
+        return f"{self._path}/{first_seq:08x}.log"
+
+    def open(self):
+        """讀取既有的區段並修復最新區段的結尾"""
+
+        if not _exists(self._path):
+            os.mkdir(self._path)
+
+        self._segments = sorted(
+            int(name[:-4], 16)
+            for name in os.listdir(self._path)
+            if name.endswith(".log")
+        )
+
+        if not self._segments:
+            self.first_seq = self.next_seq = self._read_head()
+            self.is_open = True
+            return
+
+        # 只檢查最新區段的結尾
+        last = self._segments[-1]
+        path = self._segment_path(last)
+        size = os.stat(path)[6]
+        count, remainder = divmod(size, self._slot_size)
+
+        if remainder:
+            # 寫入到一半就斷電，將此欄位補滿成無效欄位
+            with open(path, "ab") as fp:
+                fp.write(bytes([_PAD_BYTE]) * (self._slot_size - remainder))
+            count += 1
+
+        self.next_seq = last + count
+        self.first_seq = max(self._segments[0], self._read_head())
+        self._writer_count = count
+        self.is_open = True
+
+    def _read_head(self) -> int:
+        try:
+            with open(f"{self._path}/{_HEAD_FILE}", "rb") as fp:
+                return struct.unpack("<I", fp.read(4))[0]
+        except OSError:
+            return 0
+
+    def _write_head(self):
+        # 先寫入暫存檔再改名，避免斷電時留下不完整的檔案
+        path = f"{self._path}/{_HEAD_FILE}"
+        with open(path + ".tmp", "wb") as fp:
+            fp.write(struct.pack("<I", self.first_seq))
+
+        os.rename(path + ".tmp", path)
+
+    def _open_writer(self):
+        if self._writer is not None and self._writer_count < self._records_per_segment:
+            return
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if not self._segments or self._writer_count >= self._records_per_segment:
+            self._segments.append(self.next_seq)
+            self._writer_count = 0
+
+            # 刪除最舊的區段
+            while len(self._segments) > self._max_segments:
+                self._remove_segment(self._segments[0])
+
+        self._writer = open(self._segment_path(self._segments[-1]), "ab")
+
+    def _remove_segment(self, first_seq: int):
+        if self._reader_segment == first_seq:
+            self._reader.close()
+            self._reader = None
+            self._reader_segment = -1
+
+        os.remove(self._segment_path(first_seq))
+        self._segments.pop(0)
+
+        if self._segments:
+            self.first_seq = max(self.first_seq, self._segments[0])
+
+    def append(self, event_type: int, relative_offset: int, event_data=b"") -> int:
+        """新增一筆 IDD History Data 格式的記錄，返回其序號"""
+
+        n = ble.ids.history.HISTORY_HEADER_SIZE + len(event_data)
+        if n > self._slot_size - _SLOT_OVERHEAD:
+            raise ValueError("Event data is too long")
+
+        self._open_writer()
+
+        seq = self.next_seq
+        buf = self._slot
+        buf[0] = n
+        common.utils.write_uint16(buf, 1, event_type)
+        common.utils.write_uint32(buf, 3, seq)
+        common.utils.write_uint16(buf, 7, relative_offset)
+        buf[1 + ble.ids.history.HISTORY_HEADER_SIZE : 1 + n] = event_data
+
+        for i in range(1 + n, self._slot_size - 2):
+            buf[i] = _PAD_BYTE
+
+        ble.e2e.Crc.fill_crc(buf, self._slot_size - 2, self._slot_size)
+
+        self._writer.write(buf)
+        self._writer.flush()
+
+        self._writer_count += 1
+        self.next_seq = seq + 1
+        return seq
+
+    def _find_segment(self, seq: int) -> int:
+        # 二分搜尋最後一個第一筆序號 <= seq 的區段
+        segments = self._segments
+        lo = 0
+        hi = len(segments)
+
+        while lo < hi:
+            mid = (lo + hi) >> 1
+            if segments[mid] <= seq:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return segments[lo - 1]
+
+    def read(self, seq: int, buf: memoryview | bytearray) -> int:
+        """將序號為 seq 的記錄複製到 buf，返回記錄長度；欄位無效時返回 0"""
+
+        n = self._read_slot(seq)
+        slot = self._slot
+        for i in range(n):
+            buf[i] = slot[1 + i]
+
+        return n
+
+    def is_valid(self, seq: int) -> bool:
+        """序號為 seq 的欄位是否為完整的記錄"""
+        return self._read_slot(seq) != 0
+
+    def _read_slot(self, seq: int) -> int:
+        """讀取欄位到 _slot 並檢查 CRC，返回記錄長度；欄位無效時返回 0"""
+
+        if not self.first_seq <= seq < self.next_seq:
+            return 0
+
+        segment = self._find_segment(seq)
+
+        if self._reader_segment != segment:
+            if self._reader is not None:
+                self._reader.close()
+
+            self._reader = open(self._segment_path(segment), "rb")
+            self._reader_segment = segment
+
+        if self._writer is not None:
+            self._writer.flush()
+
+        self._reader.seek((seq - segment) * self._slot_size)
+        if self._reader.readinto(self._slot_mv) != self._slot_size:
+            return 0
+
+        slot = self._slot
+        n = slot[0]
+        if n > self._slot_size - _SLOT_OVERHEAD or not ble.e2e.Crc.verify_crc(
+            slot, self._slot_size - 2, self._slot_size
+        ):
+            return 0
+
+        return n
+
+    def delete(self, count: int):
+        """刪除最舊的 count 筆記錄"""
+
+        self.first_seq = min(self.first_seq + count, self.next_seq)
+        self._write_head()
+
+        # 刪除已不含任何記錄的區段，最新的區段仍要保留以繼續寫入
+        while len(self._segments) > 1 and self._segments[1] <= self.first_seq:
+            self._remove_segment(self._segments[0])
+
+    def close(self):
+        for fp in (self._writer, self._reader):
+            if fp is not None:
+                fp.close()
+
+        self._writer = None
+        self._reader = None
+        self._reader_segment = -1
@@ -0,0 +1,75 @@
+# MicroPython modules
+import array
+import micropython
+
+
+# Therapy Control State
+THERAPY_UNDETERMINED = micropython.const(0x0F)
+THERAPY_STOP = micropython.const(0x33)
+THERAPY_PAUSE = micropython.const(0x3C)
+THERAPY_RUN = micropython.const(0x55)
+
+# Counter Type
+COUNTER_LIFETIME = micropython.const(0x0F)
+COUNTER_WARRANTY_TIME = micropython.const(0x33)
+COUNTER_LOANER_TIME = micropython.const(0x3C)
+COUNTER_RESERVOIR_INSULIN_OPERATION_TIME = micropython.const(0x55)
+
+# Counter Value Selection
+COUNTER_REMAINING = micropython.const(0x0F)
+COUNTER_ELAPSED = micropython.const(0x33)
+
+_COUNTER_TYPES = (
+    COUNTER_LIFETIME,
+    COUNTER_WARRANTY_TIME,
+    COUNTER_LOANER_TIME,
+    COUNTER_RESERVOIR_INSULIN_OPERATION_TIME,
+)
+
+
+class IddState:
+    """Status Reader 及 Command Control Point 共用的幫浦狀態。
+
+    胰島素量皆以 0.01 IU 為單位的整數儲存，回覆時再轉為 SFLOAT / FLOAT，
+    不需使用浮點數。"""
+
+    def __init__(self, max_active_boluses: int = 4):
+        self.therapy_control_state = THERAPY_STOP
+        self.flight_mode = False
+
+        # IDD Status Changed 的 Flags
+        self.status_changed = 0
+
+        # 目前的 Annunciation Instance ID，0 表示沒有
+        self.annunciation_id = 0
+        self.annunciation_snoozed = False
+
+        self.active_bolus_ids = array.array("H", (0,) * max_active_boluses)
+        self.active_bolus_count = 0
+
+        self.basal_template_number = 0
+        self.basal_rate = 0  # 0.01 IU/h
+
+        self.total_daily_bolus = 0
+        self.total_daily_basal = 0
+        self.delivered_bolus = 0
+        self.delivered_basal = 0
+        self.insulin_on_board = 0
+
+        # 以 Counter Type << 8 | Value Selection 查詢 _counters 的位置
+        self._counter_index = {}
+        for i, counter_type in enumerate(_COUNTER_TYPES):
+            self._counter_index[counter_type << 8 | COUNTER_REMAINING] = 2 * i
+            self._counter_index[counter_type << 8 | COUNTER_ELAPSED] = 2 * i + 1
+
+        self._counters = array.array("l", (0,) * (2 * len(_COUNTER_TYPES)))
+
+    def counter_index(self, counter_type: int, value_selection: int) -> int:
+        """返回計數器的位置，不支援時返回 -1"""
+        return self._counter_index.get(counter_type << 8 | value_selection, -1)
+
+    def get_counter(self, index: int) -> int:
+        return self._counters[index]
+
+    def set_counter(self, counter_type: int, value_selection: int, value: int):
+        self._counters[self._counter_index[counter_type << 8 | value_selection]] = value
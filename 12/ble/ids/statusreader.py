@@ -0,0 +1,144 @@
+# MicroPython modules
+import micropython
+
+# Custom modules
+import ble.ids.controlpoint
+import ble.ids.state
+import common.sfloat
+import common.utils
+
+
+# IDD Status Reader Control Point 的 Op Code
+_OP_RESPONSE_CODE = micropython.const(0x0303)
+_OP_RESET_STATUS = micropython.const(0x030C)
+_OP_GET_ACTIVE_BOLUS_IDS = micropython.const(0x0330)
+_OP_GET_ACTIVE_BOLUS_IDS_RESPONSE = micropython.const(0x033F)
+_OP_GET_ACTIVE_BASAL_RATE_DELIVERY = micropython.const(0x0365)
+_OP_GET_ACTIVE_BASAL_RATE_DELIVERY_RESPONSE = micropython.const(0x036A)
+_OP_GET_TOTAL_DAILY_INSULIN_STATUS = micropython.const(0x0395)
+_OP_GET_TOTAL_DAILY_INSULIN_STATUS_RESPONSE = micropython.const(0x039A)
+_OP_GET_COUNTER = micropython.const(0x03A6)
+_OP_GET_COUNTER_RESPONSE = micropython.const(0x03A9)
+_OP_GET_DELIVERED_INSULIN = micropython.const(0x03C0)
+_OP_GET_DELIVERED_INSULIN_RESPONSE = micropython.const(0x03CF)
+_OP_GET_INSULIN_ON_BOARD = micropython.const(0x03F3)
+_OP_GET_INSULIN_ON_BOARD_RESPONSE = micropython.const(0x03FC)
+
+# 狀態中的胰島素量以 0.01 IU 為單位
+_INSULIN_EXPONENT = micropython.const(-2)
+
+
+class IddStatusReaderCp(ble.ids.controlpoint.ControlPoint):
+    """IDD Status Reader Control Point，回覆 state 中的幫浦狀態"""
+
+    rsp_code_opcode = _OP_RESPONSE_CODE
+
+    def __init__(self, state: ble.ids.state.IddState):
+        # 最長的回覆為 Get Active Bolus IDs Response
+        max_rsp_size = (
+            ble.ids.controlpoint.OPCODE_SIZE + 1 + 2 * len(state.active_bolus_ids)
+        )
+        ble.ids.controlpoint.ControlPoint.__init__(self, 0x2B24, max(max_rsp_size, 10))
+
+        self._state = state
+
+        self._add_handler(_OP_RESET_STATUS, 2, self._reset_status)
+        self._add_handler(_OP_GET_ACTIVE_BOLUS_IDS, 0, self._get_active_bolus_ids)
+        self._add_handler(
+            _OP_GET_ACTIVE_BASAL_RATE_DELIVERY, 0, self._get_active_basal_rate
+        )
+        self._add_handler(
+            _OP_GET_TOTAL_DAILY_INSULIN_STATUS, 0, self._get_total_daily_insulin
+        )
+        self._add_handler(_OP_GET_COUNTER, 2, self._get_counter)
+        self._add_handler(_OP_GET_DELIVERED_INSULIN, 0, self._get_delivered_insulin)
+        self._add_handler(_OP_GET_INSULIN_ON_BOARD, 0, self._get_insulin_on_board)
+
+    def _write_sfloat(self, index: int, value: int):
+        t = common.sfloat.encode_scaled(value, _INSULIN_EXPONENT)
+        common.utils.write_uint16(self._rsp_buf, index, t)
+
+    def _write_float(self, index: int, value: int):
+        common.sfloat.encode_float_scaled_into(
+            self._rsp_buf, index, value, _INSULIN_EXPONENT
+        )
+
+    def _reset_status(self, data: memoryview) -> int:
+        self._state.status_changed &= ~common.utils.read_uint16(data, 2)
+        return self._build_rsp_code(_OP_RESET_STATUS, ble.ids.controlpoint.RSP_SUCCESS)
+
+    def _get_active_bolus_ids(self, data: memoryview) -> int:
+        state = self._state
+        buf = self._rsp_buf
+        count = state.active_bolus_count
+
+        common.utils.write_uint16(buf, 0, _OP_GET_ACTIVE_BOLUS_IDS_RESPONSE)
+        buf[2] = count
+        for i in range(count):
+            common.utils.write_uint16(buf, 3 + 2 * i, state.active_bolus_ids[i])
+
+        return 3 + 2 * count
+
+    def _get_active_basal_rate(self, data: memoryview) -> int:
+        state = self._state
+        if state.basal_template_number == 0:
+            return self._build_rsp_code(
+                _OP_GET_ACTIVE_BASAL_RATE_DELIVERY,
+                ble.ids.controlpoint.RSP_PROCEDURE_NOT_APPLICABLE,
+            )
+
+        buf = self._rsp_buf
+        common.utils.write_uint16(buf, 0, _OP_GET_ACTIVE_BASAL_RATE_DELIVERY_RESPONSE)
+        buf[2] = 0  # Flags
+        buf[3] = state.basal_template_number
+        self._write_float(4, state.basal_rate)
+        return 8
+
+    def _get_total_daily_insulin(self, data: memoryview) -> int:
+        state = self._state
+        common.utils.write_uint16(
+            self._rsp_buf, 0, _OP_GET_TOTAL_DAILY_INSULIN_STATUS_RESPONSE
+        )
+        self._write_sfloat(2, state.total_daily_bolus)
+        self._write_sfloat(4, state.total_daily_basal)
+        self._write_sfloat(6, state.total_daily_bolus + state.total_daily_basal)
+        return 8
+
+    def _get_counter(self, data: memoryview) -> int:
+        counter_type = data[2]
+        value_selection = data[3]
+
+        index = self._state.counter_index(counter_type, value_selection)
+        if index < 0:
+            return self._build_rsp_code(
+                _OP_GET_COUNTER, ble.ids.controlpoint.RSP_PARAMETER_OUT_OF_RANGE
+            )
+
+        buf = self._rsp_buf
+        common.utils.write_uint16(buf, 0, _OP_GET_COUNTER_RESPONSE)
+        buf[2] = counter_type
+        buf[3] = value_selection
+        common.utils.write_uint32(buf, 4, self._state.get_counter(index))
+        return 8
+
+    def _get_delivered_insulin(self, data: memoryview) -> int:
+        state = self._state
+        common.utils.write_uint16(self._rsp_buf, 0, _OP_GET_DELIVERED_INSULIN_RESPONSE)
+        self._write_float(2, state.delivered_bolus)
+        self._write_float(6, state.delivered_basal)
+        return 10
+
+    def _get_insulin_on_board(self, data: memoryview) -> int:
+        buf = self._rsp_buf
+        common.utils.write_uint16(buf, 0, _OP_GET_INSULIN_ON_BOARD_RESPONSE)
+        buf[2] = 0  # Flags，不含 Remaining Duration
+        self._write_sfloat(3, self._state.insulin_on_board)
+        return 5
+
+
+class E2EIddStatusReaderCp(
+    ble.ids.controlpoint.E2EControlPointMixin, IddStatusReaderCp
+):
+    def __init__(self, state: ble.ids.state.IddState):
+        ble.ids.controlpoint.E2EControlPointMixin.__init__(self)
+        IddStatusReaderCp.__init__(self, state)
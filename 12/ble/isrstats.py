@@ -0,0 +1,67 @@
+# MicroPython modules
+import array
+import micropython
+
+
+# 第 k 個區間為 [2^k, 2^(k+1)) 微秒，第 0 個包含 0，最後一個包含更長的時間
+BUCKETS = micropython.const(16)
+
+
+class LatencyHistogram:
+    """多組以微秒為單位的延遲統計，記錄次數、最小值、最大值及以 2 為底的對數區間。
+    所有陣列皆預先配置，add() 可在 ISR 內呼叫，不會配置記憶體。"""
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._counts = array.array("I", (0,) * slots)
+        self._totals = array.array("I", (0,) * slots)
+        self._mins = array.array("I", (0,) * slots)
+        self._maxs = array.array("I", (0,) * slots)
+        self._buckets = array.array("I", (0,) * (slots * BUCKETS))
+
+    def reset(self):
+        for a in (self._counts, self._totals, self._mins, self._maxs, self._buckets):
+            for i in range(len(a)):
+                a[i] = 0
+
+    def add(self, slot: int, us: int):
+        if slot >= self.slots:
+            return
+
+        count = self._counts[slot]
+        if count == 0 or us < self._mins[slot]:
+            self._mins[slot] = us
+
+        if us > self._maxs[slot]:
+            self._maxs[slot] = us
+
+        self._counts[slot] = count + 1
+        self._totals[slot] = (self._totals[slot] + us) & 0x3FFFFFFF
+
+        bucket = 0
+        while us > 1 and bucket < BUCKETS - 1:
+            us >>= 1
+            bucket += 1
+
+        self._buckets[slot * BUCKETS + bucket] += 1
+
+    def count(self, slot: int) -> int:
+        return self._counts[slot]
+
+    def dump(self, prefix: str, label):
+        """輸出有記錄的每一組，label(slot) 返回該組的名稱。不可在 ISR 內呼叫"""
+
+        for slot in range(self.slots):
+            count = self._counts[slot]
+            if count == 0:
+                continue
+
+            start = slot * BUCKETS
+            buckets = " ".join(
+                str(self._buckets[i]) for i in range(start, start + BUCKETS)
+            )
+            print(
+                f"{prefix} {label(slot)} count {count} "
+                f"min {self._mins[slot]} max {self._maxs[slot]} "
+                f"avg {self._totals[slot] // count} buckets {buckets}"
+            )
@@ -4,39 +4,138 @@ import micropython
 # Custom modules
 import ble.e2e
 import ble.stack
+import common.logger
+import common.logmsg
 
 
+_IRQ_CENTRAL_CONNECT = micropython.const(1)
 _IRQ_CENTRAL_DISCONNECT = micropython.const(2)
 
+# E2E-Counter (1) + E2E-CRC (2)
+_E2E_SIZE = micropython.const(3)
 
-_rbuf = bytearray(20)
-_rbuf_mv = memoryview(_rbuf)
+# E2E_REJECT 的原因
+E2E_REJECT_LENGTH = micropython.const(1)
+E2E_REJECT_CRC = micropython.const(2)
+E2E_REJECT_COUNTER = micropython.const(3)
+
+
+class TxMixin:
+    """會送出資料的 Characteristic，E2E 版本由 E2ETxMixin 覆寫"""
+
+    # _append_e2e() 加上的長度
+    _e2e_size = 0
+
+    def _after_build_tx_data(self):
+        pass
+
+    def _append_e2e(self, buf: memoryview | bytearray, n: int) -> int:
+        """在 buf[:n] 之後加上 E2E 欄位，返回總長度"""
+        return n
 
 
 class E2ETxMixin:
+    _e2e_size = _E2E_SIZE
+
     def __init__(self):
         self._tx_counter = ble.e2e.TxCounter()
-        ble.stack.register_irq_handler(self._isr_e2e_tx_mixin)
+        ble.stack.register_irq_handler(
+            self._isr_e2e_tx_mixin, (_IRQ_CENTRAL_DISCONNECT,)
+        )
 
     def _after_build_tx_data(self):
         self._tx_counter.inc_counter()
 
+    def _append_e2e(self, buf: memoryview | bytearray, n: int) -> int:
+        """在 buf[:n] 之後加上 E2E-Counter 及 E2E-CRC，返回總長度"""
+        buf[n] = self._tx_counter.value
+        self._after_build_tx_data()
+        ble.e2e.Crc.fill_crc(buf, n + 1, n + 3)
+        return n + 3
+
     def _isr_e2e_tx_mixin(self, event, data):
         if event == _IRQ_CENTRAL_DISCONNECT:
             self._tx_counter.reset()
 
 
-class ReadMixin:
-    def on_read(self, value_handle: int):
-        n = self._build_read_rsp(_rbuf_mv)
+class ReadMixin(TxMixin):
+    """子類別需設定 buf_size 為最大的回覆資料長度"""
+
+    def on_read(self, conn_handle: int, value_handle: int):
+        buf = self.buf
+        n = self._build_read_rsp(buf)
         self._after_build_tx_data()
 
+        # 資料長度與 buffer 相同時，不需要另外切片
+        if n != len(buf):
+            buf = buf[:n]
+
         # 將回覆資料寫入 characteristic 裡
-        ble.stack.gatts_write(value_handle, _rbuf_mv[:n])
+        ble.stack.respond_read(conn_handle, value_handle, buf)
+        common.logger.log(common.logmsg.READ_RSP, value_handle, n)
 
     def _build_read_rsp(self, buf: memoryview) -> int:
         """返回資料長度"""
         raise NotImplementedError
 
-    def _after_build_tx_data(self):
-        pass
+
+class WriteMixin:
+    def on_write(self, conn_handle: int, value_handle: int):
+        data = ble.stack.gatts_read(value_handle)
+        self._handle_write(conn_handle, memoryview(data))
+
+    def _handle_write(self, conn_handle: int, data: memoryview):
+        raise NotImplementedError
+
+
+class E2ERxMixin:
+    """在 WriteMixin 之前檢查寫入資料的 E2E-CRC 及 E2E-Counter。
+
+    檢查失敗的資料直接丟棄，不會交給 _handle_write() 解析。
+    MicroPython 的寫入事件無法回覆 ATT Error Response，故只記錄於 log
+    及 e2e_rejected。每個連線各自有一個 RxCounter。"""
+
+    def __init__(self):
+        self._rx_counters = {}
+        self.e2e_rejected = 0
+        ble.stack.register_irq_handler(
+            self._isr_e2e_rx_mixin, (_IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT)
+        )
+
+    def on_write(self, conn_handle: int, value_handle: int):
+        data = ble.stack.gatts_read(value_handle)
+        n = len(data)
+
+        if n < _E2E_SIZE:
+            self._reject_e2e(value_handle, E2E_REJECT_LENGTH, 0)
+            return
+
+        # 先檢查 CRC，再檢查 counter，以免錯誤的資料改變 counter
+        if not ble.e2e.Crc.verify_crc(data, n - 2, n):
+            self._reject_e2e(value_handle, E2E_REJECT_CRC, 0)
+            return
+
+        counter = data[n - 3]
+        rx_counter = self._rx_counters.get(conn_handle)
+        if rx_counter is None or not rx_counter.check(counter):
+            self._reject_e2e(value_handle, E2E_REJECT_COUNTER, counter)
+            return
+
+        rx_counter.value = counter
+        self._handle_e2e_write(conn_handle, memoryview(data), n - _E2E_SIZE)
+
+    def _handle_e2e_write(self, conn_handle: int, data: memoryview, n: int):
+        """data[:n] 為去掉 E2E 欄位的資料"""
+        self._handle_write(conn_handle, data[:n])
+
+    def _reject_e2e(self, value_handle: int, reason: int, counter: int):
+        self.e2e_rejected += 1
+        common.logger.log(common.logmsg.E2E_REJECT, value_handle, reason, counter)
+
+    def _isr_e2e_rx_mixin(self, event, data):
+        conn_handle = data[0]
+
+        if event == _IRQ_CENTRAL_CONNECT:
+            self._rx_counters[conn_handle] = ble.e2e.RxCounter()
+        elif conn_handle in self._rx_counters:
+            del self._rx_counters[conn_handle]
@@ -5,22 +5,46 @@ import micropython
 import struct
 
 # Custom modules
+import ble.ids.command
 import ble.ids.features
+import ble.ids.history
+import ble.ids.racp
+import ble.ids.ringlog
+import ble.ids.state
+import ble.ids.statusreader
+import ble.settings
 import ble.stack
+import ble.txqueue
 import ble.utils
+import common.bootprof
+import common.deferred
 import common.logger
+import common.logmsg
+import common.supervisor
 import config
 
 
 # BLE 事件
 _IRQ_CENTRAL_CONNECT = micropython.const(1)
 _IRQ_CENTRAL_DISCONNECT = micropython.const(2)
-_IRQ_GATTS_READ_REQUEST = micropython.const(4)
 _IRQ_PASSKEY_ACTION = micropython.const(31)
 
 # 配對類型
 _PASSKEY_ACTION_DISPLAY = micropython.const(3)
 
+# MTU 交換時，本裝置支援的最大 MTU
+_PREFERRED_MTU = micropython.const(247)
+
+# 歷史記錄存放的目錄、每個區段檔的筆數、區段檔數量，及每筆記錄的最大長度
+_HISTORY_PATH = "history"
+_HISTORY_SEGMENT_RECORDS = micropython.const(64)
+_HISTORY_SEGMENTS = micropython.const(8)
+_HISTORY_RECORD_SIZE = micropython.const(24)
+
+# 背景工作的執行間隔
+_LOG_FLUSH_INTERVAL_MS = micropython.const(100)
+_GC_INTERVAL_MS = micropython.const(10_000)
+
 # Insulin Delivery Service 相關 UUID
 _IDS_UUID = micropython.const(0x183A)
 
@@ -30,25 +54,70 @@ _config = config.get_config()
 
 class IdsServer(ble.stack.Server):
     def __init__(self):
-        ble.stack.init()
-        ble.stack.register_irq_handler(self._ble_isr)
+        ble.stack.Server.__init__(self)
 
-        # 取得本地端的藍芽位址及類型
-        mac = ble.stack.get_mac()
-        common.logger.write(
-            f"Local: {ble.utils.addr_to_str(mac[1])} ({ble.utils.addr_type_to_str(mac[0])})"
+        ble.stack.register_irq_handler(
+            self._ble_isr,
+            (_IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_PASSKEY_ACTION),
         )
 
+        self.rc_addr = None
+        self.conn_handle = None
+
+        # 預先建立 bound method，ISR 中延後執行時不需配置記憶體
+        self._advertise_cb = self._advertise
+
+        # 到 _warmup() 時才讀取檔案系統
+        self.history = ble.ids.ringlog.RingLog(
+            _HISTORY_PATH,
+            _HISTORY_RECORD_SIZE,
+            _HISTORY_SEGMENT_RECORDS,
+            _HISTORY_SEGMENTS,
+        )
+
+        self.state = ble.ids.state.IddState()
+
+        # 管理所有背景工作，run() 之前也可加入
+        self.supervisor = common.supervisor.Supervisor()
+
+    def start(self):
+        """啟動藍芽、註冊 GATT 並開始廣播。
+        只做可連線前必要的工作，其餘的留給 run() 在廣播後進行"""
+
+        # 啟動控制器是同步的，會等到控制器就緒才返回
+        ble.stack.init()
+
         # 啟用安全機制
         ble.stack.set_pairing_mode(bond=True, mitm=True, le_secure=True)
 
         # 指定本裝置只能顯示連線密碼
         ble.stack.set_io(ble.stack.IO_DISPLAY_ONLY)
 
-        self.rc_addr = None
+        ble.stack.set_preferred_mtu(_PREFERRED_MTU)
+
+        # 回覆資料的快取在廣播之後才建立
+        self.register_services(warmup=False)
+
+        # 每個連線的 notification / indication 佇列，需在可連線前準備好，
+        # 送出資料的 task 在 run() 時才由 supervisor 啟動
+        ble.txqueue.start(
+            self.supervisor, slot_size=_PREFERRED_MTU - ble.stack.ATT_HEADER_SIZE
+        )
+
+        # 發送廣播
+        self._adv_data = self._build_advertising_payload()
+        self._resp_data = self._build_scan_response_payload(_config.local_name)
+        self._advertise()
 
     def _build_services(self) -> tuple[ble.stack.Service, ...]:
-        return (self._build_ids(),)
+        return (self._build_ids(), self._build_settings())
+
+    def _build_settings(self) -> ble.stack.Service:
+        self._settings_cp = ble.settings.SettingsCp(_config, self._on_config_changed)
+
+        service = ble.stack.Service(ble.settings.SETTINGS_UUID)
+        service.add_char(self._settings_cp)
+        return service
 
     def _build_ids(self) -> ble.stack.Service:
 
@@ -59,24 +128,90 @@ class IdsServer(ble.stack.Server):
         else:
             features = ble.ids.features.IddFeatures(_config)
 
+        self._features = features
         self._ids.add_char(features)
 
+        if _config.is_e2e_protection_supported:
+            status_reader = ble.ids.statusreader.E2EIddStatusReaderCp(self.state)
+            command = ble.ids.command.E2EIddCommandCp(self.state)
+        else:
+            status_reader = ble.ids.statusreader.IddStatusReaderCp(self.state)
+            command = ble.ids.command.IddCommandCp(self.state)
+
+        self._ids.add_char(status_reader)
+        self._ids.add_char(command)
+
+        if _config.is_e2e_protection_supported:
+            history_data = ble.ids.history.E2EIddHistoryData(_HISTORY_RECORD_SIZE)
+            self._racp = ble.ids.racp.E2EIddRacp(self.history, history_data)
+        else:
+            history_data = ble.ids.history.IddHistoryData(_HISTORY_RECORD_SIZE)
+            self._racp = ble.ids.racp.IddRacp(self.history, history_data)
+
+        self._ids.add_char(history_data)
+        self._ids.add_char(self._racp)
+
         return self._ids
 
     async def run(self):
-        # 發送廣播
-        adv_data = self._build_advertising_payload()
-        resp_data = self._build_scan_response_payload(_config.local_name)
-        ble.stack.advertise(_config.adv_interval_us, adv_data, resp_data=resp_data)
+        sup = self.supervisor
+
+        # 將 ISR 中記錄的 log 輸出到序列埠
+        sup.add_periodic("log", common.logger.flush, _LOG_FLUSH_INTERVAL_MS)
+
+        # 排程佇列已滿時，執行 ISR 延後的工作
+        sup.add_task("deferred", common.deferred.run)
+
+        sup.add_task("racp", self._racp.run)
+        sup.add_task("settings", self._settings_cp.run)
+        sup.add_task("warmup", self._warmup, restart=False)
 
-        # 主執行緒會一直等下去
-        flag = asyncio.ThreadSafeFlag()
+        # 定期回收記憶體，避免在處理 BLE 事件時才進行較久的回收
+        sup.add_periodic("gc", gc.collect, _GC_INTERVAL_MS)
+
+        await sup.run()
+
+    async def _warmup(self):
+        """廣播之後才進行的開機工作，每一步之間讓出執行權，以便處理連線"""
+
+        # 取得本地端的藍芽位址及類型
+        mac = ble.stack.get_mac()
+        common.logger.write(
+            f"Local: {ble.utils.addr_to_str(mac[1])} ({ble.utils.addr_type_to_str(mac[0])})"
+        )
+        await asyncio.sleep_ms(0)
+
+        # 建立 IDD Features 等回覆資料的快取
+        self.warmup()
+        await asyncio.sleep_ms(0)
+
+        # 檢查歷史記錄的最新區段
+        self.history.open()
+        common.bootprof.mark("warmup")
 
         gc.collect()
         print(f"Heap RAM: {gc.mem_free()} bytes\n")
         micropython.mem_info()
 
-        await flag.wait()
+        common.bootprof.report()
+
+    def _advertise(self, _=None):
+        ble.stack.advertise(
+            _config.adv_interval_us, self._adv_data, resp_data=self._resp_data
+        )
+
+    def _on_config_changed(self, name: str):
+        """設定在執行時被修改後，更新相關的廣播及回覆"""
+
+        if name in ("local_name", "adv_interval_us"):
+            self._resp_data = self._build_scan_response_payload(_config.local_name)
+
+            # 連線中會在斷線後以新的設定廣播
+            if self.conn_handle is None:
+                self._advertise()
+
+        elif name in ("idd_features_insulin_conc", "idd_features_flags"):
+            self._features.invalidate()
 
     def _build_advertising_payload(self) -> bytes:
         # 廣播內容型態
@@ -123,44 +258,37 @@ class IdsServer(ble.stack.Server):
             conn_handle, addr_type, addr = data
 
             self.rc_addr = bytes(addr)
-            micropython.schedule(_log_connect, addr_type)
+            self.conn_handle = conn_handle
+            _log_addr(common.logmsg.CONNECT, conn_handle, addr_type, addr)
 
         elif event == _IRQ_CENTRAL_DISCONNECT:
             conn_handle, addr_type, addr = data
 
             self.rc_addr = bytes(addr)
-            micropython.schedule(_log_disconnect, addr_type)
+            self.conn_handle = None
+            _log_addr(common.logmsg.DISCONNECT, conn_handle, addr_type, addr)
 
             # 要求 MicroPython 在 BLE 中斷後，儘快重新廣播
-            micropython.schedule(ble.stack.advertise, _config.adv_interval_us)
-
-        elif event == _IRQ_GATTS_READ_REQUEST:
-            conn_handle, value_handle = data
-
-            for c in self._ids.chars:
-                if value_handle == c.value_handle:
-                    c.on_read(value_handle)
-                    return
+            common.deferred.call(self._advertise_cb, None)
 
         elif event == _IRQ_PASSKEY_ACTION:
             conn_handle, action, passkey = data
 
             if action == _PASSKEY_ACTION_DISPLAY:
-                micropython.schedule(_set_passkey, conn_handle)
+                common.deferred.call(_set_passkey, conn_handle)
 
 
 instance = IdsServer()
 
 
-def _log_connect(addr_type):
-    common.logger.write(
-        f"Connected to {ble.utils.addr_to_str(instance.rc_addr)} ({ble.utils.addr_type_to_str(addr_type)})"
-    )
-
-
-def _log_disconnect(addr_type):
-    common.logger.write(
-        f"Disconnected from {ble.utils.addr_to_str(instance.rc_addr)} ({ble.utils.addr_type_to_str(addr_type)})"
+def _log_addr(msg_id: int, conn_handle: int, addr_type: int, addr):
+    """在 ISR 內記錄連線事件，位址類型及 conn_handle 合為一個整數，
+    藍芽位址拆成兩個 24 位元整數"""
+    common.logger.log(
+        msg_id,
+        (addr_type << 16) | conn_handle,
+        (addr[0] << 16) | (addr[1] << 8) | addr[2],
+        (addr[3] << 16) | (addr[4] << 8) | addr[5],
     )
 
 
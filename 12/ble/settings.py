@@ -0,0 +1,152 @@
+# MicroPython modules
+import asyncio
+import micropython
+
+# Custom modules
+import ble.mixin
+import ble.stack
+import ble.txqueue
+import common.sfloat
+import common.utils
+import config
+
+
+# 設定服務的 UUID
+SETTINGS_UUID = "8e4b0000-5c2a-4a4e-9f3b-6d7c2f1e0a10"
+_SETTINGS_CP_UUID = "8e4b0001-5c2a-4a4e-9f3b-6d7c2f1e0a10"
+
+# 寫入資料為 Field ID (1) + 數值
+_FIELD_LOCAL_NAME = micropython.const(0x01)  # UTF-8
+_FIELD_ADV_INTERVAL_US = micropython.const(0x02)  # uint32
+_FIELD_PASSKEY = micropython.const(0x03)  # 6 個 ASCII 數字
+_FIELD_INSULIN_CONC = micropython.const(0x04)  # SFLOAT
+_FIELD_FEATURE_FLAGS = micropython.const(0x05)  # uint24
+
+# 回覆為 Field ID (1) + Result (1)
+_RESULT_SUCCESS = micropython.const(0x00)
+_RESULT_UNKNOWN_FIELD = micropython.const(0x01)
+_RESULT_INVALID_VALUE = micropython.const(0x02)
+_RESULT_BUSY = micropython.const(0x03)
+_RESULT_WRITE_FAILED = micropython.const(0x04)
+
+# Field ID -> (設定名稱, 數值長度，0 表示不固定)
+_FIELDS = {
+    _FIELD_LOCAL_NAME: ("local_name", 0),
+    _FIELD_ADV_INTERVAL_US: ("adv_interval_us", 4),
+    _FIELD_PASSKEY: ("passkey", 6),
+    _FIELD_INSULIN_CONC: ("idd_features_insulin_conc", 2),
+    _FIELD_FEATURE_FLAGS: ("idd_features_flags", 3),
+}
+
+# Field ID (1) + local name 最長 29 bytes
+_MAX_REQUEST_SIZE = micropython.const(30)
+
+
+class SettingsCp(ble.mixin.WriteMixin, ble.mixin.TxMixin, ble.stack.Characteristic):
+    """執行時修改設定的 Control Point，寫入需要經過認證的加密連線。
+
+    寫入時只記下要求，由 run() 檢查數值、修改 config、寫入設定檔，
+    再呼叫 on_changed(name) 讓伺服器更新廣播或快取的回覆。"""
+
+    def __init__(self, c: config.Config, on_changed):
+        ble.stack.Characteristic.__init__(
+            self, _SETTINGS_CP_UUID, write=True, write_authen=True, indicate=True
+        )
+
+        self._config = c
+        self._on_changed = on_changed
+
+        self._request_buf = bytearray(_MAX_REQUEST_SIZE)
+        self._request_len = 0
+        self._rsp_buf = bytearray(2)
+
+        # 在 ISR 中回覆錯誤時使用，避免覆蓋 run() 尚未送出的回覆
+        self._isr_rsp_buf = bytearray(2)
+
+        self._busy = False
+        self._conn_handle = 0
+        self._request = asyncio.ThreadSafeFlag()
+
+    def _handle_write(self, conn_handle: int, data: memoryview):
+        n = len(data)
+        if n < 2:
+            return
+
+        field = data[0]
+        entry = _FIELDS.get(field)
+
+        if entry is None:
+            self._respond_now(conn_handle, field, _RESULT_UNKNOWN_FIELD)
+            return
+
+        if n > _MAX_REQUEST_SIZE or (entry[1] and n - 1 != entry[1]):
+            self._respond_now(conn_handle, field, _RESULT_INVALID_VALUE)
+            return
+
+        if self._busy:
+            self._respond_now(conn_handle, field, _RESULT_BUSY)
+            return
+
+        self._request_buf[:n] = data
+        self._request_len = n
+        self._conn_handle = conn_handle
+        self._busy = True
+        self._request.set()
+
+    def _parse_value(self, field: int):
+        data = memoryview(self._request_buf)[1 : self._request_len]
+
+        if field == _FIELD_ADV_INTERVAL_US:
+            return common.utils.read_uint32(data, 0)
+
+        elif field == _FIELD_INSULIN_CONC:
+            return common.sfloat.sfloat_to_float(common.utils.read_uint16(data, 0))
+
+        elif field == _FIELD_FEATURE_FLAGS:
+            return data[0] | (data[1] << 8) | (data[2] << 16)
+
+        # local name 及 passkey
+        return bytes(data).decode()
+
+    async def run(self):
+        """處理設定要求的 asyncio task"""
+
+        while True:
+            await self._request.wait()
+
+            try:
+                field = self._request_buf[0]
+                result = self._apply(field)
+                self._respond(self._conn_handle, self._rsp_buf, field, result)
+            finally:
+                self._busy = False
+
+    def _apply(self, field: int) -> int:
+        name = _FIELDS[field][0]
+        old_value = getattr(self._config, name)
+
+        try:
+            self._config.set_value(name, self._parse_value(field))
+        except (ValueError, UnicodeError):
+            return _RESULT_INVALID_VALUE
+
+        try:
+            config.save_config(self._config)
+        except OSError:
+            # 無法保存時還原，避免與設定檔不一致
+            self._config.set_value(name, old_value)
+            return _RESULT_WRITE_FAILED
+
+        self._on_changed(name)
+        return _RESULT_SUCCESS
+
+    def _respond_now(self, conn_handle: int, field: int, result: int):
+        self._respond(conn_handle, self._isr_rsp_buf, field, result)
+
+    def _respond(self, conn_handle: int, buf: bytearray, field: int, result: int):
+        # 佇列已滿時放棄回覆
+        queue = ble.txqueue.get(conn_handle)
+        if queue is not None:
+            buf[0] = field
+            buf[1] = result
+            queue.indicate(self.value_handle, buf)
@@ -1,12 +1,27 @@
 # MicroPython modules
 import bluetooth
 import micropython
+import time
 
 # Custom modules
+import ble.isrstats
+import common.bootprof
 import common.logger
-import common.utils
+import common.logmsg
 
 
+# BLE 事件
+_IRQ_CENTRAL_CONNECT = micropython.const(1)
+_IRQ_CENTRAL_DISCONNECT = micropython.const(2)
+_IRQ_GATTS_WRITE = micropython.const(3)
+_IRQ_GATTS_READ_REQUEST = micropython.const(4)
+_IRQ_GATTS_INDICATE_DONE = micropython.const(20)
+_IRQ_MTU_EXCHANGED = micropython.const(21)
+
+# ATT 預設的 MTU，notification / indication 的資料最多為 MTU - 3
+ATT_DEFAULT_MTU = micropython.const(23)
+ATT_HEADER_SIZE = micropython.const(3)
+
 IO_DISPLAY_ONLY = micropython.const(0)
 IO_DISPLAY_YESNO = micropython.const(1)
 IO_KEYBOARD_ONLY = micropython.const(2)
@@ -15,9 +30,39 @@ IO_KEYBOARD_DISPLAY = micropython.const(4)
 
 
 # 因 BLE.irq() 只能指定一個函數來處理 BLE 訊息，
-# 所以需自行儲存要接收 BLE 訊息的函數
+# 所以需自行儲存要接收 BLE 訊息的函數，及其訂閱的事件
 _irq_handlers = []
 
+# 依事件分類的處理函數，於註冊時建立，中斷時只需查表
+_irq_table: dict[int, tuple] = {}
+
+# 訂閱所有事件的處理函數，用於 _irq_table 中沒有的事件
+_irq_any_handlers: tuple = ()
+
+# 與 _irq_table、_irq_any_handlers 對應的處理函數在 _irq_handlers 中的位置，
+# 供 ISR 延遲統計使用
+_irq_index_table: dict[int, tuple] = {}
+_irq_any_indices: tuple = ()
+
+# ISR 延遲統計，以事件及處理函數分組，None 代表不記錄
+_MAX_IRQ_EVENTS = micropython.const(32)
+_MAX_IRQ_HANDLERS = micropython.const(24)
+_event_stats = None
+_handler_stats = None
+
+# 每個連線協商後的 ATT MTU
+_mtus: dict[int, int] = {}
+
+# 記錄 GATT 流量的 ble.capture.Capture 物件，None 代表不記錄
+_capture = None
+
+# ATT PDU 的 opcode，與 ble.capture 相同
+_ATT_READ_REQ = micropython.const(0x0A)
+_ATT_READ_RSP = micropython.const(0x0B)
+_ATT_WRITE_REQ = micropython.const(0x12)
+_ATT_NOTIFY = micropython.const(0x1B)
+_ATT_INDICATE = micropython.const(0x1D)
+
 
 def _build_props(
     *,
@@ -74,6 +119,9 @@ def _build_props(
 class Characteristic:
     """GATT Characteristic"""
 
+    # 子類別需要的專用 buffer 大小，註冊時由 Server 配置到 self.buf
+    buf_size = 0
+
     def __init__(
         self,
         uuid: int | str,
@@ -105,6 +153,23 @@ class Characteristic:
             indicate=indicate,
         )
         self.value_handle = 0
+        self.buf: memoryview | None = None
+
+    def on_registered(self):
+        """註冊並配置 buffer 後呼叫，子類別可在此預先建立回覆資料"""
+        pass
+
+    def on_read(self, conn_handle: int, value_handle: int):
+        """由子類別處理讀取要求"""
+        pass
+
+    def on_write(self, conn_handle: int, value_handle: int):
+        """由子類別處理寫入的資料"""
+        pass
+
+    def on_indicate_done(self, conn_handle: int, value_handle: int, status: int):
+        """由子類別處理 indication 的確認"""
+        pass
 
     def _to_tuple(self) -> tuple[bluetooth.UUID, int]:
         return (self.uuid, self.char_flags)
@@ -129,11 +194,22 @@ class Service:
 class Server:
     """GATT Server"""
 
+    def __init__(self):
+        # 以 value handle 為索引，存放所有 Service 中的 Characteristic 物件
+        self._chars_by_handle: list[Characteristic | None] = []
+        register_irq_handler(
+            self._isr_server,
+            (_IRQ_GATTS_WRITE, _IRQ_GATTS_READ_REQUEST, _IRQ_GATTS_INDICATE_DONE),
+        )
+
     def _build_services(self) -> tuple[Service, ...]:
         """由子類別負責建立所需的 Service 物件"""
         return tuple()
 
-    def register_services(self):
+    def register_services(self, *, warmup: bool = True):
+        """warmup 為 False 時，不呼叫 on_registered()，
+        可在開始廣播後再呼叫 warmup() 建立回覆資料"""
+
         # 儲存所有的 Service 物件
         self.srvs = self._build_services()
 
@@ -146,12 +222,120 @@ class Server:
                 h = char_handles[j]
                 char.value_handle = h
 
+        chars_by_handle = []
+
+        for s in self.srvs:
+            for char in s.chars:
+                while len(chars_by_handle) <= char.value_handle:
+                    chars_by_handle.append(None)
+
+                chars_by_handle[char.value_handle] = char
+
+        self._chars_by_handle = chars_by_handle
+
+        self._alloc_buffers()
+
+        common.bootprof.mark("register_services")
+
+        if warmup:
+            self.warmup()
+
+    def warmup(self):
+        for s in self.srvs:
+            for char in s.chars:
+                char.on_registered()
+
+    def _alloc_buffers(self):
+        # 從同一塊記憶體切出每個 Characteristic 專用且大小剛好的 buffer，
+        # 讀寫時不需配置記憶體，也不會與其他 Characteristic 共用
+        chars = [c for s in self.srvs for c in s.chars if c.buf_size]
+
+        self._buf_pool = memoryview(bytearray(sum(c.buf_size for c in chars)))
+
+        offset = 0
+        for c in chars:
+            c.buf = self._buf_pool[offset : offset + c.buf_size]
+            offset += c.buf_size
+
+    def _find_char(self, value_handle: int) -> Characteristic | None:
+        if value_handle < len(self._chars_by_handle):
+            return self._chars_by_handle[value_handle]
+
+        return None
+
+    def _isr_server(self, event, data):
+        # 將 GATT 事件直接分發給對應的 Characteristic
+        if event == _IRQ_GATTS_READ_REQUEST:
+            conn_handle, value_handle = data
+
+            char = self._find_char(value_handle)
+            if char is not None:
+                return char.on_read(conn_handle, value_handle)
+
+        elif event == _IRQ_GATTS_WRITE:
+            conn_handle, value_handle = data
+
+            if _capture is not None:
+                _capture.record(
+                    _ATT_WRITE_REQ,
+                    conn_handle,
+                    value_handle,
+                    gatts_read(value_handle),
+                    True,
+                )
+
+            char = self._find_char(value_handle)
+            if char is not None:
+                char.on_write(conn_handle, value_handle)
+
+        elif event == _IRQ_GATTS_INDICATE_DONE:
+            conn_handle, value_handle, status = data
+
+            char = self._find_char(value_handle)
+            if char is not None:
+                char.on_indicate_done(conn_handle, value_handle, status)
+
 
 def init():
     ble = bluetooth.BLE()
     ble.irq(_ble_isr)
     ble.active(True)
 
+    register_irq_handler(
+        _isr_mtu, (_IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_MTU_EXCHANGED)
+    )
+
+    common.bootprof.mark("ble.stack.init")
+
+
+def set_preferred_mtu(mtu: int):
+    """MTU 交換時，本裝置所支援的最大 MTU"""
+    ble = bluetooth.BLE()
+    ble.config(mtu=mtu)
+
+
+def get_mtu(conn_handle: int) -> int:
+    return _mtus.get(conn_handle, ATT_DEFAULT_MTU)
+
+
+def get_max_payload(conn_handle: int) -> int:
+    """notification / indication 單一 PDU 可容納的資料長度"""
+    return _mtus.get(conn_handle, ATT_DEFAULT_MTU) - ATT_HEADER_SIZE
+
+
+def _isr_mtu(event, data):
+    if event == _IRQ_MTU_EXCHANGED:
+        conn_handle, mtu = data
+        _mtus[conn_handle] = mtu
+
+    elif event == _IRQ_CENTRAL_CONNECT:
+        conn_handle, _, _ = data
+        _mtus[conn_handle] = ATT_DEFAULT_MTU
+
+    elif event == _IRQ_CENTRAL_DISCONNECT:
+        conn_handle, _, _ = data
+        _mtus.pop(conn_handle, None)
+
 
 def get_mac():
     ble = bluetooth.BLE()
@@ -171,6 +355,9 @@ def advertise(
         interval_us, adv_data, resp_data=resp_data, connectable=connectable
     )
 
+    # 開機到第一次廣播的時間
+    common.bootprof.mark_once("advertise")
+
 
 def set_pairing_mode(*, bond: bool, mitm: bool, le_secure: bool):
     ble = bluetooth.BLE()
@@ -199,50 +386,147 @@ def gatts_write(value_handle: int, data: bytes, send_update: bool = False):
     ble.gatts_write(value_handle, data, send_update)
 
 
+def respond_read(conn_handle: int, value_handle: int, data: bytes | memoryview):
+    """在讀取要求的 ISR 中，將要回覆的資料寫入 characteristic"""
+
+    if _capture is not None:
+        _capture.record(_ATT_READ_REQ, conn_handle, value_handle, None, True)
+        _capture.record(_ATT_READ_RSP, conn_handle, None, data)
+
+    ble = bluetooth.BLE()
+    ble.gatts_write(value_handle, data)
+
+
 def notify(conn_handle: int, value_handle: int, data: bytes | None = None):
-    common.logger.write(
-        "".join(
-            (
-                "Notify(value_handle: ",
-                str(value_handle),
-                ", data: ",
-                common.utils.array_to_hex_str(data),
-                ")",
-            )
-        )
+    common.logger.log(
+        common.logmsg.NOTIFY, value_handle, 0 if data is None else len(data)
     )
+    if _capture is not None:
+        _capture.record(_ATT_NOTIFY, conn_handle, value_handle, data)
+
     ble = bluetooth.BLE()
     ble.gatts_notify(conn_handle, value_handle, data)
 
 
 def indicate(conn_handle: int, value_handle: int, data: bytes | None = None):
-    common.logger.write(
-        "".join(
-            (
-                "Indicate(value_handle: ",
-                str(value_handle),
-                ", data: ",
-                common.utils.array_to_hex_str(data),
-                ")",
-            )
-        )
+    common.logger.log(
+        common.logmsg.INDICATE, value_handle, 0 if data is None else len(data)
     )
+    if _capture is not None:
+        _capture.record(_ATT_INDICATE, conn_handle, value_handle, data)
+
     ble = bluetooth.BLE()
     ble.gatts_indicate(conn_handle, value_handle, data)
 
 
-def register_irq_handler(handler):
-    _irq_handlers.append(handler)
+def set_capture(capture):
+    """指定記錄 GATT 流量的物件，請使用 ble.capture.start()"""
+
+    global _capture
+    _capture = capture
+
+
+def register_irq_handler(handler, events: tuple[int, ...] | list[int] | None = None):
+    """events 為 handler 要接收的 BLE 事件，None 代表接收所有事件"""
+
+    global _irq_any_handlers, _irq_any_indices
+
+    _irq_handlers.append((handler, events))
+
+    # 依註冊順序，重建每個事件的處理函數表
+    _irq_any_indices = tuple(i for i, (h, e) in enumerate(_irq_handlers) if e is None)
+    _irq_any_handlers = tuple(_irq_handlers[i][0] for i in _irq_any_indices)
+
+    _irq_table.clear()
+    _irq_index_table.clear()
+    for _, e in _irq_handlers:
+        if e is None:
+            continue
+
+        for event in e:
+            if event not in _irq_table:
+                indices = tuple(
+                    i
+                    for i, (h, e2) in enumerate(_irq_handlers)
+                    if e2 is None or event in e2
+                )
+                _irq_index_table[event] = indices
+                _irq_table[event] = tuple(_irq_handlers[i][0] for i in indices)
+
+
+def enable_isr_stats():
+    """開始記錄每個 BLE 事件及每個處理函數的執行時間"""
+
+    global _event_stats, _handler_stats
+
+    if _event_stats is None:
+        # 最後一組為超出範圍的事件
+        _event_stats = ble.isrstats.LatencyHistogram(_MAX_IRQ_EVENTS + 1)
+        _handler_stats = ble.isrstats.LatencyHistogram(_MAX_IRQ_HANDLERS)
+
+    bluetooth.BLE().irq(_ble_isr_timed)
+
+
+def disable_isr_stats():
+    bluetooth.BLE().irq(_ble_isr)
+
+
+def reset_isr_stats():
+    if _event_stats is not None:
+        _event_stats.reset()
+        _handler_stats.reset()
+
+
+def dump_isr_stats():
+    """輸出 ISR 延遲統計，單位為微秒，不可在 ISR 內呼叫"""
+
+    if _event_stats is None:
+        print("ISR stats are not enabled")
+        return
+
+    def event_label(slot):
+        return "other" if slot == _MAX_IRQ_EVENTS else f"event {slot}"
+
+    def handler_label(slot):
+        # 同名的 bound method 以註冊順序區分
+        h = _irq_handlers[slot][0]
+        return f"handler {slot} {getattr(h, '__name__', repr(h))}"
+
+    _event_stats.dump("#I", event_label)
+    _handler_stats.dump("#I", handler_label)
 
 
 def _ble_isr(event, data):
     ret = None
 
-    # 處理訊息後，分發 BLE IRQ 給所有訂閱的函式
-    for h in _irq_handlers:
+    # 處理訊息後，分發 BLE IRQ 給所有訂閱此事件的函式
+    for h in _irq_table.get(event, _irq_any_handlers):
         r = h(event, data)
 
         if r is not None:
             ret = r
 
     return ret
+
+
+def _ble_isr_timed(event, data):
+    """與 _ble_isr 相同，另外記錄整個事件及每個處理函數的執行時間"""
+
+    start = time.ticks_us()
+    ret = None
+
+    handlers = _irq_table.get(event, _irq_any_handlers)
+    indices = _irq_index_table.get(event, _irq_any_indices)
+
+    for i in range(len(handlers)):
+        t = time.ticks_us()
+        r = handlers[i](event, data)
+        _handler_stats.add(indices[i], time.ticks_diff(time.ticks_us(), t))
+
+        if r is not None:
+            ret = r
+
+    slot = event if event < _MAX_IRQ_EVENTS else _MAX_IRQ_EVENTS
+    _event_stats.add(slot, time.ticks_diff(time.ticks_us(), start))
+
+    return ret
@@ -0,0 +1,303 @@
+# MicroPython modules
+import array
+import asyncio
+import errno
+import machine
+import micropython
+import time
+
+# Custom modules
+import ble.stack
+import common.logger
+import common.logmsg
+
+
+# BLE 事件
+_IRQ_CENTRAL_CONNECT = micropython.const(1)
+_IRQ_CENTRAL_DISCONNECT = micropython.const(2)
+_IRQ_GATTS_INDICATE_DONE = micropython.const(20)
+
+_KIND_NOTIFY = micropython.const(0)
+_KIND_INDICATE = micropython.const(1)
+
+# 控制器緩衝區不足時，重送的等待時間
+_BACKOFF_MIN_MS = micropython.const(5)
+_BACKOFF_MAX_MS = micropython.const(160)
+
+# 等待 indication 確認的時間上限
+_INDICATE_TIMEOUT_MS = micropython.const(30_000)
+
+
+class TxStats:
+    """微秒為單位的統計值"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def add(self, us: int):
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+    def avg_us(self) -> int:
+        return self.total_us // self.count if self.count else 0
+
+
+class TxQueue:
+    """單一連線的 notification / indication 佇列。
+
+    資料放入預先配置的欄位後，由 run() 依序送出：
+    indication 同時只會有一個等待確認，notification 則連續送出最多 burst 個，
+    控制器緩衝區不足 (ENOMEM) 時會等待後重送。"""
+
+    def __init__(self, slots: int = 8, slot_size: int = 20, burst: int = 4):
+        self.conn_handle = None
+
+        self._slots = slots
+        self._burst = burst
+        self._bufs = [bytearray(slot_size) for _ in range(slots)]
+        self._mvs = [memoryview(b) for b in self._bufs]
+        self._lens = array.array("H", (0,) * slots)
+        self._handles = array.array("H", (0,) * slots)
+        self._kinds = bytearray(slots)
+        self._enqueue_ticks = array.array("i", (0,) * slots)
+
+        # _head 只由 enqueue 修改。_tail 由 run() 逐一前進，
+        # 但連線中斷時 _clear() 會在 IRQ callback 內將它設為 _head
+        self._head = 0
+        self._tail = 0
+
+        self._wakeup = asyncio.ThreadSafeFlag()
+        self._space = asyncio.ThreadSafeFlag()
+        self._indicate_done = asyncio.ThreadSafeFlag()
+        self._indicate_pending = False
+        self._indicate_ticks = 0
+        self._indicate_status = 0
+
+        # 放入佇列到送出的時間，及 indication 送出到確認的時間
+        self.latency = TxStats()
+        self.confirm_rtt = TxStats()
+        self.retries = 0
+        self.rejected = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return (self._head - self._tail) % (2 * self._slots)
+
+    def slot_size(self) -> int:
+        return len(self._bufs[0])
+
+    def notify(self, value_handle: int, data) -> bool:
+        return self._enqueue(_KIND_NOTIFY, value_handle, data)
+
+    def indicate(self, value_handle: int, data) -> bool:
+        return self._enqueue(_KIND_INDICATE, value_handle, data)
+
+    async def put_notify(self, value_handle: int, data) -> bool:
+        """佇列已滿時，等待空間後再放入。連線中斷或資料過長時返回 False"""
+        return await self._put(_KIND_NOTIFY, value_handle, data)
+
+    async def put_indicate(self, value_handle: int, data) -> bool:
+        return await self._put(_KIND_INDICATE, value_handle, data)
+
+    async def _put(self, kind: int, value_handle: int, data) -> bool:
+        while not self._enqueue(kind, value_handle, data):
+            if self.conn_handle is None or len(data) > self.slot_size():
+                return False
+
+            await self._space.wait()
+
+        return True
+
+    def _enqueue(self, kind: int, value_handle: int, data) -> bool:
+        """複製資料到欄位中，可在 ISR 內呼叫。佇列已滿或未連線時返回 False"""
+
+        n = len(data)
+        if (
+            self.conn_handle is None
+            or len(self) >= self._slots
+            or n > len(self._bufs[0])
+        ):
+            self.rejected += 1
+            return False
+
+        i = self._head % self._slots
+        buf = self._bufs[i]
+        for j in range(n):
+            buf[j] = data[j]
+
+        self._lens[i] = n
+        self._handles[i] = value_handle
+        self._kinds[i] = kind
+        self._enqueue_ticks[i] = time.ticks_us()
+
+        self._head = (self._head + 1) % (2 * self._slots)
+        self._wakeup.set()
+        return True
+
+    def _clear(self):
+        self.dropped += len(self)
+        self._tail = self._head
+        self._indicate_pending = False
+        self._indicate_done.set()
+        self._space.set()
+
+    def _on_indicate_done(self, status: int):
+        if self._indicate_pending:
+            self.confirm_rtt.add(time.ticks_diff(time.ticks_us(), self._indicate_ticks))
+            self._indicate_pending = False
+
+        self._indicate_status = status
+        self._indicate_done.set()
+
+    async def _send(self, i: int) -> bool:
+        """送出欄位 i 的資料，連線中斷或送出失敗時返回 False"""
+
+        backoff_ms = _BACKOFF_MIN_MS
+        data = self._mvs[i][: self._lens[i]]
+
+        while True:
+            conn_handle = self.conn_handle
+            if conn_handle is None:
+                return False
+
+            try:
+                if self._kinds[i] == _KIND_INDICATE:
+                    self._indicate_done.clear()
+                    self._indicate_pending = True
+                    self._indicate_ticks = time.ticks_us()
+                    ble.stack.indicate(conn_handle, self._handles[i], data)
+                else:
+                    ble.stack.notify(conn_handle, self._handles[i], data)
+
+                return True
+
+            except OSError as e:
+                self._indicate_pending = False
+                if e.args[0] != errno.ENOMEM:
+                    # 其他錯誤（如 ENOTCONN）重送也不會成功，丟棄這筆資料，
+                    # 連線中斷的話稍後會收到斷線事件
+                    common.logger.log(
+                        common.logmsg.TX_ERROR, self._handles[i], e.args[0]
+                    )
+                    self.dropped += 1
+                    return False
+
+                # 控制器緩衝區已滿，等待後重送
+                self.retries += 1
+                await asyncio.sleep_ms(backoff_ms)
+                backoff_ms = min(backoff_ms * 2, _BACKOFF_MAX_MS)
+
+    async def run(self):
+        """送出佇列中資料的 asyncio task"""
+
+        burst = 0
+
+        while True:
+            if self._tail == self._head:
+                burst = 0
+                await self._wakeup.wait()
+                continue
+
+            i = self._tail % self._slots
+            is_indication = self._kinds[i] == _KIND_INDICATE
+
+            # 同時只會有一個 indication 等待確認
+            if is_indication and self._indicate_pending:
+                try:
+                    await asyncio.wait_for_ms(
+                        self._indicate_done.wait(), _INDICATE_TIMEOUT_MS
+                    )
+                except asyncio.TimeoutError:
+                    self._indicate_pending = False
+
+                continue
+
+            # 連續送出 burst 個 notification 後，讓控制器有時間送出
+            if burst >= self._burst:
+                burst = 0
+                await asyncio.sleep_ms(0)
+
+            tail = self._tail
+            if await self._send(i):
+                self.latency.add(
+                    time.ticks_diff(time.ticks_us(), self._enqueue_ticks[i])
+                )
+                burst += 1
+
+            # 連線中斷時，佇列已被清空。
+            # 暫停中斷，避免比對後 _clear() 才修改 _tail
+            irq_state = machine.disable_irq()
+            if self._tail == tail:
+                self._tail = (tail + 1) % (2 * self._slots)
+            machine.enable_irq(irq_state)
+            self._space.set()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self),
+            "latency_avg_us": self.latency.avg_us(),
+            "latency_max_us": self.latency.max_us,
+            "confirm_count": self.confirm_rtt.count,
+            "confirm_rtt_avg_us": self.confirm_rtt.avg_us(),
+            "confirm_rtt_max_us": self.confirm_rtt.max_us,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "dropped": self.dropped,
+        }
+
+
+# 預先建立的佇列，連線時再指定給該連線
+_queues: list[TxQueue] = []
+
+
+def start(supervisor, max_connections: int = 1, slots: int = 8, slot_size: int = 20):
+    """建立佇列，送出資料的 task 交給 supervisor 管理，發生例外時會重新啟動"""
+
+    for i in range(max_connections):
+        q = TxQueue(slots, slot_size)
+        _queues.append(q)
+        supervisor.add_task(f"tx{i}", q.run)
+
+    ble.stack.register_irq_handler(
+        _isr_txqueue,
+        (_IRQ_CENTRAL_CONNECT, _IRQ_CENTRAL_DISCONNECT, _IRQ_GATTS_INDICATE_DONE),
+    )
+
+
+def get(conn_handle: int) -> TxQueue | None:
+    for q in _queues:
+        if q.conn_handle == conn_handle:
+            return q
+
+    return None
+
+
+def _isr_txqueue(event, data):
+    if event == _IRQ_CENTRAL_CONNECT:
+        conn_handle, _, _ = data
+
+        q = get(None)
+        if q is not None:
+            q.conn_handle = conn_handle
+
+    elif event == _IRQ_CENTRAL_DISCONNECT:
+        conn_handle, _, _ = data
+
+        q = get(conn_handle)
+        if q is not None:
+            q.conn_handle = None
+            q._clear()
+
+    elif event == _IRQ_GATTS_INDICATE_DONE:
+        conn_handle, value_handle, status = data
+
+        q = get(conn_handle)
+        if q is not None:
+            q._on_indicate_done(status)
@@ -0,0 +1,207 @@
+"""產生 .mpy 部署套件及凍結模組的 manifest，並輸出每個模組的大小。
+
+在韌體上以原始碼匯入時，每次開機都需編譯，會花費時間並造成 heap 碎片。
+本工具以 mpy-cross 預先編譯，並可在 unix port 上量測每個模組的匯入時間
+及 heap 用量。
+
+    python build_bundle.py [--march xtensawin] [--out build] [--micropython micropython]
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+# 打包的套件及模組，main.py 需以原始碼執行，不列入
+PACKAGES = ("ble", "common")
+MODULES = ("config.py", "config_const.py")
+
+# 在 unix port 量測時，代替 bluetooth 等模組
+STUBS_PATH = os.path.join("tools", "stubs")
+
+# 在 unix port 中執行，輸出匯入時間 (µs) 及 heap 用量 (bytes)
+_MEASURE_SCRIPT = """\
+import gc, time
+gc.collect()
+free = gc.mem_free()
+t = time.ticks_us()
+import {name}
+t = time.ticks_diff(time.ticks_us(), t)
+gc.collect()
+print("BUNDLE", t, free - gc.mem_free())
+"""
+
+
+def _find_sources() -> list[str]:
+    """返回要打包的 .py 檔，路徑相對於本目錄"""
+
+    sources = []
+
+    for package in PACKAGES:
+        for root, dirs, files in os.walk(package):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    sources.append(os.path.join(root, name))
+
+    for name in MODULES:
+        if os.path.exists(name):
+            sources.append(name)
+
+    return sources
+
+
+def _module_name(path: str) -> str:
+    name = path[:-3].replace(os.sep, ".")
+    if name.endswith(".__init__"):
+        name = name[: -len(".__init__")]
+
+    return name
+
+
+def _mpy_cross_command() -> list[str] | None:
+    path = shutil.which("mpy-cross")
+    if path is not None:
+        return [path]
+
+    # pip install mpy-cross
+    try:
+        import mpy_cross  # noqa: F401
+    except ImportError:
+        return None
+
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def _compile(mpy_cross: list[str], src: str, dst: str, march: str | None):
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+
+    cmd = mpy_cross + ["-o", dst, "-s", src]
+    if march:
+        cmd.append(f"-march={march}")
+
+    subprocess.run(cmd + [src], check=True)
+
+
+def _build(sources: list[str], out_dir: str, march: str | None) -> dict[str, int]:
+    """編譯所有模組，返回每個模組的 .mpy 大小"""
+
+    mpy_cross = _mpy_cross_command()
+    if mpy_cross is None:
+        raise SystemExit("mpy-cross not found, install it with: pip install mpy-cross")
+
+    sizes = {}
+
+    for src in sources:
+        dst = os.path.join(out_dir, src[:-3] + ".mpy")
+        _compile(mpy_cross, src, dst, march)
+        sizes[src] = os.path.getsize(dst)
+
+    return sizes
+
+
+def _write_manifest(sources: list[str], path: str):
+    """產生凍結模組用的 manifest.py，供 MicroPython 的 FROZEN_MANIFEST 使用"""
+
+    base = os.path.abspath(".")
+    lines = ["# 由 build_bundle.py 產生，請勿手動修改"]
+
+    for package in PACKAGES:
+        lines.append(f'package("{package}", base_path="{base}")')
+
+    for name in MODULES:
+        if name in sources:
+            lines.append(f'module("{name}", base_path="{base}")')
+
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+
+def _measure(
+    micropython: str, sources: list[str], march: str | None
+) -> dict[str, tuple[int, int] | str]:
+    """在 unix port 上逐一以新的行程匯入每個模組，量測匯入時間及 heap 用量。
+    包含其相依模組第一次匯入的成本。"""
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 以 unix port 的架構另外編譯一份
+        _build(sources, tmp, march)
+        path = os.pathsep.join((tmp, os.path.abspath(STUBS_PATH), ".frozen"))
+
+        for src in sources:
+            name = _module_name(src)
+            proc = subprocess.run(
+                [micropython, "-c", _MEASURE_SCRIPT.format(name=name)],
+                cwd=tmp,
+                env=dict(os.environ, MICROPYPATH=path),
+                capture_output=True,
+                text=True,
+            )
+
+            for line in proc.stdout.splitlines():
+                if line.startswith("BUNDLE "):
+                    _, us, heap = line.split()
+                    results[src] = (int(us), int(heap))
+                    break
+            else:
+                lines = proc.stderr.strip().splitlines()
+                results[src] = lines[-1] if lines else f"exit {proc.returncode}"
+
+    return results
+
+
+def _report(sizes: dict[str, int], measured: dict[str, tuple[int, int] | str]):
+    print(f"{'module':<28} {'mpy':>7} {'import_us':>10} {'heap':>8}")
+
+    for src, size in sizes.items():
+        result = measured.get(src)
+
+        if result is None:
+            print(f"{_module_name(src):<28} {size:7d}")
+        elif isinstance(result, str):
+            print(f"{_module_name(src):<28} {size:7d}  {result}")
+        else:
+            print(f"{_module_name(src):<28} {size:7d} {result[0]:10d} {result[1]:8d}")
+
+    print(f"{'total':<28} {sum(sizes.values()):7d}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="build", help="輸出目錄")
+    parser.add_argument(
+        "--march", default="xtensawin", help="mpy-cross 的 -march，ESP32 為 xtensawin"
+    )
+    parser.add_argument(
+        "--micropython",
+        default=shutil.which("micropython"),
+        help="量測用的 unix port 執行檔，未指定時不量測",
+    )
+    parser.add_argument(
+        "--host-march", default="x64", help="unix port 的 -march，用於量測"
+    )
+    args = parser.parse_args(argv)
+
+    # 以本檔所在的目錄為專案根目錄
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    sources = _find_sources()
+    sizes = _build(sources, args.out, args.march)
+    _write_manifest(sources, os.path.join(args.out, "manifest.py"))
+
+    measured = {}
+    if args.micropython:
+        measured = _measure(args.micropython, sources, args.host_march)
+    else:
+        print("micropython (unix port) not found, skip import measurement\n")
+
+    _report(sizes, measured)
+
+
+if __name__ == "__main__":
+    main()
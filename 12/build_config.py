@@ -3,14 +3,66 @@ import json
 import config
 
 
-def _build_config():
-    c = config.Config()
+CONST_PATH = "config_const.py"
+
+# 產生 config_const.py 時，以 micropython.const() 輸出的 IDD Features flags
+_FEATURE_FLAGS = (
+    ("IS_E2E_PROTECTION_SUPPORTED", 0x0001),
+    ("IS_BASAL_RATE_SUPPORTED", 0x0002),
+    ("IS_TBR_ABSOLUTE_SUPPORTED", 0x0004),
+    ("IS_TBR_RELATIVE_SUPPORTED", 0x0008),
+    ("IS_TBR_TEMPLATE_SUPPORTED", 0x0010),
+    ("IS_FAST_BOLUS_SUPPORTED", 0x0020),
+    ("IS_EXTENDED_BOLUS_SUPPORTED", 0x0040),
+    ("IS_MULTIWAVE_BOLUS_SUPPORTED", 0x0080),
+    ("IS_INSULIN_ON_BOARD_SUPPORTED", 0x8000),
+)
+
 
+def _build_json(c: config.Config):
     with open(config.CONFIG_PATH, "w", encoding="utf-8") as fp:
         # MicroPython 不支援這些命名參數
         json.dump(c.to_dict(), fp, ensure_ascii=False, indent=4)
 
 
+def _build_bin(c: config.Config):
+    # 需在 _build_json() 之後，config.bin 會記下 config.json 的 CRC
+    config.save_config(c)
+
+
+def _build_const(c: config.Config):
+    """產生可凍結於韌體的 config_const.py，作為沒有設定檔時的預設值"""
+
+    lines = [
+        "# 由 build_config.py 產生，請勿手動修改",
+        "import micropython",
+        "",
+        f"LOCAL_NAME = {c.local_name!r}",
+        f"ADV_INTERVAL_US = micropython.const({c.adv_interval_us})",
+        f"PASSKEY = {c.passkey!r}",
+        f"IDD_FEATURES_INSULIN_CONC = {c.idd_features_insulin_conc!r}",
+        f"IDD_FEATURES_FLAGS = micropython.const({c.idd_features_flags:#08x})",
+        "",
+    ]
+
+    for name, mask in _FEATURE_FLAGS:
+        value = 1 if c.idd_features_flags & mask else 0
+        lines.append(f"{name} = micropython.const({value})")
+
+    with open(CONST_PATH, "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+
+def _build_config():
+    # 以 config.py 中的預設值產生，而非先前產生的 config_const.py
+    config.config_const = None
+    c = config.Config()
+
+    _build_json(c)
+    _build_bin(c)
+    _build_const(c)
+
+
 _build_config()
 c = config.get_config()
 print(c)
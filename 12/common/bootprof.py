@@ -0,0 +1,143 @@
+# MicroPython modules
+import array
+import builtins
+import gc
+import micropython
+import os
+import sys
+import time
+
+
+# 存在此檔案時啟用開機分析，也可在匯入本模組後呼叫 enable()
+_ENABLE_PATH = "bootprof"
+
+_MAX_MARKS = micropython.const(64)
+
+
+_enabled = False
+
+# 每筆記錄的名稱、開始及結束的 ticks_us、開始及結束時的 gc.mem_free()，
+# 以及匯入的層數。mark() 的開始與結束相同
+_names = [None] * _MAX_MARKS
+_start_us = array.array("i", (0,) * _MAX_MARKS)
+_end_us = array.array("i", (0,) * _MAX_MARKS)
+_start_free = array.array("i", (0,) * _MAX_MARKS)
+_end_free = array.array("i", (0,) * _MAX_MARKS)
+_depths = bytearray(_MAX_MARKS)
+_count = 0
+
+_import_depth = 0
+_orig_import = None
+_reported = False
+
+
+def enable():
+    """開始記錄，並攔截之後第一次匯入的模組"""
+
+    global _enabled, _orig_import
+
+    if _enabled:
+        return
+
+    _enabled = True
+    _orig_import = builtins.__import__
+    builtins.__import__ = _import
+    mark("bootprof")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _record(name: str, start_us: int, start_free: int, depth: int) -> int:
+    global _count
+
+    i = _count
+    if i >= _MAX_MARKS:
+        return -1
+
+    _names[i] = name
+    _start_us[i] = start_us
+    _start_free[i] = start_free
+    _end_us[i] = start_us
+    _end_free[i] = start_free
+    _depths[i] = depth
+    _count = i + 1
+    return i
+
+
+def mark(name: str):
+    """記錄目前的時間及可用的 heap"""
+
+    if _enabled:
+        _record(name, time.ticks_us(), gc.mem_free(), _import_depth)
+
+
+def mark_once(name: str):
+    """只記錄第一次，比如第一次廣播"""
+
+    if _enabled:
+        for i in range(_count):
+            if _names[i] == name:
+                return
+
+        mark(name)
+
+
+def _import(name, *args):
+    global _import_depth
+
+    # 已匯入的模組，或是 from . import 這類沒有名稱的相對匯入
+    if not name or name in sys.modules:
+        return _orig_import(name, *args)
+
+    i = _record("import " + name, time.ticks_us(), gc.mem_free(), _import_depth)
+
+    _import_depth += 1
+    try:
+        return _orig_import(name, *args)
+    finally:
+        _import_depth -= 1
+        if i >= 0:
+            _end_us[i] = time.ticks_us()
+            _end_free[i] = gc.mem_free()
+
+
+def report():
+    """輸出開機時間軸，只輸出一次，並停止攔截匯入"""
+
+    global _reported
+
+    if not _enabled or _reported:
+        return
+
+    _reported = True
+    builtins.__import__ = _orig_import
+
+    t0 = _start_us[0]
+    print("#B  start_ms    dur_ms      heap  heap_used  name")
+
+    for i in range(_count):
+        start = time.ticks_diff(_start_us[i], t0)
+        duration = time.ticks_diff(_end_us[i], _start_us[i])
+        used = _start_free[i] - _end_free[i]
+        print(
+            f"#B {start / 1000:9.3f} {duration / 1000:9.3f} {_end_free[i]:9d} "
+            f"{used:10d}  {'  ' * _depths[i]}{_names[i]}"
+        )
+
+    if _count >= _MAX_MARKS:
+        print(f"#B timeline full after {_MAX_MARKS} marks")
+
+
+def _init():
+    # MicroPython 沒有 os.path.exists()
+    try:
+        os.stat(_ENABLE_PATH)
+    except OSError:
+        return
+
+    enable()
+
+
+_init()
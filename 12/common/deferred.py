@@ -0,0 +1,138 @@
+# MicroPython modules
+import asyncio
+import micropython
+
+# Custom modules
+import common.logger
+import common.logmsg
+
+
+# 最多可延後執行的工作數量
+_CAPACITY = micropython.const(16)
+
+# _head 及 _tail 在 0 到 2 * _CAPACITY 間循環，以分辨全滿及全空
+_WRAP = micropython.const(2 * _CAPACITY)
+
+
+_funcs = [None] * _CAPACITY
+_args = [None] * _CAPACITY
+
+# 只由 call() 修改
+_head = 0
+
+# 只由 _drain() 修改
+_tail = 0
+
+# 是否已有 trampoline 在 MicroPython 的排程佇列中
+_scheduled = False
+
+# 排程佇列已滿時，改由 run() 處理
+_wakeup = asyncio.ThreadSafeFlag()
+
+# run() 執行工作時，trampoline 可能在其間執行，此時交給進行中的迴圈處理
+_draining = False
+
+high_water = 0
+dropped = 0
+errors = 0
+schedule_failures = 0
+
+
+def call(func, arg) -> bool:
+    """在 ISR 外執行 func(arg)，可在 ISR 內呼叫，不會配置記憶體。
+
+    所有工作共用一個 trampoline，依序執行，不會佔用 MicroPython 排程佇列的多個位置。
+    func 應預先建立，比如 bound method 需先存起來。佇列已滿時返回 False。"""
+
+    global _head, high_water, dropped
+
+    head = _head
+    depth = (head - _tail) % _WRAP
+    if depth >= _CAPACITY:
+        dropped += 1
+        common.logger.log(common.logmsg.DEFERRED_FULL, depth, dropped)
+        return False
+
+    i = head % _CAPACITY
+    _funcs[i] = func
+    _args[i] = arg
+    _head = (head + 1) % _WRAP
+
+    if depth + 1 > high_water:
+        high_water = depth + 1
+
+    _schedule()
+    return True
+
+
+def _schedule():
+    global _scheduled, schedule_failures
+
+    if _scheduled:
+        return
+
+    # 先設定，trampoline 可能在 schedule() 返回前就執行
+    _scheduled = True
+    try:
+        micropython.schedule(_trampoline, None)
+    except RuntimeError:
+        # MicroPython 的排程佇列已滿
+        _scheduled = False
+        schedule_failures += 1
+        _wakeup.set()
+
+
+def _trampoline(_):
+    global _scheduled
+
+    # 先清除，執行期間加入的工作會再排程一次
+    _scheduled = False
+    _drain()
+
+
+def _drain():
+    global _draining
+
+    if _draining:
+        return
+
+    _draining = True
+    try:
+        _drain_items()
+    finally:
+        _draining = False
+
+        # _drain_items() 最後一次檢查之後、清除 _draining 之前加入的工作，
+        # 其 trampoline 已因 _draining 放棄，需再排程一次
+        if _tail != _head:
+            _schedule()
+
+
+def _drain_items():
+    global _tail, errors
+
+    while _tail != _head:
+        i = _tail % _CAPACITY
+        func = _funcs[i]
+        arg = _args[i]
+        _funcs[i] = None
+        _args[i] = None
+        _tail = (_tail + 1) % _WRAP
+
+        try:
+            func(arg)
+        except Exception as e:
+            errors += 1
+            common.logger.write(f"Deferred call failed: {e!r}")
+
+
+def depth() -> int:
+    return (_head - _tail) % _WRAP
+
+
+async def run():
+    """排程佇列已滿時，由此 asyncio task 執行延後的工作"""
+
+    while True:
+        await _wakeup.wait()
+        _drain()
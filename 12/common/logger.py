@@ -1,12 +1,105 @@
+# MicroPython modules
+import array
 import machine
+import micropython
+import time
+
+
+# 每筆記錄依序為：訊息 ID、time.ticks_us()、3 個整數參數
+_LOG_FIELDS = micropython.const(5)
+_LOG_CAPACITY = micropython.const(128)
+
+# _log_head 及 _log_tail 在 0 到 2 * _LOG_CAPACITY 間循環，以分辨全滿及全空
+_LOG_WRAP = micropython.const(2 * _LOG_CAPACITY)
+
+# 每隔一段時間輸出 RTC 時間，讓主機端將 ticks_us 換算回實際時間
+_ANCHOR_INTERVAL_MS = micropython.const(60_000)
+
+
+_rtc = machine.RTC()
+
+_log_ring = array.array("i", (0,) * (_LOG_FIELDS * _LOG_CAPACITY))
+
+# 只由 log() 修改，log() 可能在主程式執行時被 BLE IRQ 的 callback 打斷，
+# 所以取得欄位時需暫停中斷
+_log_head = 0
+_log_dropped = 0
+
+# 只由 flush() 修改
+_log_tail = 0
+_log_dropped_reported = 0
+_last_anchor_ms = None
 
 
 def write(msg: str):
     """不建議在 ISR 內呼叫。"""
 
-    now = machine.RTC().datetime()
+    now = _rtc.datetime()
     print(
         f"{now[0]}-{now[1]:02d}-{now[2]:02d} "
         f"{now[4]:02d}:{now[5]:02d}:{now[6]:02d}.{now[7]:06d}  "
         f"{msg}"
     )
+
+
+def log(msg_id: int, a: int = 0, b: int = 0, c: int = 0):
+    """將訊息 ID 及最多 3 個 32 位元整數存入 ring，可在 ISR 內呼叫，不會配置記憶體。
+    文字由 flush() 輸出後，再以 tools/log_decode.py 還原，訊息 ID 定義於 common.logmsg。
+    ring 已滿時會丟棄此筆記錄。
+
+    主程式及 IRQ callback 都會呼叫，寫入欄位期間暫停中斷，
+    避免兩者取得同一個欄位而互相覆蓋。"""
+
+    global _log_head, _log_dropped
+
+    irq_state = machine.disable_irq()
+
+    head = _log_head
+    if (head - _log_tail) % _LOG_WRAP >= _LOG_CAPACITY:
+        _log_dropped += 1
+        machine.enable_irq(irq_state)
+        return
+
+    ring = _log_ring
+    i = (head % _LOG_CAPACITY) * _LOG_FIELDS
+    ring[i] = msg_id
+    ring[i + 1] = time.ticks_us()
+    ring[i + 2] = a
+    ring[i + 3] = b
+    ring[i + 4] = c
+
+    _log_head = (head + 1) % _LOG_WRAP
+
+    machine.enable_irq(irq_state)
+
+
+def _write_anchor():
+    now = _rtc.datetime()
+    print("#A", time.ticks_us(), " ".join(str(n) for n in now))
+
+
+def flush():
+    """將 log() 的記錄輸出到序列埠，不可在 ISR 內呼叫。"""
+
+    global _log_tail, _log_dropped_reported, _last_anchor_ms
+
+    now_ms = time.ticks_ms()
+    if (
+        _last_anchor_ms is None
+        or time.ticks_diff(now_ms, _last_anchor_ms) >= _ANCHOR_INTERVAL_MS
+    ):
+        _write_anchor()
+        _last_anchor_ms = now_ms
+
+    ring = _log_ring
+
+    while _log_tail != _log_head:
+        i = (_log_tail % _LOG_CAPACITY) * _LOG_FIELDS
+        print("#L", ring[i], ring[i + 1], ring[i + 2], ring[i + 3], ring[i + 4])
+        _log_tail = (_log_tail + 1) % _LOG_WRAP
+
+    dropped = _log_dropped
+    if dropped != _log_dropped_reported:
+        print("#D", dropped - _log_dropped_reported)
+        _log_dropped_reported = dropped
+
@@ -0,0 +1,18 @@
+# MicroPython modules
+import micropython
+
+
+# common.logger.log() 使用的訊息 ID。
+# 裝置端只存 ID 及整數參數，註解中的文字格式由 tools/log_decode.py 讀取，
+# 以 str.format() 代入參數 {0}、{1}、{2}，{3} 為訊息 ID，
+# {4}、{5} 為 {0} 的低 16 位元及高 16 位元，
+# 連線事件以「位址類型:位址」顯示藍芽位址
+CONNECT = micropython.const(1)  # Connected to {5}:{1:06X}{2:06X} (conn: {4})
+DISCONNECT = micropython.const(2)  # Disconnected from {5}:{1:06X}{2:06X} (conn: {4})
+READ_RSP = micropython.const(3)  # Read response(value_handle: {0}, length: {1})
+NOTIFY = micropython.const(4)  # Notify(value_handle: {0}, length: {1})
+INDICATE = micropython.const(5)  # Indicate(value_handle: {0}, length: {1})
+E2E_REJECT = micropython.const(6)  # E2E reject(handle: {0}, reason: {1}, counter: {2})
+DEFERRED_FULL = micropython.const(7)  # Deferred queue full(depth: {0}, dropped: {1})
+TOO_LONG = micropython.const(8)  # Too long for MTU(handle: {0}, length: {1}, max: {2})
+TX_ERROR = micropython.const(9)  # Send failed(value_handle: {0}, errno: {1})
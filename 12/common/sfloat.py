@@ -1,5 +1,6 @@
 # MicroPython modules
 import math
+import micropython
 
 
 # NAN = 0x07FF
@@ -88,3 +89,203 @@ def float_to_sfloat(value: float) -> int:
         mantissa = -mantissa
 
     return ((exponent & 0x0F) << 12) | (mantissa & 0x0FFF)
+
+
+def _epsilon() -> float:
+    """MicroPython 可能使用單精度浮點數，故於執行時求出機器精度"""
+    eps = 1.0
+    while 1.0 + eps / 2 != 1.0:
+        eps /= 2
+
+    return eps
+
+
+# 快速編碼以一次乘除取代 float_to_sfloat 的逐次乘除，兩者的捨入誤差不同。
+# 結果落在此相對誤差範圍內、可能與 float_to_sfloat 不同時，改用 float_to_sfloat
+_MARGIN = _epsilon() * 64
+
+# 超過此值的數值直接交給 float_to_sfloat 處理，包括 INF 及 NaN
+_FAST_LIMIT = min(1 / _MARGIN, float((1 << 30) - 1))
+
+# 四捨五入時，小數部分與 0.5 的距離需大於此值
+_ROUND_TOL = (_MIN_MANTISSA + 1) * _MARGIN
+
+# 10 的次方表，避免在迴圈中反覆乘除 10
+_POW10 = tuple(10**i for i in range(_MAX_EXPONENT - _MIN_EXPONENT))
+_POW10_F = tuple(float(p) for p in _POW10)
+_HALF_POW10 = tuple(p // 2 for p in _POW10)
+
+
+def _build_up_bounds(mantissa_max: int) -> tuple:
+    """第 k 筆為 mantissa_max / 10^k 的模糊區間，
+    數值不大於下限時可放大 k 次，大於上限時則不行"""
+    return tuple(
+        (mantissa_max / p * (1 - _MARGIN), mantissa_max / p * (1 + _MARGIN))
+        for p in _POW10_F
+    )
+
+
+def _build_down_bounds(mantissa_max: int) -> tuple:
+    """第 j 筆為 mantissa_max * 10^j 的模糊區間"""
+    return tuple(
+        (mantissa_max * p * (1 - _MARGIN), mantissa_max * p * (1 + _MARGIN))
+        for p in _POW10_F
+    )
+
+
+_POS_UP_BOUNDS = _build_up_bounds(_MAX_MANTISSA)
+_NEG_UP_BOUNDS = _build_up_bounds(_MIN_MANTISSA)
+_POS_DOWN_BOUNDS = _build_down_bounds(_MAX_MANTISSA)
+_NEG_DOWN_BOUNDS = _build_down_bounds(_MIN_MANTISSA)
+
+
+@micropython.native
+def encode(value: float) -> int:
+    """結果與 float_to_sfloat 相同，但以查表取代迴圈中的浮點乘除。
+    整數只使用整數運算；非整數只需一次乘除及四捨五入。"""
+
+    if value == 0:
+        return 0
+
+    if value < 0:
+        magnitude = -value
+        is_negative = True
+        mantissa_max = _MIN_MANTISSA
+    else:
+        magnitude = value
+        is_negative = False
+        mantissa_max = _MAX_MANTISSA
+
+    if not magnitude <= _FAST_LIMIT:
+        return float_to_sfloat(value)
+
+    n = int(magnitude)
+    exponent = 0
+
+    if n == magnitude:
+        mantissa = n
+
+        if n > mantissa_max:
+            # 找出最小的 exponent，使 n / 10^exponent 不超出規範
+            exponent = 1
+            while exponent < _MAX_EXPONENT and n > mantissa_max * _POW10[exponent]:
+                exponent += 1
+
+            mantissa = (n + _HALF_POW10[exponent]) // _POW10[exponent]
+
+    else:
+        if magnitude <= mantissa_max:
+            bounds = _POS_UP_BOUNDS if mantissa_max == _MAX_MANTISSA else _NEG_UP_BOUNDS
+
+            # 放大數值，好儘量保存小數部分
+            k = 0
+            while k < -_MIN_EXPONENT:
+                lo, hi = bounds[k + 1]
+                if magnitude <= lo:
+                    k += 1
+                elif magnitude > hi:
+                    break
+                else:
+                    return float_to_sfloat(value)
+
+            scaled = magnitude * _POW10_F[k]
+            exponent = -k
+
+        else:
+            bounds = (
+                _POS_DOWN_BOUNDS if mantissa_max == _MAX_MANTISSA else _NEG_DOWN_BOUNDS
+            )
+
+            # 縮小數值，好讓數值不超出規範
+            exponent = 1
+            while exponent < _MAX_EXPONENT:
+                lo, hi = bounds[exponent]
+                if magnitude <= lo:
+                    break
+                elif magnitude > hi:
+                    exponent += 1
+                else:
+                    return float_to_sfloat(value)
+
+            scaled = magnitude / _POW10_F[exponent]
+
+        # 四捨五入；有乘除過的數值，小數部分太接近 0.5 時，
+        # 無法確定與逐次乘除的結果相同
+        rounded = scaled + 0.5
+        mantissa = int(rounded)
+        if exponent != 0:
+            fraction = rounded - mantissa
+            if fraction < _ROUND_TOL or fraction > 1 - _ROUND_TOL:
+                return float_to_sfloat(value)
+
+    # 處理 SFloat 的特殊值
+    if exponent == 0 and mantissa >= _MIN_SPECIAL_MANTISSA:
+        exponent = 1
+        mantissa = (mantissa + 5) // 10
+
+    # 縮小數值，以儲存最少的 mantissa
+    while exponent < _MAX_EXPONENT and mantissa % 10 == 0:
+        mantissa //= 10
+        exponent += 1
+
+    if mantissa > mantissa_max:
+        return NRES
+
+    elif is_negative:
+        mantissa = -mantissa
+
+    return ((exponent & 0x0F) << 12) | (mantissa & 0x0FFF)
+
+
+@micropython.native
+def encode_into(buf: bytearray | memoryview, offset: int, values) -> int:
+    """將多個數值以 SFLOAT（little-endian）依序寫入 buf，返回寫入後的位置"""
+
+    for value in values:
+        n = encode(value)
+        buf[offset] = n & 0xFF
+        buf[offset + 1] = (n >> 8) & 0xFF
+        offset += 2
+
+    return offset
+
+
+def encode_scaled(mantissa: int, exponent: int) -> int:
+    """將 mantissa * 10^exponent 轉為 SFLOAT，只使用整數運算。
+    比如以 0.01 IU 為單位的 1234，可用 encode_scaled(1234, -2) 轉換。"""
+
+    # 保留特殊值 0x07FE ~ 0x0802，最多縮小 _MAX_EXPONENT - _MIN_EXPONENT 次
+    while (mantissa > 2045 or mantissa < -2045) and exponent < _MAX_EXPONENT:
+        if mantissa >= 0:
+            mantissa = (mantissa + 5) // 10
+        else:
+            mantissa = -((-mantissa + 5) // 10)
+
+        exponent += 1
+
+    if mantissa > 2045 or mantissa < -2045:
+        return NRES
+
+    return ((exponent & 0x0F) << 12) | (mantissa & 0x0FFF)
+
+
+def encode_float_scaled_into(
+    buf: bytearray | memoryview, offset: int, mantissa: int, exponent: int
+) -> int:
+    """將 mantissa * 10^exponent 以 32 位元的 FLOAT（24 位元 mantissa）寫入 buf，
+    返回寫入後的位置。直接寫入各個位元組，避免產生超出 small int 的整數。"""
+
+    # 保留特殊值 0x7FFFFE ~ 0x800002
+    while mantissa > 0x7FFFFD or mantissa < -0x7FFFFD:
+        if mantissa >= 0:
+            mantissa = (mantissa + 5) // 10
+        else:
+            mantissa = -((-mantissa + 5) // 10)
+
+        exponent += 1
+
+    buf[offset] = mantissa & 0xFF
+    buf[offset + 1] = (mantissa >> 8) & 0xFF
+    buf[offset + 2] = (mantissa >> 16) & 0xFF
+    buf[offset + 3] = exponent & 0xFF
+    return offset + 4
@@ -0,0 +1,214 @@
+# MicroPython modules
+import asyncio
+import micropython
+import time
+
+# Custom modules
+import common.logger
+
+
+# 發生例外後重新啟動前的等待時間，每次失敗加倍
+_RESTART_MIN_MS = micropython.const(100)
+_RESTART_MAX_MS = micropython.const(10_000)
+
+# 執行超過這段時間才發生例外的工作，視為先前運作正常，等待時間從頭計算
+_RESTART_STABLE_MS = micropython.const(60_000)
+
+_KIND_TASK = micropython.const(0)
+_KIND_PERIODIC = micropython.const(1)
+_KIND_EVENT = micropython.const(2)
+
+_STATE_NAMES = ("idle", "running", "done", "cancelled", "failed")
+_STATE_IDLE = micropython.const(0)
+_STATE_RUNNING = micropython.const(1)
+_STATE_DONE = micropython.const(2)
+_STATE_CANCELLED = micropython.const(3)
+_STATE_FAILED = micropython.const(4)
+
+
+class Job:
+    """Supervisor 管理的一個工作及其統計"""
+
+    def __init__(self, name: str, kind: int, func, arg, restart: bool):
+        self.name = name
+        self.kind = kind
+        self.func = func
+        self.arg = arg
+        self.restart = restart
+
+        self.task = None
+        self.state = _STATE_IDLE
+
+        # 執行次數、總執行時間及最長一次的時間（微秒），
+        # 長時間執行的 task 以每次恢復執行到讓出執行權為一次
+        self.runs = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.restarts = 0
+
+    def account(self, us: int):
+        self.runs += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+
+
+class _Timed:
+    """包裝 coroutine，記錄每次恢復執行到讓出執行權的時間"""
+
+    def __init__(self, job: Job, coro):
+        self._job = job
+        self._coro = coro
+
+    def __iter__(self):
+        return self
+
+    __await__ = __iter__
+
+    def __next__(self):
+        return self.send(None)
+
+    def send(self, value):
+        start = time.ticks_us()
+        try:
+            return self._coro.send(value)
+        finally:
+            self._job.account(time.ticks_diff(time.ticks_us(), start))
+
+    def throw(self, *args):
+        start = time.ticks_us()
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._job.account(time.ticks_diff(time.ticks_us(), start))
+
+
+class Supervisor:
+    """管理背景 asyncio task 的地方。
+
+    有三種工作：
+    - add_task()：長時間執行的 coroutine，比如各個 Control Point 的 run()
+    - add_periodic()：每隔 interval_ms 呼叫一次的函數
+    - add_event()：ThreadSafeFlag 被設定時呼叫的函數
+    每次呼叫或 task 每次恢復執行都會記錄執行時間。發生例外時記錄並重新啟動，
+    可個別取消。"""
+
+    def __init__(self):
+        self._jobs: dict[str, Job] = {}
+        self._started = False
+        self._stop = asyncio.ThreadSafeFlag()
+
+    def add_task(self, name: str, coro_func, *, restart: bool = True) -> Job:
+        """coro_func() 返回要執行的 coroutine，正常結束時不會重新啟動"""
+        return self._add(Job(name, _KIND_TASK, coro_func, None, restart))
+
+    def add_periodic(
+        self, name: str, func, interval_ms: int, *, restart: bool = True
+    ) -> Job:
+        """func() 可以是一般函數或 async 函數"""
+        return self._add(Job(name, _KIND_PERIODIC, func, interval_ms, restart))
+
+    def add_event(
+        self, name: str, func, flag: asyncio.ThreadSafeFlag, *, restart: bool = True
+    ) -> Job:
+        return self._add(Job(name, _KIND_EVENT, func, flag, restart))
+
+    def _add(self, job: Job) -> Job:
+        if job.name in self._jobs:
+            raise ValueError(f"Duplicate job: {job.name}")
+
+        self._jobs[job.name] = job
+
+        if self._started:
+            self._start(job)
+
+        return job
+
+    def _start(self, job: Job):
+        job.state = _STATE_RUNNING
+        job.task = asyncio.create_task(self._supervise(job))
+
+    def cancel(self, name: str) -> bool:
+        job = self._jobs.get(name)
+        if job is None or job.state != _STATE_RUNNING:
+            return False
+
+        job.state = _STATE_CANCELLED
+        job.task.cancel()
+        return True
+
+    async def _supervise(self, job: Job):
+        delay_ms = _RESTART_MIN_MS
+
+        while True:
+            start_ms = time.ticks_ms()
+            try:
+                await self._run_job(job)
+                job.state = _STATE_DONE
+                return
+
+            except asyncio.CancelledError:
+                job.state = _STATE_CANCELLED
+                raise
+
+            except Exception as e:
+                common.logger.write(f"Task {job.name} failed: {e!r}")
+
+                if not job.restart:
+                    job.state = _STATE_FAILED
+                    return
+
+            if time.ticks_diff(time.ticks_ms(), start_ms) >= _RESTART_STABLE_MS:
+                delay_ms = _RESTART_MIN_MS
+
+            # 等待後重新啟動，避免一直失敗的工作佔用執行時間
+            job.restarts += 1
+            await asyncio.sleep_ms(delay_ms)
+            delay_ms = min(delay_ms * 2, _RESTART_MAX_MS)
+
+    async def _run_job(self, job: Job):
+        if job.kind == _KIND_TASK:
+            await _Timed(job, job.func())
+            return
+
+        while True:
+            if job.kind == _KIND_EVENT:
+                await job.arg.wait()
+
+            start = time.ticks_us()
+            r = job.func()
+            if r is not None and hasattr(r, "send"):
+                await r
+
+            us = time.ticks_diff(time.ticks_us(), start)
+            job.account(us)
+
+            if job.kind == _KIND_PERIODIC:
+                # 扣掉執行的時間，但至少讓出一次執行權
+                await asyncio.sleep_ms(max(job.arg - us // 1000, 0))
+
+    async def run(self):
+        """啟動所有工作，直到呼叫 stop()"""
+
+        self._started = True
+        for job in self._jobs.values():
+            self._start(job)
+
+        await self._stop.wait()
+
+        for name in self._jobs:
+            self.cancel(name)
+
+    def stop(self):
+        self._stop.set()
+
+    def dump(self):
+        """輸出每個工作的狀態及執行時間（微秒）"""
+
+        for job in self._jobs.values():
+            avg_us = job.total_us // job.runs if job.runs else 0
+            print(
+                f"#T {job.name} {_STATE_NAMES[job.state]} runs {job.runs} "
+                f"total {job.total_us} avg {avg_us} max {job.max_us} "
+                f"restarts {job.restarts}"
+            )
@@ -9,6 +9,26 @@ def write_uint24(result: bytearray | memoryview, index: int, value: int):
     result[index + 2] = (value >> 16) & 0xFF
 
 
+def write_uint32(result: bytearray | memoryview, index: int, value: int):
+    result[index] = value & 0xFF
+    result[index + 1] = (value >> 8) & 0xFF
+    result[index + 2] = (value >> 16) & 0xFF
+    result[index + 3] = (value >> 24) & 0xFF
+
+
+def read_uint16(data: bytes | bytearray | memoryview, index: int) -> int:
+    return data[index] | (data[index + 1] << 8)
+
+
+def read_uint32(data: bytes | bytearray | memoryview, index: int) -> int:
+    return (
+        data[index]
+        | (data[index + 1] << 8)
+        | (data[index + 2] << 16)
+        | (data[index + 3] << 24)
+    )
+
+
 def array_to_hex_str(
     array: list[int] | tuple[int, ...] | bytes | memoryview | None,
     is_array_format: bool = True,
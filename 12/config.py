@@ -1,19 +1,61 @@
 # MicroPython modules
+import binascii
 import json
 import os
+import struct
+
+# 由 build_config.py 產生，凍結於韌體中的預設值
+try:
+    import config_const
+except ImportError:
+    config_const = None
 
 
 CONFIG_PATH = "config.json"
+CONFIG_BIN_PATH = "config.bin"
+
+# 無法直接覆蓋 config.bin 時，新檔改名完成前保留的舊檔
+_BIN_BAK_PATH = CONFIG_BIN_PATH + ".bak"
+
+# Magic、版本、產生時 config.json 的 CRC-32、adv_interval_us、
+# idd_features_insulin_conc、idd_features_flags，
+# 以及各自帶有長度的 passkey 及 local_name（UTF-8）
+_BIN_MAGIC = b"IDSC"
+_BIN_VERSION = 2
+_BIN_FORMAT = "<4sBIIfIB8sB32s"
+BIN_SIZE = struct.calcsize(_BIN_FORMAT)
+
+# 掃描回應最多 31 bytes，扣除長度及型態後為 local name 的上限
+_MAX_LOCAL_NAME_SIZE = 29
+
+# 配對密碼為 6 位數字，_BIN_FORMAT 中保留 8 bytes
+_PASSKEY_SIZE = 6
+
+# BLE 廣播間隔的範圍
+_MIN_ADV_INTERVAL_US = 20_000
+_MAX_ADV_INTERVAL_US = 10_240_000
+
+# 改變這些 flags 需要重新註冊 GATT 服務，執行時不能修改
+_FIXED_FEATURE_FLAGS = 0x0001
 
 
 class Config:
     def __init__(self):
-        self.local_name = "IDS 🍭"
-        self.adv_interval_us = 250_000
-        self.passkey = "123456"
+        if config_const is not None:
+            self.local_name = config_const.LOCAL_NAME
+            self.adv_interval_us = config_const.ADV_INTERVAL_US
+            self.passkey = config_const.PASSKEY
+
+            self.idd_features_insulin_conc = config_const.IDD_FEATURES_INSULIN_CONC
+            self.idd_features_flags = config_const.IDD_FEATURES_FLAGS
+        else:
+            self.local_name = "IDS 🍭"
+            self.adv_interval_us = 250_000
+            self.passkey = "123456"
+
+            self.idd_features_insulin_conc = 100
+            self.idd_features_flags = 0b_0000_0000_0000_0001_1110_0001
 
-        self.idd_features_insulin_conc = 100
-        self.idd_features_flags = 0b_0000_0000_0000_0001_1110_0001
         self._refresh(self.idd_features_flags)
 
     def _refresh(self, flags):
@@ -34,6 +76,18 @@ class Config:
         # self.is_target_glucose_range_profile_template_supported = bool(flags & 0x4000)
         # self.is_insulin_on_board_supported = bool(flags & 0x8000)
 
+    def set_value(self, name: str, value):
+        """檢查並修改一個設定值，數值不合法時 raise ValueError"""
+
+        _check_value(name, value)
+
+        if name == "idd_features_flags":
+            if (value ^ self.idd_features_flags) & _FIXED_FEATURE_FLAGS:
+                raise ValueError("E2E protection cannot be changed at runtime")
+
+        setattr(self, name, value)
+        self._refresh(self.idd_features_flags)
+
     def to_dict(self) -> dict[str, str | int | tuple]:
         return {
             "local_name": self.local_name,
@@ -45,6 +99,17 @@ class Config:
 
     @classmethod
     def from_dict(cls, d: dict[str, str | int | tuple]):
+        """數值不合法時 raise ValueError"""
+
+        for name in (
+            "local_name",
+            "adv_interval_us",
+            "passkey",
+            "idd_features_insulin_conc",
+            "idd_features_flags",
+        ):
+            _check_value(name, d[name])
+
         obj = cls()
 
         obj.local_name = d["local_name"]
@@ -57,14 +122,187 @@ class Config:
 
         return obj
 
+    def to_bytes(self, json_crc: int = 0) -> bytes:
+        """json_crc 為產生時 config.json 的 CRC-32。
+        欄位超過 _BIN_FORMAT 的長度時 raise ValueError，不會截斷"""
 
-def get_config():
-    # MicroPython 沒有 os.path.exists()
-    if CONFIG_PATH in os.listdir():
+        passkey = self.passkey.encode()
+        local_name = self.local_name.encode()
+
+        if len(passkey) != _PASSKEY_SIZE:
+            raise ValueError("Invalid passkey")
+
+        if len(local_name) > _MAX_LOCAL_NAME_SIZE:
+            raise ValueError("Invalid local name")
+
+        return struct.pack(
+            _BIN_FORMAT,
+            _BIN_MAGIC,
+            _BIN_VERSION,
+            json_crc,
+            self.adv_interval_us,
+            self.idd_features_insulin_conc,
+            self.idd_features_flags,
+            len(passkey),
+            passkey,
+            len(local_name),
+            local_name,
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview):
+        (
+            magic,
+            version,
+            _,
+            adv_interval_us,
+            insulin_conc,
+            flags,
+            passkey_len,
+            passkey,
+            local_name_len,
+            local_name,
+        ) = struct.unpack_from(_BIN_FORMAT, data)
+
+        if magic != _BIN_MAGIC or version != _BIN_VERSION:
+            raise ValueError("Invalid configuration data")
+
+        # 整數的濃度以整數保存，與 JSON 的結果一致
+        if insulin_conc == int(insulin_conc):
+            insulin_conc = int(insulin_conc)
+
+        return cls.from_dict(
+            {
+                "local_name": local_name[:local_name_len].decode(),
+                "adv_interval_us": adv_interval_us,
+                "passkey": passkey[:passkey_len].decode(),
+                "idd_features_insulin_conc": insulin_conc,
+                "idd_features_flags": flags,
+            }
+        )
+
+
+def _check_value(name: str, value):
+    """數值不合法時 raise ValueError"""
+
+    if name == "local_name":
+        if not value or len(value.encode()) > _MAX_LOCAL_NAME_SIZE:
+            raise ValueError("Invalid local name")
+
+    elif name == "adv_interval_us":
+        if not _MIN_ADV_INTERVAL_US <= value <= _MAX_ADV_INTERVAL_US:
+            raise ValueError("Invalid advertising interval")
+
+    elif name == "passkey":
+        if len(value) != _PASSKEY_SIZE or not value.isdigit():
+            raise ValueError("Invalid passkey")
+
+    elif name == "idd_features_insulin_conc":
+        if not 0 < value <= 1000:
+            raise ValueError("Invalid insulin concentration")
+
+    elif name == "idd_features_flags":
+        if not 0 <= value <= 0xFFFFFF:
+            raise ValueError("Invalid feature flags")
+
+    else:
+        raise ValueError("Unknown setting")
+
+
+def _json_crc() -> int | None:
+    """config.json 內容的 CRC-32，檔案不存在時返回 None"""
+
+    try:
+        with open(CONFIG_PATH, "rb") as fp:
+            return binascii.crc32(fp.read())
+    except OSError:
+        return None
+
+
+def _load_bin(json_crc: int | None) -> Config | None:
+    """讀取 config.bin，不存在時改讀 save_config() 未完成時留下的舊檔。
+    json_crc 與產生時記下的 CRC 不同時，代表之後修改過 config.json，返回 None"""
+
+    buf = bytearray(BIN_SIZE)
+
+    try:
+        with open(CONFIG_BIN_PATH, "rb") as fp:
+            n = fp.readinto(buf)
+    except OSError:
+        try:
+            with open(_BIN_BAK_PATH, "rb") as fp:
+                n = fp.readinto(buf)
+        except OSError:
+            return None
+
+    if n != BIN_SIZE:
+        return None
+
+    if json_crc is not None and struct.unpack_from("<I", buf, 5)[0] != json_crc:
+        print(f"{CONFIG_PATH} was modified after {CONFIG_BIN_PATH}")
+        return None
+
+    try:
+        return Config.from_bytes(buf)
+    except ValueError:
+        return None
+
+
+def _load_json() -> Config | None:
+    try:
         with open(CONFIG_PATH, encoding="utf-8") as fp:
             data = json.load(fp)
+    except OSError:
+        return None
 
+    try:
         return Config.from_dict(data)
-    else:
-        print("No configuration file")
-        return Config()
+    except (KeyError, ValueError) as e:
+        print(f"Invalid {CONFIG_PATH}: {e}")
+        return None
+
+
+def save_config(c: Config):
+    """寫入 config.bin，並記下目前 config.json 的 CRC，之後開機時優先使用。
+    先寫入暫存檔再改名，斷電時不會留下不完整的設定檔"""
+
+    data = c.to_bytes(_json_crc() or 0)
+
+    tmp_path = CONFIG_BIN_PATH + ".tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(data)
+
+    try:
+        os.rename(tmp_path, CONFIG_BIN_PATH)
+    except OSError:
+        # FAT 無法覆蓋已存在的檔案，littlefs 則可直接覆蓋。
+        # 舊檔先改名保留，新檔改名完成前斷電時，_load_bin() 會改讀舊檔
+        try:
+            os.remove(_BIN_BAK_PATH)
+        except OSError:
+            pass
+
+        os.rename(CONFIG_BIN_PATH, _BIN_BAK_PATH)
+        os.rename(tmp_path, CONFIG_BIN_PATH)
+
+    # 新檔已就緒，刪除這次或之前未完成時留下的舊檔
+    try:
+        os.remove(_BIN_BAK_PATH)
+    except OSError:
+        pass
+
+
+def get_config():
+    # 優先讀取 build_config.py 或 save_config() 產生的二進位設定，不需解析 JSON。
+    # config.bin 記下了當時 config.json 的 CRC，不同時代表之後修改過 JSON，改讀 JSON。
+    # RTC 每次開機都從 2000 年開始，檔案的修改時間不可靠
+    c = _load_bin(_json_crc())
+    if c is not None:
+        return c
+
+    c = _load_json()
+    if c is not None:
+        return c
+
+    print("No configuration file")
+    return Config()
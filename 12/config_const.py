@@ -0,0 +1,18 @@
+# 由 build_config.py 產生，請勿手動修改
+import micropython
+
+LOCAL_NAME = 'IDS 🍭'
+ADV_INTERVAL_US = micropython.const(250000)
+PASSKEY = '123456'
+IDD_FEATURES_INSULIN_CONC = 100
+IDD_FEATURES_FLAGS = micropython.const(0x0001e1)
+
+IS_E2E_PROTECTION_SUPPORTED = micropython.const(1)
+IS_BASAL_RATE_SUPPORTED = micropython.const(0)
+IS_TBR_ABSOLUTE_SUPPORTED = micropython.const(0)
+IS_TBR_RELATIVE_SUPPORTED = micropython.const(0)
+IS_TBR_TEMPLATE_SUPPORTED = micropython.const(0)
+IS_FAST_BOLUS_SUPPORTED = micropython.const(1)
+IS_EXTENDED_BOLUS_SUPPORTED = micropython.const(1)
+IS_MULTIWAVE_BOLUS_SUPPORTED = micropython.const(1)
+IS_INSULIN_ON_BOARD_SUPPORTED = micropython.const(0)
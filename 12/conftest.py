@@ -0,0 +1,4 @@
+# 在 CPython 上執行 pytest 時，補上 MicroPython 特有的模組及函數
+import tools.cpython
+
+tools.cpython.install()
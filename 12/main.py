@@ -2,13 +2,18 @@
 import asyncio
 
 # Custom modules
+import common.bootprof
+
+# 開機分析啟用時，會記錄之後每個模組的匯入時間
+common.bootprof.mark("main")
+
 import ble.server
 import common.logger
 
 
 async def main():
     server = ble.server.instance
-    server.register_services()
+    server.start()
 
     common.logger.write(
         f"IDS value handles: {tuple(c.value_handle for c in server.srvs[0].chars)}"
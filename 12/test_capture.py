@@ -0,0 +1,39 @@
+import io
+import struct
+import time
+
+import ble.capture
+
+
+# Wireshark 解碼 btsnoop 時間所用的差值：西元 0 年到 1970-01-01 的微秒數
+_WIRESHARK_DELTA_US = 0x00DCDDB30F2F8000
+
+_UNIX_TIME = 1_700_000_000
+
+
+def _record_seconds(capture: ble.capture.Capture) -> float:
+    fp = io.BytesIO()
+    assert capture.drain(fp) == 1
+
+    timestamp = struct.unpack_from(">q", fp.getvalue(), 16)[0]
+    return (timestamp - _WIRESHARK_DELTA_US) / 1_000_000
+
+
+def test_timestamp_unix_epoch(monkeypatch):
+    monkeypatch.setattr(time, "time", lambda: _UNIX_TIME)
+
+    capture = ble.capture.Capture(slots=4)
+    capture.record(ble.capture.ATT_NOTIFY, 0, 3, b"\x01")
+
+    assert abs(_record_seconds(capture) - _UNIX_TIME) < 1
+
+
+def test_timestamp_2000_epoch(monkeypatch):
+    # MicroPython 部分 port 的 time.time() 從 2000-01-01 起算
+    monkeypatch.setattr(time, "time", lambda: _UNIX_TIME - 946_684_800)
+    monkeypatch.setattr(time, "gmtime", lambda _: (2000, 1, 1, 0, 0, 0, 5, 1))
+
+    capture = ble.capture.Capture(slots=4)
+    capture.record(ble.capture.ATT_WRITE_REQ, 0, 3, b"\x01", received=True)
+
+    assert abs(_record_seconds(capture) - _UNIX_TIME) < 1
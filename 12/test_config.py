@@ -0,0 +1,161 @@
+import json
+import os
+
+import pytest
+
+import config
+
+
+def _write_json(d: dict):
+    with open(config.CONFIG_PATH, "w", encoding="utf-8") as fp:
+        json.dump(d, fp)
+
+
+def test_bytes_round_trip():
+    c = config.Config()
+    c.set_value("local_name", "Pump 🍭")
+    c.set_value("passkey", "987654")
+    c.set_value("idd_features_insulin_conc", 200)
+
+    data = c.to_bytes()
+    assert len(data) == config.BIN_SIZE
+    assert config.Config.from_bytes(data).to_dict() == c.to_dict()
+
+
+def test_to_bytes_rejects_long_fields():
+    c = config.Config()
+    c.passkey = "123456789"
+    with pytest.raises(ValueError):
+        c.to_bytes()
+
+    c = config.Config()
+    c.local_name = "x" * 33
+    with pytest.raises(ValueError):
+        c.to_bytes()
+
+
+def test_from_dict_validates():
+    d = config.Config().to_dict()
+    assert config.Config.from_dict(d).to_dict() == d
+
+    for name, value in (
+        ("passkey", "123456789"),
+        ("passkey", "12a456"),
+        ("local_name", "x" * 30),
+        ("adv_interval_us", 0),
+        ("idd_features_insulin_conc", 0),
+        ("idd_features_flags", 1 << 24),
+    ):
+        with pytest.raises(ValueError):
+            config.Config.from_dict(dict(d, **{name: value}))
+
+
+def test_set_value_keeps_e2e_flag():
+    c = config.Config()
+    with pytest.raises(ValueError):
+        c.set_value("idd_features_flags", c.idd_features_flags ^ 0x0001)
+
+    with pytest.raises(ValueError):
+        c.set_value("unknown", 1)
+
+
+def test_modified_json_wins_over_bin(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    c = config.Config()
+    _write_json(c.to_dict())
+
+    # build_config.py 或 save_config() 之後，config.bin 記下 config.json 的 CRC
+    c.set_value("local_name", "From bin")
+    config.save_config(c)
+    assert config.get_config().local_name == "From bin"
+
+    # 之後修改 config.json，即使 config.bin 的修改時間較新也改讀 JSON
+    _write_json(dict(c.to_dict(), local_name="From JSON"))
+    os.utime(config.CONFIG_PATH, (1_000_000, 1_000_000))
+    os.utime(config.CONFIG_BIN_PATH, (2_000_000, 2_000_000))
+    assert config.get_config().local_name == "From JSON"
+
+    # 沒有 config.json 時使用 config.bin
+    os.remove(config.CONFIG_PATH)
+    assert config.get_config().local_name == "From bin"
+
+
+def test_invalid_files_fall_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    d = dict(config.Config().to_dict(), passkey="123456789")
+    _write_json(d)
+    with open(config.CONFIG_BIN_PATH, "wb") as fp:
+        fp.write(b"\xff" * config.BIN_SIZE)
+
+    assert config.get_config().passkey == config.Config().passkey
+
+
+def test_save_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    c = config.Config()
+    c.set_value("adv_interval_us", 500_000)
+    config.save_config(c)
+    config.save_config(c)
+
+    assert config.get_config().adv_interval_us == 500_000
+    assert not os.path.exists(config.CONFIG_BIN_PATH + ".tmp")
+
+
+def _fat_rename(monkeypatch, fail_at: int = -1):
+    """模擬 FAT：目的檔存在時改名失敗；第 fail_at 次改名時模擬斷電"""
+
+    rename = os.rename
+    calls = []
+
+    def fat_rename(src, dst):
+        calls.append((src, dst))
+        if len(calls) == fail_at:
+            raise RuntimeError("power loss")
+
+        if os.path.exists(dst):
+            raise OSError(17)
+
+        rename(src, dst)
+
+    monkeypatch.setattr(os, "rename", fat_rename)
+    return calls
+
+
+def test_save_config_without_overwrite(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    _fat_rename(monkeypatch)
+
+    c = config.Config()
+    config.save_config(c)
+    c.set_value("adv_interval_us", 500_000)
+    config.save_config(c)
+
+    assert config.get_config().adv_interval_us == 500_000
+    assert sorted(os.listdir(tmp_path)) == [config.CONFIG_BIN_PATH]
+
+
+def test_interrupted_save_keeps_old_config(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    c = config.Config()
+    c.set_value("adv_interval_us", 500_000)
+    config.save_config(c)
+
+    # 舊檔已改名，新檔尚未改名時斷電
+    calls = _fat_rename(monkeypatch, fail_at=3)
+    c.set_value("adv_interval_us", 1_000_000)
+    with pytest.raises(RuntimeError):
+        config.save_config(c)
+
+    assert calls[1] == (config.CONFIG_BIN_PATH, config.CONFIG_BIN_PATH + ".bak")
+    assert not os.path.exists(config.CONFIG_BIN_PATH)
+    assert config.get_config().adv_interval_us == 500_000
+
+    # 下次儲存時不受留下的檔案影響
+    _fat_rename(monkeypatch)
+    config.save_config(c)
+    assert config.get_config().adv_interval_us == 1_000_000
+    assert sorted(os.listdir(tmp_path)) == [config.CONFIG_BIN_PATH]
@@ -0,0 +1,149 @@
+import ble.ids.command
+import ble.ids.state
+import ble.ids.statusreader
+import ble.txqueue
+
+
+_CONN = 0
+
+_SUCCESS = 0x0F
+_OP_CODE_NOT_SUPPORTED = 0x70
+_INVALID_OPERAND = 0x71
+_PARAMETER_OUT_OF_RANGE = 0x73
+_PROCEDURE_NOT_APPLICABLE = 0x74
+
+
+class _Queue:
+    def __init__(self):
+        self.conn_handle = _CONN
+        self.indications = []
+
+    def indicate(self, value_handle, data) -> bool:
+        self.indications.append(bytes(data))
+        return True
+
+
+def _request(cp, data: bytes) -> bytes:
+    """寫入一個要求，返回回覆的 indication"""
+
+    queue = _Queue()
+    ble.txqueue._queues.append(queue)
+    try:
+        cp._dispatch(_CONN, memoryview(data), len(data))
+    finally:
+        ble.txqueue._queues.remove(queue)
+
+    assert len(queue.indications) == 1
+    return queue.indications[0]
+
+
+def _rsp(rsp_opcode: int, request_opcode: int, rsp_code: int) -> bytes:
+    return (
+        rsp_opcode.to_bytes(2, "little")
+        + request_opcode.to_bytes(2, "little")
+        + bytes((rsp_code,))
+    )
+
+
+def _status_rsp(request_opcode: int, rsp_code: int) -> bytes:
+    return _rsp(0x0303, request_opcode, rsp_code)
+
+
+def _command_rsp(request_opcode: int, rsp_code: int) -> bytes:
+    return _rsp(0x0F55, request_opcode, rsp_code)
+
+
+def test_status_reader_errors():
+    cp = ble.ids.statusreader.IddStatusReaderCp(ble.ids.state.IddState())
+
+    assert _request(cp, b"\x00\x01") == _status_rsp(0x0100, _OP_CODE_NOT_SUPPORTED)
+    assert _request(cp, b"\x30\x03\x00") == _status_rsp(0x0330, _INVALID_OPERAND)
+    assert _request(cp, b"\xa6\x03\x0f") == _status_rsp(0x03A6, _INVALID_OPERAND)
+    assert _request(cp, b"\x65\x03") == _status_rsp(0x0365, _PROCEDURE_NOT_APPLICABLE)
+    assert _request(cp, b"\xa6\x03\x0f\x01") == _status_rsp(
+        0x03A6, _PARAMETER_OUT_OF_RANGE
+    )
+
+
+def test_status_reader_values():
+    state = ble.ids.state.IddState()
+    state.active_bolus_ids[0] = 0x1234
+    state.active_bolus_ids[1] = 0x0056
+    state.active_bolus_count = 2
+    state.basal_template_number = 3
+    state.basal_rate = 150
+    state.total_daily_bolus = 1200
+    state.total_daily_basal = 2400
+    state.delivered_bolus = 5
+    state.delivered_basal = 100_000
+    state.insulin_on_board = 250
+    state.set_counter(
+        ble.ids.state.COUNTER_LIFETIME, ble.ids.state.COUNTER_ELAPSED, 0x01020304
+    )
+    state.status_changed = 0x0007
+    cp = ble.ids.statusreader.IddStatusReaderCp(state)
+
+    assert _request(cp, b"\x30\x03") == b"\x3f\x03\x02\x34\x12\x56\x00"
+
+    # 1.50 IU/h：FLOAT mantissa 150、exponent -2
+    assert _request(cp, b"\x65\x03") == b"\x6a\x03\x00\x03\x96\x00\x00\xfe"
+
+    # SFLOAT 12.00、24.0、36.0，超過 mantissa 上限時降低精確度
+    assert _request(cp, b"\x95\x03") == b"\x9a\x03\xb0\xe4\xf0\xf0\x68\xf1"
+
+    assert _request(cp, b"\xa6\x03\x0f\x33") == b"\xa9\x03\x0f\x33\x04\x03\x02\x01"
+
+    assert _request(cp, b"\xc0\x03") == (
+        b"\xcf\x03" + b"\x05\x00\x00\xfe" + b"\xa0\x86\x01\xfe"
+    )
+
+    # SFLOAT 2.50
+    assert _request(cp, b"\xf3\x03") == b"\xfc\x03\x00\xfa\xe0"
+
+    # 非 Hamming 編碼的舊 Op Code 不再接受
+    assert _request(cp, b"\xc9\x03") == _status_rsp(0x03C9, _OP_CODE_NOT_SUPPORTED)
+    assert _request(cp, b"\xf0\x03") == _status_rsp(0x03F0, _OP_CODE_NOT_SUPPORTED)
+
+    assert _request(cp, b"\x0c\x03\x05\x00") == _status_rsp(0x030C, _SUCCESS)
+    assert state.status_changed == 0x0002
+
+
+def test_command_therapy_and_flight_mode():
+    state = ble.ids.state.IddState()
+    cp = ble.ids.command.IddCommandCp(state)
+
+    assert _request(cp, b"\x5a\x0f\x55") == _command_rsp(0x0F5A, _SUCCESS)
+    assert state.therapy_control_state == ble.ids.state.THERAPY_RUN
+
+    assert _request(cp, b"\x5a\x0f\x01") == _command_rsp(
+        0x0F5A, _PARAMETER_OUT_OF_RANGE
+    )
+    assert state.therapy_control_state == ble.ids.state.THERAPY_RUN
+
+    assert _request(cp, b"\x66\x0f") == _command_rsp(0x0F66, _SUCCESS)
+    assert state.flight_mode
+
+    assert _request(cp, b"\x66\x0f\x00") == _command_rsp(0x0F66, _INVALID_OPERAND)
+    assert _request(cp, b"\x00\x0f") == _command_rsp(0x0F00, _OP_CODE_NOT_SUPPORTED)
+
+
+def test_command_annunciation():
+    state = ble.ids.state.IddState()
+    cp = ble.ids.command.IddCommandCp(state)
+
+    # 沒有 annunciation 時，ID 0 也不接受
+    assert _request(cp, b"\x69\x0f\x00\x00") == _command_rsp(
+        0x0F69, _PARAMETER_OUT_OF_RANGE
+    )
+
+    state.annunciation_id = 0x0102
+    assert _request(cp, b"\x69\x0f\x03\x01") == _command_rsp(
+        0x0F69, _PARAMETER_OUT_OF_RANGE
+    )
+
+    assert _request(cp, b"\x69\x0f\x02\x01") == b"\x96\x0f\x02\x01"
+    assert state.annunciation_snoozed
+
+    assert _request(cp, b"\x99\x0f\x02\x01") == b"\xa5\x0f\x02\x01"
+    assert state.annunciation_id == 0
+    assert not state.annunciation_snoozed
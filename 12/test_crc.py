@@ -0,0 +1,207 @@
+import gc
+import time
+import types
+
+import ble.e2e
+
+
+class BitwiseCrc:
+    """原本逐位元計算的 CRC16-CCITT，作為比較基準"""
+
+    def __init__(self):
+        self.value = 0xFFFF
+
+    def add_int8(self, data: int):
+        for bit in range(8):
+            in_bit = (data >> bit) & 1
+
+            msb = self.value & 1
+            self.value >>= 1
+            if in_bit ^ msb:
+                self.value ^= 0x8408
+
+    def add_bytes(self, data):
+        for n in data:
+            self.add_int8(n)
+
+
+def benchmark(text, func, data):
+    gc.collect()
+    mem_start = gc.mem_free()
+    time_start = time.ticks_us()
+    func(data)
+    time_end = time.ticks_us()
+    mem_end = gc.mem_free()
+    us = time.ticks_diff(time_end, time_start)
+    print(
+        text,
+        "執行時間:",
+        us,
+        "微秒",
+        "速度:",
+        "{:.3f}".format(times * len(data) / us if us else 0),
+        "bytes/微秒",
+        "耗費記憶體:",
+        mem_start - mem_end,
+        "bytes",
+    )
+
+
+times = 100
+
+
+def bench_bitwise(data):
+    for i in range(times):
+        crc = BitwiseCrc()
+        crc.add_bytes(data)
+
+
+def bench_table(data):
+    for i in range(times):
+        crc = ble.e2e.Crc()
+        crc.add_bytes(data)
+
+
+def bench_fill_crc(data):
+    for i in range(times):
+        ble.e2e.Crc.fill_crc(data, 0, len(data))
+
+
+def check(data):
+    expected = BitwiseCrc()
+    expected.add_bytes(data)
+
+    crc = ble.e2e.Crc()
+    crc.add_bytes(data)
+    assert crc.value == expected.value, (crc.value, expected.value)
+
+    crc = ble.e2e.Crc()
+    for n in data:
+        crc.add_int8(n)
+    assert crc.value == expected.value, (crc.value, expected.value)
+
+
+def test_add_bytes():
+    for n in range(0, 64):
+        check(bytes((i * 37 + n) & 0xFF for i in range(n)))
+
+
+def test_fill_crc():
+    data = bytearray((i * 37 + 11) & 0xFF for i in range(20)) + bytes(2)
+    ble.e2e.Crc.fill_crc(data, 20, 22)
+
+    expected = BitwiseCrc()
+    expected.add_bytes(data[:20])
+    assert data[20] | (data[21] << 8) == expected.value
+    assert ble.e2e.Crc.verify_crc(data, 20, 22)
+
+
+def _reference(data) -> int:
+    crc = BitwiseCrc()
+    crc.add_bytes(bytes(data))
+    return crc.value
+
+
+def test_add_range():
+    data = bytes((i * 37 + 5) & 0xFF for i in range(40))
+    mv = memoryview(data)
+
+    for start, end in ((0, 40), (3, 17), (10, 10), (39, 40)):
+        for buf in (data, bytearray(data), mv):
+            crc = ble.e2e.Crc()
+            crc.add_range(buf, start, end)
+            assert crc.value == _reference(data[start:end]), (start, end)
+
+    # 分成多次計算，與一次計算整段相同
+    crc = ble.e2e.Crc()
+    crc.add_range(data, 0, 7)
+    crc.add_range(mv, 7, 40)
+    assert crc.value == _reference(data)
+
+
+def test_add_segments():
+    header = b"\x01\x02\x03"
+    body = bytearray((i * 11) & 0xFF for i in range(30))
+    mv = memoryview(body)
+
+    for segments, expected in (
+        ((header, body), header + body),
+        ([header, (body, 5, 20)], header + body[5:20]),
+        ((mv[2:9], (mv, 9, 30)), body[2:30]),
+        ((b"", header, (body, 4, 4), bytearray(), body), header + body),
+        ((), b""),
+        ([(b"", 0, 0)], b""),
+    ):
+        crc = ble.e2e.Crc()
+        crc.add_segments(segments)
+        assert crc.value == _reference(expected), segments
+
+    # 接在其他計算之後
+    crc = ble.e2e.Crc()
+    crc.add_int8(0x55)
+    crc.add_segments((header, (body, 0, 3)))
+    assert crc.value == _reference(b"\x55" + header + body[:3])
+
+
+def _load_e2e(bits: int) -> types.ModuleType:
+    """以指定的 _CRC_TABLE_BITS 重新載入 ble.e2e，建置時的選項也能測試"""
+
+    with open(ble.e2e.__file__, encoding="utf-8") as fp:
+        source = fp.read()
+
+    old = "_CRC_TABLE_BITS = micropython.const(8)"
+    assert old in source
+    source = source.replace(old, f"_CRC_TABLE_BITS = micropython.const({bits})")
+
+    module = types.ModuleType(f"e2e_{bits}")
+    exec(compile(source, ble.e2e.__file__, "exec"), module.__dict__)
+    return module
+
+
+def test_crc_tables():
+    for bits in (4, 8):
+        table = ble.e2e._build_crc_table(bits)
+        assert len(table) == 1 << bits
+
+        for i in range(1 << bits):
+            # 逐位元處理 bits 個 0，與查表的結果相同
+            crc = i
+            for _ in range(bits):
+                crc = (crc >> 1) ^ (0x8408 if crc & 1 else 0)
+
+            assert table[i] == crc
+
+
+def test_table_sizes_match_bitwise():
+    for bits in (4, 8):
+        e2e = _load_e2e(bits)
+        assert len(e2e._crc_table) == 1 << bits
+
+        for n in range(0, 64):
+            data = bytes((i * 37 + n) & 0xFF for i in range(n))
+            expected = BitwiseCrc()
+            expected.add_bytes(data)
+
+            crc = e2e.Crc()
+            crc.add_bytes(data)
+            assert crc.value == expected.value, (bits, n)
+
+            crc = e2e.Crc()
+            for b in data:
+                crc.add_int8(b)
+            assert crc.value == expected.value, (bits, n)
+
+            buf = bytearray(data) + bytes(2)
+            e2e.Crc.fill_crc(buf, n, n + 2)
+            assert e2e.Crc.verify_crc(buf, n, n + 2)
+            assert buf[n] | (buf[n + 1] << 8) == expected.value
+
+
+if __name__ == "__main__":
+    test_add_bytes()
+
+    data = bytearray((i * 37 + 11) & 0xFF for i in range(20))
+
+    benchmark("Bitwise  ", bench_bitwise, data)
+    benchmark("Table    ", bench_table, data)
+    benchmark("fill_crc ", bench_fill_crc, data)
@@ -0,0 +1,125 @@
+import asyncio
+
+import micropython
+import pytest
+
+import common.deferred
+
+
+class _Scheduler:
+    """代替 micropython.schedule()，記下 callback 後由 run_pending() 執行"""
+
+    def __init__(self, capacity: int = 8):
+        self.capacity = capacity
+        self.pending = []
+
+    def schedule(self, func, arg):
+        if len(self.pending) >= self.capacity:
+            raise RuntimeError("schedule queue full")
+
+        self.pending.append((func, arg))
+
+    def run_pending(self):
+        while self.pending:
+            func, arg = self.pending.pop(0)
+            func(arg)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    s = _Scheduler()
+    monkeypatch.setattr(micropython, "schedule", s.schedule)
+
+    d = common.deferred
+    d._head = d._tail = 0
+    d._scheduled = d._draining = False
+    d.high_water = d.dropped = d.errors = d.schedule_failures = 0
+    d._wakeup = asyncio.ThreadSafeFlag()
+    return s
+
+
+def test_calls_run_in_order_with_one_trampoline(scheduler):
+    calls = []
+
+    for i in range(3):
+        assert common.deferred.call(calls.append, i)
+
+    assert len(scheduler.pending) == 1
+    assert common.deferred.depth() == 3
+
+    scheduler.run_pending()
+    assert calls == [0, 1, 2]
+    assert common.deferred.depth() == 0
+    assert common.deferred.high_water == 3
+
+
+def test_full_queue_drops(scheduler):
+    calls = []
+
+    for i in range(16):
+        assert common.deferred.call(calls.append, i)
+
+    assert not common.deferred.call(calls.append, 16)
+    assert common.deferred.dropped == 1
+
+    scheduler.run_pending()
+    assert calls == list(range(16))
+
+
+def test_failing_call_does_not_stop_others(scheduler):
+    calls = []
+
+    def fail(_):
+        raise ValueError("boom")
+
+    common.deferred.call(fail, None)
+    common.deferred.call(calls.append, 1)
+    scheduler.run_pending()
+
+    assert calls == [1]
+    assert common.deferred.errors == 1
+
+
+def test_schedule_failure_falls_back_to_run(scheduler):
+    scheduler.capacity = 0
+    calls = []
+
+    async def main():
+        task = asyncio.create_task(common.deferred.run())
+        common.deferred.call(calls.append, 1)
+        await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(main())
+
+    assert calls == [1]
+    assert common.deferred.schedule_failures == 1
+    assert not common.deferred._scheduled
+
+
+def test_call_added_while_draining_is_not_stranded(scheduler, monkeypatch):
+    calls = []
+    drain_items = common.deferred._drain_items
+
+    def drain_then_call():
+        drain_items()
+
+        # ISR 在最後一次檢查之後加入工作，其 trampoline 隨即執行，
+        # 但 _draining 仍為 True 而放棄
+        if calls == [1]:
+            common.deferred.call(calls.append, 2)
+            scheduler.run_pending()
+
+    monkeypatch.setattr(common.deferred, "_drain_items", drain_then_call)
+
+    # run() 的路徑
+    common.deferred.call(calls.append, 1)
+    scheduler.pending.clear()
+    common.deferred._scheduled = False
+    common.deferred._drain()
+    assert calls == [1]
+
+    # 再排程的 trampoline 執行剩下的工作
+    scheduler.run_pending()
+    assert calls == [1, 2]
+    assert common.deferred.depth() == 0
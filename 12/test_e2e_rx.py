@@ -0,0 +1,154 @@
+import bluetooth
+
+import ble.e2e
+import ble.ids.command
+import ble.ids.state
+import ble.mixin
+import ble.txqueue
+import common.logger
+
+
+_CONN = 0
+_VALUE_HANDLE = 40
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+
+# Set Flight Mode
+_REQUEST = b"\x66\x0f"
+
+
+class _Queue:
+    def __init__(self):
+        self.conn_handle = _CONN
+        self.indications = []
+
+    def indicate(self, value_handle, data) -> bool:
+        self.indications.append(bytes(data))
+        return True
+
+
+class _Cp:
+    def __init__(self):
+        self.state = ble.ids.state.IddState()
+        self.cp = ble.ids.command.E2EIddCommandCp(self.state)
+        self.cp.value_handle = _VALUE_HANDLE
+        self.queue = _Queue()
+
+    def connect(self):
+        self.cp._isr_e2e_rx_mixin(_IRQ_CENTRAL_CONNECT, (_CONN, 0, b""))
+
+    def disconnect(self):
+        self.cp._isr_e2e_rx_mixin(_IRQ_CENTRAL_DISCONNECT, (_CONN, 0, b""))
+
+    def write(self, data: bytes) -> list[bytes]:
+        """寫入 data，返回送出的回覆"""
+
+        self.queue.indications.clear()
+        bluetooth.BLE().values[_VALUE_HANDLE] = data
+
+        ble.txqueue._queues.append(self.queue)
+        try:
+            self.cp.on_write(_CONN, _VALUE_HANDLE)
+        finally:
+            ble.txqueue._queues.remove(self.queue)
+
+        return list(self.queue.indications)
+
+
+def _e2e(data: bytes, counter: int) -> bytes:
+    buf = bytearray(data) + bytes((counter, 0, 0))
+    ble.e2e.Crc.fill_crc(buf, len(buf) - 2, len(buf))
+    return bytes(buf)
+
+
+def test_accepts_valid_write():
+    t = _Cp()
+    t.connect()
+
+    rsps = t.write(_e2e(_REQUEST, 1))
+    assert t.state.flight_mode
+    assert t.cp.e2e_rejected == 0
+
+    # 回覆也帶有 E2E-Counter 及 E2E-CRC
+    assert len(rsps) == 1
+    assert rsps[0][:5] == b"\x55\x0f\x66\x0f\x0f"
+    assert rsps[0][5] == 1
+    assert ble.e2e.Crc.verify_crc(rsps[0], 6, 8)
+
+
+def test_rejects_replayed_counter():
+    t = _Cp()
+    t.connect()
+
+    assert t.write(_e2e(_REQUEST, 1))
+    assert t.write(_e2e(_REQUEST, 1)) == []
+    assert t.write(_e2e(_REQUEST, 3)) == []
+    assert t.cp.e2e_rejected == 2
+
+    assert t.write(_e2e(_REQUEST, 2))
+
+
+def test_rejects_bad_crc_without_advancing_counter():
+    t = _Cp()
+    t.connect()
+
+    data = bytearray(_e2e(_REQUEST, 1))
+    data[-1] ^= 0x01
+    assert t.write(bytes(data)) == []
+    assert not t.state.flight_mode
+
+    assert t.write(_e2e(_REQUEST, 1))
+    assert t.cp.e2e_rejected == 1
+
+
+def test_rejects_short_write():
+    t = _Cp()
+    t.connect()
+
+    assert t.write(b"\x66\x0f") == []
+    assert t.cp.e2e_rejected == 1
+
+
+def test_counter_is_per_connection():
+    t = _Cp()
+
+    # 連線前沒有 RxCounter
+    assert t.write(_e2e(_REQUEST, 1)) == []
+
+    t.connect()
+    assert t.write(_e2e(_REQUEST, 1))
+
+    # 斷線後重新從 1 開始
+    t.disconnect()
+    t.connect()
+    assert t.write(_e2e(_REQUEST, 1))
+    assert t.cp.e2e_rejected == 1
+
+
+def test_counter_wraps_after_255():
+    t = _Cp()
+    t.connect()
+
+    for counter in range(1, 256):
+        assert t.write(_e2e(_REQUEST, counter)), counter
+
+    assert t.write(_e2e(_REQUEST, 1))
+    assert t.cp.e2e_rejected == 0
+
+
+def test_reject_reasons_are_logged(monkeypatch):
+    logged = []
+    monkeypatch.setattr(common.logger, "log", lambda *args: logged.append(args))
+
+    t = _Cp()
+    t.connect()
+    t.write(b"\x00")
+    t.write(b"\x66\x0f\x01\x00\x00")
+    t.write(_e2e(_REQUEST, 5))
+
+    assert [args[2] for args in logged] == [
+        ble.mixin.E2E_REJECT_LENGTH,
+        ble.mixin.E2E_REJECT_CRC,
+        ble.mixin.E2E_REJECT_COUNTER,
+    ]
@@ -0,0 +1,94 @@
+import datetime
+
+import machine
+import pytest
+
+import ble.server
+import common.logger
+import common.logmsg
+import tools.log_decode
+
+
+@pytest.fixture
+def logger(monkeypatch):
+    monkeypatch.setattr(common.logger, "_log_head", 0)
+    monkeypatch.setattr(common.logger, "_log_tail", 0)
+    monkeypatch.setattr(common.logger, "_log_dropped", 0)
+    monkeypatch.setattr(common.logger, "_log_dropped_reported", 0)
+    monkeypatch.setattr(common.logger, "_last_anchor_ms", None)
+    return common.logger
+
+
+def _decode(output: str) -> list[str]:
+    decoder = tools.log_decode.Decoder(tools.log_decode.load_messages())
+    lines = (decoder.decode_line(line) for line in output.splitlines())
+    return [line for line in lines if line is not None]
+
+
+def test_round_trip(logger, capsys):
+    addr = bytes.fromhex("C0FFEE123456")
+    ble.server._log_addr(common.logmsg.CONNECT, 3, 1, addr)
+    logger.log(common.logmsg.NOTIFY, 0x2A, 20)
+    logger.log(common.logmsg.E2E_REJECT, 0x30, 2, -1)
+    ble.server._log_addr(common.logmsg.DISCONNECT, 3, 1, addr)
+    logger.log(99, 1, 2, 3)
+    logger.flush()
+
+    lines = _decode(capsys.readouterr().out)
+
+    # 錨點為 stub RTC 的 2000-01-01，錨點於 flush() 時輸出，記錄略早於錨點
+    anchor = datetime.datetime(2000, 1, 1)
+    for line in lines:
+        t = datetime.datetime.strptime(line.split("  ", 1)[0], "%Y-%m-%d %H:%M:%S.%f")
+        assert abs(t - anchor) < datetime.timedelta(seconds=1)
+    assert [line.split("  ", 1)[1] for line in lines] == [
+        "Connected to 1:C0FFEE123456 (conn: 3)",
+        "Notify(value_handle: 42, length: 20)",
+        "E2E reject(handle: 48, reason: 2, counter: -1)",
+        "Disconnected from 1:C0FFEE123456 (conn: 3)",
+        "Unknown message 99: 1 2 3",
+    ]
+
+
+def test_flush_empties_ring(logger, capsys):
+    logger.log(common.logmsg.NOTIFY, 1, 2)
+    logger.flush()
+    capsys.readouterr()
+
+    # 錨點間隔未到，沒有新記錄時不輸出任何東西
+    logger.flush()
+    assert capsys.readouterr().out == ""
+
+
+def test_overflow_reports_dropped(logger, capsys):
+    for i in range(logger._LOG_CAPACITY + 5):
+        logger.log(common.logmsg.INDICATE, i, 1)
+    logger.flush()
+
+    lines = _decode(capsys.readouterr().out)
+
+    assert len(lines) == logger._LOG_CAPACITY + 1
+    assert lines[-2].endswith(f"value_handle: {logger._LOG_CAPACITY - 1}, length: 1)")
+    assert lines[-1] == "(5 log records dropped)"
+
+    # 丟棄數只回報一次，空出的 ring 可再寫入
+    logger.log(common.logmsg.INDICATE, 7, 1)
+    logger.flush()
+    lines = _decode(capsys.readouterr().out)
+    assert len(lines) == 1 and lines[0].endswith("value_handle: 7, length: 1)")
+
+
+def test_irq_disabled_while_claiming(logger, monkeypatch):
+    calls = []
+    monkeypatch.setattr(machine, "disable_irq", lambda: calls.append("off") or 7)
+    monkeypatch.setattr(machine, "enable_irq", lambda state: calls.append(state))
+
+    logger.log(common.logmsg.NOTIFY, 1, 2)
+    assert calls == ["off", 7]
+
+    # ring 已滿而丟棄時也要恢復中斷
+    monkeypatch.setattr(logger, "_log_head", logger._LOG_CAPACITY)
+    calls.clear()
+    logger.log(common.logmsg.NOTIFY, 1, 2)
+    assert calls == ["off", 7]
+    assert logger._log_dropped == 1
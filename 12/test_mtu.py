@@ -0,0 +1,123 @@
+import asyncio
+
+import bluetooth
+
+import ble.ids.controlpoint
+import ble.ids.history
+import ble.stack
+import ble.txqueue
+
+
+_CONN = 0
+
+_IRQ_CENTRAL_CONNECT = 1
+_IRQ_CENTRAL_DISCONNECT = 2
+_IRQ_MTU_EXCHANGED = 21
+
+
+class _EchoCp(ble.ids.controlpoint.ControlPoint):
+    """回覆長度由要求決定的 Control Point"""
+
+    rsp_code_opcode = 0x0F55
+
+    def __init__(self):
+        ble.ids.controlpoint.ControlPoint.__init__(self, 0x2B24, 40)
+        self.value_handle = 10
+        self._add_handler(0x0001, 1, self._echo)
+
+    def _echo(self, data) -> int:
+        n = data[2]
+        for i in range(n):
+            self._rsp_buf[i] = i
+
+        return n
+
+
+class _History:
+    """只有一筆 18 bytes 記錄的歷史記錄"""
+
+    class index:
+        @staticmethod
+        def offset_at(i):
+            return i
+
+    def read(self, offset, buf):
+        for i in range(18):
+            buf[i] = i
+
+        return 18
+
+
+def _connect(mtu: int | None = None):
+    ble.stack._isr_mtu(_IRQ_CENTRAL_CONNECT, (_CONN, 0, b""))
+    if mtu is not None:
+        ble.stack._isr_mtu(_IRQ_MTU_EXCHANGED, (_CONN, mtu))
+
+
+def _queue() -> ble.txqueue.TxQueue:
+    q = ble.txqueue.TxQueue(4, 244)
+    q.conn_handle = _CONN
+    ble.txqueue._queues.append(q)
+    return q
+
+
+def _indications(q: ble.txqueue.TxQueue) -> list[bytes]:
+    result = []
+    while len(q):
+        i = q._tail % q._slots
+        result.append(bytes(q._bufs[i][: q._lens[i]]))
+        q._tail = (q._tail + 1) % (2 * q._slots)
+
+    return result
+
+
+def test_mtu_tracking():
+    _connect()
+    assert ble.stack.get_max_payload(_CONN) == 20
+
+    ble.stack._isr_mtu(_IRQ_MTU_EXCHANGED, (_CONN, 100))
+    assert ble.stack.get_mtu(_CONN) == 100
+    assert ble.stack.get_max_payload(_CONN) == 97
+
+    ble.stack._isr_mtu(_IRQ_CENTRAL_DISCONNECT, (_CONN, 0, b""))
+    assert ble.stack.get_mtu(_CONN) == ble.stack.ATT_DEFAULT_MTU
+
+
+def test_control_point_response_gated_on_mtu():
+    cp = _EchoCp()
+    q = _queue()
+    try:
+        _connect()
+        cp._dispatch(_CONN, memoryview(b"\x01\x00\x14"), 3)
+        cp._dispatch(_CONN, memoryview(b"\x01\x00\x15"), 3)
+
+        _connect(24)
+        cp._dispatch(_CONN, memoryview(b"\x01\x00\x15"), 3)
+    finally:
+        ble.txqueue._queues.remove(q)
+
+    rsps = _indications(q)
+    assert rsps[0] == bytes(range(20))
+    # 超過 MTU 時改回覆 Procedure Not Completed
+    assert rsps[1] == b"\x55\x0f\x01\x00\x72"
+    assert rsps[2] == bytes(range(21))
+
+
+def test_history_record_gated_on_mtu():
+    bluetooth.BLE().log.clear()
+    data = ble.ids.history.E2EIddHistoryData(24)
+    data.value_handle = 12
+    q = _queue()
+    ble.txqueue._queues.remove(q)
+
+    async def send():
+        return await data.send(q, _History(), 0)
+
+    # 18 bytes 的記錄加上 E2E 欄位放不進預設 MTU，不送出
+    _connect()
+    assert asyncio.run(send()) == ble.ids.history.SEND_TOO_LONG
+    assert len(q) == 0
+
+    _connect(24)
+    assert asyncio.run(send()) == ble.ids.history.SEND_OK
+    assert len(q) == 1
@@ -0,0 +1,316 @@
+import asyncio
+import struct
+
+import ble.ids.history
+import ble.ids.racp
+import ble.ids.ringlog
+import ble.stack
+import ble.txqueue
+
+
+_CONN = 0
+_RECORD_SIZE = 16
+
+# Response Code 的 indication：Op Code、Operator、Request Op Code、Response Code
+_SUCCESS = 0xF0
+_NO_RECORDS_FOUND = 0x5A
+_PROCEDURE_NOT_COMPLETED = 0x69
+_INVALID_OPERATOR = 0x33
+
+
+class _Queue:
+    """記錄送出的資料，每次放入時讓出執行權"""
+
+    def __init__(self):
+        self.conn_handle = _CONN
+        self.notifications = []
+        self.indications = []
+
+    async def put_notify(self, value_handle, data) -> bool:
+        self.notifications.append(bytes(data))
+        await asyncio.sleep(0)
+        return True
+
+    async def put_indicate(self, value_handle, data) -> bool:
+        self.indications.append(bytes(data))
+        await asyncio.sleep(0)
+        return True
+
+    def indicate(self, value_handle, data) -> bool:
+        self.indications.append(bytes(data))
+        return True
+
+
+class _Racp:
+    def __init__(
+        self, tmp_path, records: int, record_size: int = _RECORD_SIZE, e2e=False
+    ):
+        self.history = ble.ids.ringlog.RingLog(str(tmp_path / "history"), record_size)
+        self.history.open()
+        for i in range(records):
+            self.history.append(0x0F, i, bytes([i & 0xFF]))
+
+        if e2e:
+            self.data = ble.ids.history.E2EIddHistoryData(record_size)
+            self.racp = ble.ids.racp.E2EIddRacp(self.history, self.data)
+        else:
+            self.data = ble.ids.history.IddHistoryData(record_size)
+            self.racp = ble.ids.racp.IddRacp(self.history, self.data)
+
+        self.queue = _Queue()
+
+    def write(self, data: bytes):
+        self.racp._handle_write(_CONN, memoryview(data))
+
+    async def run(self, *writes: bytes, steps: int = 200):
+        """依序寫入要求，每次寫入後讓 run() 執行 steps 次"""
+
+        ble.txqueue._queues.append(self.queue)
+        task = asyncio.create_task(self.racp.run())
+        try:
+            for data in writes:
+                self.write(data)
+                for _ in range(steps):
+                    await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(self.queue)
+
+    def seqs(self) -> list[int]:
+        return [struct.unpack_from("<I", n, 2)[0] for n in self.queue.notifications]
+
+
+def _rsp(request_opcode: int, rsp_code: int) -> bytes:
+    return bytes((0x0F, 0x0F, request_opcode, rsp_code))
+
+
+def test_report_number_of_records(tmp_path):
+    t = _Racp(tmp_path, 5)
+    asyncio.run(t.run(b"\x5a\x33", b"\x5a\x55\x0f\x03\x00\x00\x00"))
+
+    assert t.queue.indications == [
+        b"\x66\x0f\x05\x00\x00\x00",
+        b"\x66\x0f\x02\x00\x00\x00",
+    ]
+
+
+def test_report_records(tmp_path):
+    t = _Racp(tmp_path, 10)
+    asyncio.run(t.run(b"\x33\x5a\x0f\x02\x00\x00\x00\x04\x00\x00\x00"))
+
+    assert t.seqs() == [2, 3, 4]
+    assert t.queue.notifications[0] == b"\x0f\x00\x02\x00\x00\x00\x02\x00\x02"
+    assert t.queue.indications == [_rsp(0x33, _SUCCESS)]
+
+
+def test_report_first_and_last(tmp_path):
+    t = _Racp(tmp_path, 10)
+    asyncio.run(t.run(b"\x33\x66", b"\x33\x69"))
+
+    assert t.seqs() == [0, 9]
+
+
+def test_no_records_found(tmp_path):
+    t = _Racp(tmp_path, 3)
+    asyncio.run(t.run(b"\x33\x55\x0f\x10\x00\x00\x00"))
+
+    assert t.queue.notifications == []
+    assert t.queue.indications == [_rsp(0x33, _NO_RECORDS_FOUND)]
+
+
+def test_delete_oldest_records(tmp_path):
+    t = _Racp(tmp_path, 10)
+    asyncio.run(t.run(b"\x3c\x3c\x0f\x03\x00\x00\x00", b"\x33\x66"))
+
+    assert t.queue.indications == [_rsp(0x3C, _SUCCESS), _rsp(0x33, _SUCCESS)]
+    assert t.seqs() == [4]
+
+
+def test_invalid_requests(tmp_path):
+    t = _Racp(tmp_path, 3)
+    asyncio.run(
+        t.run(
+            b"\x33\x0f",
+            b"\x33\x33\x00",
+            b"\x33\x3c\x01\x00\x00\x00\x00",
+            b"\x01\x33",
+            b"\x55\x33",
+        )
+    )
+
+    assert t.queue.indications == [
+        _rsp(0x33, _INVALID_OPERATOR),
+        _rsp(0x33, 0x55),
+        _rsp(0x33, 0x96),
+        _rsp(0x01, 0x0F),
+        _rsp(0x55, _INVALID_OPERATOR),
+    ]
+
+
+def test_abort_when_idle(tmp_path):
+    t = _Racp(tmp_path, 3)
+    asyncio.run(t.run(b"\x55\x0f"))
+
+    assert t.queue.indications == [_rsp(0x55, _SUCCESS)]
+
+
+def test_busy_rejects_other_requests(tmp_path):
+    t = _Racp(tmp_path, 20)
+
+    async def main():
+        ble.txqueue._queues.append(t.queue)
+        task = asyncio.create_task(t.racp.run())
+        try:
+            t.write(b"\x33\x33")
+            for _ in range(5):
+                await asyncio.sleep(0)
+
+            t.write(b"\x5a\x33")
+            for _ in range(200):
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(t.queue)
+
+    asyncio.run(main())
+
+    assert t.queue.indications == [
+        _rsp(0x5A, _PROCEDURE_NOT_COMPLETED),
+        _rsp(0x33, _SUCCESS),
+    ]
+    assert len(t.queue.notifications) == 20
+
+
+def test_abort_while_busy(tmp_path):
+    t = _Racp(tmp_path, 50)
+
+    async def main():
+        ble.txqueue._queues.append(t.queue)
+        task = asyncio.create_task(t.racp.run())
+        try:
+            t.write(b"\x33\x33")
+            while len(t.queue.notifications) < 10:
+                await asyncio.sleep(0)
+
+            t.write(b"\x55\x0f")
+            for _ in range(20):
+                await asyncio.sleep(0)
+
+            # 中止後可以接受新的要求
+            assert not t.racp._busy
+            assert not t.racp._abort
+            t.write(b"\x5a\x33")
+            for _ in range(20):
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(t.queue)
+
+    asyncio.run(main())
+
+    assert 10 <= len(t.queue.notifications) < 50
+    assert t.queue.indications == [
+        _rsp(0x55, _SUCCESS),
+        b"\x66\x0f\x32\x00\x00\x00",
+    ]
+
+
+def test_abort_after_last_record(tmp_path):
+    t = _Racp(tmp_path, 3)
+
+    async def main():
+        ble.txqueue._queues.append(t.queue)
+        task = asyncio.create_task(t.racp.run())
+        try:
+            t.write(b"\x33\x33")
+            while not t.queue.indications:
+                await asyncio.sleep(0)
+
+            # 送出最後的回覆時才收到
+            t.write(b"\x55\x0f")
+            for _ in range(20):
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(t.queue)
+
+    asyncio.run(main())
+
+    assert t.queue.indications == [_rsp(0x33, _SUCCESS), _rsp(0x55, _SUCCESS)]
+    assert not t.racp._busy
+
+
+def test_not_completed_until_history_is_open(tmp_path):
+    t = _Racp(tmp_path, 5)
+    t.history.close()
+    t.history = t.racp._history = ble.ids.ringlog.RingLog(
+        str(tmp_path / "history"), _RECORD_SIZE
+    )
+
+    asyncio.run(t.run(b"\x5a\x33"))
+    t.history.open()
+    asyncio.run(t.run(b"\x5a\x33"))
+
+    assert t.queue.indications == [
+        _rsp(0x5A, _PROCEDURE_NOT_COMPLETED),
+        b"\x66\x0f\x05\x00\x00\x00",
+    ]
+
+
+def test_record_too_long_for_mtu(tmp_path):
+    # 伺服器的記錄上限 24 bytes 加上 E2E 欄位，放不進預設 MTU 的 20 bytes
+    t = _Racp(tmp_path, 4, record_size=24, e2e=True)
+    t.history.append(0x0F, 4, bytes(16))
+    t.history.append(0x0F, 5, b"\x05")
+
+    ble.stack._isr_mtu(1, (_CONN, 0, b""))
+    try:
+        asyncio.run(t.run(b"\x33\x5a\x0f\x02\x00\x00\x00\x05\x00\x00\x00"))
+    finally:
+        ble.stack._isr_mtu(2, (_CONN, 0, b""))
+
+    # 送出放得進的記錄後停止，不回覆 Success
+    assert t.seqs() == [2, 3]
+    assert [len(n) for n in t.queue.notifications] == [12, 12]
+    assert [r[:4] for r in t.queue.indications] == [
+        _rsp(0x33, _PROCEDURE_NOT_COMPLETED)
+    ]
+
+
+def test_corrupt_records_not_counted(tmp_path):
+    t = _Racp(tmp_path, 5)
+    t.history.close()
+
+    # 破壞序號 1 及 3 的欄位
+    path = tmp_path / "history" / "00000000.log"
+    with open(path, "r+b") as fp:
+        for seq in (1, 3):
+            fp.seek(seq * (_RECORD_SIZE + 3) + 5)
+            fp.write(b"\x5a")
+
+    asyncio.run(t.run(b"\x5a\x33", b"\x33\x33"))
+
+    # 回報的記錄數與實際送出的記錄數一致
+    assert t.queue.indications == [b"\x66\x0f\x03\x00\x00\x00", _rsp(0x33, _SUCCESS)]
+    assert t.seqs() == [0, 2, 4]
+
+
+def test_abort_while_counting(tmp_path):
+    t = _Racp(tmp_path, 100)
+
+    async def main():
+        ble.txqueue._queues.append(t.queue)
+        task = asyncio.create_task(t.racp.run())
+        try:
+            t.write(b"\x5a\x33")
+            await asyncio.sleep(0)
+            t.write(b"\x55\x0f")
+            for _ in range(20):
+                await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(t.queue)
+
+    asyncio.run(main())
+
+    assert t.queue.indications == [_rsp(0x55, _SUCCESS)]
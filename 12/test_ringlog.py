@@ -0,0 +1,132 @@
+import os
+
+import ble.ids.ringlog
+
+
+_RECORD_SIZE = 16
+_SLOT_SIZE = _RECORD_SIZE + 3
+
+
+def _open(tmp_path, records_per_segment: int = 4, max_segments: int = 3):
+    log = ble.ids.ringlog.RingLog(
+        str(tmp_path / "history"), _RECORD_SIZE, records_per_segment, max_segments
+    )
+    log.open()
+    return log
+
+
+def _read(log, seq: int) -> bytes:
+    buf = bytearray(_RECORD_SIZE)
+    n = log.read(seq, buf)
+    return bytes(buf[:n])
+
+
+def _segments(tmp_path) -> list[str]:
+    return sorted(n for n in os.listdir(tmp_path / "history") if n.endswith(".log"))
+
+
+def test_append_and_read(tmp_path):
+    log = _open(tmp_path)
+    assert log.append(0x1234, 5, b"\xaa\xbb") == 0
+    assert log.append(0x0F, 6) == 1
+
+    assert _read(log, 0) == b"\x34\x12\x00\x00\x00\x00\x05\x00\xaa\xbb"
+    assert _read(log, 1) == b"\x0f\x00\x01\x00\x00\x00\x06\x00"
+    assert _read(log, 2) == b""
+    assert len(log.index) == 2
+
+
+def test_reopen_keeps_records(tmp_path):
+    log = _open(tmp_path)
+    for i in range(6):
+        log.append(0x0F, i)
+    log.close()
+
+    log = _open(tmp_path)
+    assert (log.first_seq, log.next_seq) == (0, 6)
+    assert log.append(0x0F, 6) == 6
+    assert _read(log, 5)[6] == 5
+
+
+def test_wrap_drops_oldest_segment(tmp_path):
+    log = _open(tmp_path)
+    for i in range(14):
+        log.append(0x0F, i)
+
+    # 4 筆一個區段，最多 3 個區段：序號 0 ~ 3 的區段已被刪除
+    assert _segments(tmp_path) == ["00000004.log", "00000008.log", "0000000c.log"]
+    assert (log.first_seq, log.next_seq) == (4, 14)
+    assert _read(log, 3) == b""
+    assert _read(log, 4)[6] == 4
+    assert log.index.lower_bound(0) == 0
+    assert log.index.upper_bound(100) == 10
+
+
+def test_torn_tail_recovery(tmp_path):
+    log = _open(tmp_path)
+    for i in range(3):
+        log.append(0x0F, i)
+    log.close()
+
+    # 寫入第 4 筆到一半時斷電
+    path = tmp_path / "history" / "00000000.log"
+    with open(path, "ab") as fp:
+        fp.write(b"\x09\x0f\x00")
+
+    log = _open(tmp_path)
+    assert os.path.getsize(path) == 4 * _SLOT_SIZE
+    assert log.next_seq == 4
+    assert _read(log, 3) == b""
+
+    # 之後的記錄由下一個欄位繼續寫入
+    assert log.append(0x0F, 4) == 4
+    assert _read(log, 4)[6] == 4
+    assert _read(log, 2)[6] == 2
+
+
+def test_corrupt_slot_is_skipped(tmp_path):
+    log = _open(tmp_path)
+    for i in range(3):
+        log.append(0x0F, i)
+    log.close()
+
+    path = tmp_path / "history" / "00000000.log"
+    with open(path, "r+b") as fp:
+        fp.seek(_SLOT_SIZE + 5)
+        fp.write(b"\x5a")
+
+    log = _open(tmp_path)
+    assert _read(log, 0) != b""
+    assert _read(log, 1) == b""
+    assert _read(log, 2) != b""
+    assert [log.is_valid(seq) for seq in range(4)] == [True, False, True, False]
+
+    # 毀損的欄位仍佔用序號
+    assert len(log.index) == 3
+
+
+def test_delete_persists(tmp_path):
+    log = _open(tmp_path)
+    for i in range(10):
+        log.append(0x0F, i)
+
+    log.delete(5)
+    assert (log.first_seq, len(log.index)) == (5, 5)
+    assert _segments(tmp_path) == ["00000004.log", "00000008.log"]
+    log.close()
+
+    log = _open(tmp_path)
+    assert (log.first_seq, log.next_seq) == (5, 10)
+    assert _read(log, 4) == b""
+    assert _read(log, 5)[6] == 5
+
+
+def test_delete_all_then_append(tmp_path):
+    log = _open(tmp_path)
+    for i in range(3):
+        log.append(0x0F, i)
+
+    log.delete(10)
+    assert len(log.index) == 0
+    assert log.append(0x0F, 3) == 3
+    assert log.index.seq_at(0) == 3
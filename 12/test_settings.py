@@ -0,0 +1,153 @@
+import asyncio
+
+import ble.settings
+import ble.txqueue
+import config
+
+
+_CONN = 0
+
+_SUCCESS = 0x00
+_UNKNOWN_FIELD = 0x01
+_INVALID_VALUE = 0x02
+_BUSY = 0x03
+_WRITE_FAILED = 0x04
+
+
+class _Queue:
+    def __init__(self):
+        self.conn_handle = _CONN
+        self.indications = []
+
+    def indicate(self, value_handle, data) -> bool:
+        self.indications.append(bytes(data))
+        return True
+
+
+class _Settings:
+    def __init__(self):
+        self.config = config.Config()
+        self.changed = []
+        self.cp = ble.settings.SettingsCp(self.config, self.changed.append)
+        self.queue = _Queue()
+
+    async def run(self, *writes: bytes):
+        """依序寫入要求，每次寫入後讓 run() 處理"""
+
+        ble.txqueue._queues.append(self.queue)
+        task = asyncio.create_task(self.cp.run())
+        try:
+            for data in writes:
+                self.cp._handle_write(_CONN, memoryview(data))
+                for _ in range(5):
+                    await asyncio.sleep(0)
+        finally:
+            task.cancel()
+            ble.txqueue._queues.remove(self.queue)
+
+
+def test_changes_are_saved(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    t = _Settings()
+
+    asyncio.run(
+        t.run(
+            b"\x01Pump",
+            b"\x02\x20\xa1\x07\x00",
+            b"\x03654321",
+            # SFLOAT 200
+            b"\x04\xc8\x00",
+            b"\x05\xe1\x01\x01",
+        )
+    )
+
+    assert t.queue.indications == [
+        b"\x01\x00",
+        b"\x02\x00",
+        b"\x03\x00",
+        b"\x04\x00",
+        b"\x05\x00",
+    ]
+    assert t.changed == [
+        "local_name",
+        "adv_interval_us",
+        "passkey",
+        "idd_features_insulin_conc",
+        "idd_features_flags",
+    ]
+
+    saved = config.get_config()
+    assert saved.local_name == "Pump"
+    assert saved.adv_interval_us == 500_000
+    assert saved.passkey == "654321"
+    assert saved.idd_features_insulin_conc == 200
+    assert saved.idd_features_flags == 0x0101E1
+
+
+def test_invalid_requests(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    t = _Settings()
+
+    asyncio.run(
+        t.run(
+            b"\x09\x00",
+            b"\x02\x00\x00",
+            b"\x03\x31\x32\x33",
+            b"\x03abcdef",
+            b"\x01\xff\xfe",
+            # 執行時不能改變 E2E 保護
+            b"\x05\xe0\x01\x00",
+        )
+    )
+
+    assert t.queue.indications == [
+        b"\x09\x01",
+        b"\x02\x02",
+        b"\x03\x02",
+        b"\x03\x02",
+        b"\x01\x02",
+        b"\x05\x02",
+    ]
+    assert t.changed == []
+    assert config.get_config().to_dict() == config.Config().to_dict()
+
+
+def test_busy(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    t = _Settings()
+
+    async def main():
+        ble.txqueue._queues.append(t.queue)
+        try:
+            # run() 尚未處理第一個要求
+            t.cp._handle_write(_CONN, memoryview(b"\x01Pump"))
+            t.cp._handle_write(_CONN, memoryview(b"\x01Other"))
+
+            task = asyncio.create_task(t.cp.run())
+            for _ in range(5):
+                await asyncio.sleep(0)
+            task.cancel()
+        finally:
+            ble.txqueue._queues.remove(t.queue)
+
+    asyncio.run(main())
+
+    assert t.queue.indications == [b"\x01\x03", b"\x01\x00"]
+    assert t.config.local_name == "Pump"
+
+
+def test_write_failure_rolls_back(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    def save_config(c):
+        raise OSError(28)
+
+    monkeypatch.setattr(config, "save_config", save_config)
+    t = _Settings()
+    old_name = t.config.local_name
+
+    asyncio.run(t.run(b"\x01Pump"))
+
+    assert t.queue.indications == [b"\x01\x04"]
+    assert t.config.local_name == old_name
+    assert t.changed == []
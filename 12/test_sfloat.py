@@ -0,0 +1,100 @@
+import gc
+import time
+
+import common.sfloat
+
+
+def benchmark(text, func, values):
+    gc.collect()
+    mem_start = gc.mem_free()
+    time_start = time.ticks_us()
+    func(values)
+    time_end = time.ticks_us()
+    mem_end = gc.mem_free()
+    print(
+        text,
+        "執行時間:",
+        time.ticks_diff(time_end, time_start),
+        "微秒",
+        "耗費記憶體:",
+        mem_start - mem_end,
+        "bytes",
+    )
+
+
+times = 10
+
+
+def bench_float_to_sfloat(values):
+    for i in range(times):
+        for v in values:
+            common.sfloat.float_to_sfloat(v)
+
+
+def bench_encode(values):
+    for i in range(times):
+        for v in values:
+            common.sfloat.encode(v)
+
+
+def bench_encode_into(values):
+    buf = bytearray(2 * len(values))
+    for i in range(times):
+        common.sfloat.encode_into(buf, 0, values)
+
+
+def sweep():
+    """比對 encode 與 float_to_sfloat 的結果，返回比對的數量"""
+
+    count = 0
+    seed = 12345
+
+    for exponent in range(-12, 12):
+        scale = 10.0**exponent
+
+        for i in range(500):
+            # 線性同餘產生器，讓 MicroPython 與 CPython 的輸入相同
+            seed = (seed * 1103515245 + 12345) & 0x7FFFFFFF
+            for v in (
+                seed / 0x7FFFFFFF * 10 * scale,
+                (seed % 100000) / 10 ** (exponent % 9),
+            ):
+                for value in (v, -v):
+                    expected = common.sfloat.float_to_sfloat(value)
+                    result = common.sfloat.encode(value)
+                    assert result == expected, (value, result, expected)
+                    count += 1
+
+    # 接近 mantissa 上限及四捨五入邊界的數值
+    for exponent in range(-9, 9):
+        for mantissa in (2045, 2046, 2047, 2048, 2049, 2045.5, 2046.5, 2047.5, 2048.5):
+            for value in (mantissa * 10.0**exponent, -mantissa * 10.0**exponent):
+                expected = common.sfloat.float_to_sfloat(value)
+                result = common.sfloat.encode(value)
+                assert result == expected, (value, result, expected)
+                count += 1
+
+    return count
+
+
+def test_encode():
+    assert sweep() > 0
+
+
+def test_encode_into():
+    values = [100, 1.5, 0.05, 12.34, -2.5, 250000, 0.001, 1234.5]
+    buf = bytearray(2 * len(values))
+    common.sfloat.encode_into(buf, 0, values)
+
+    for i, v in enumerate(values):
+        assert buf[2 * i] | (buf[2 * i + 1] << 8) == common.sfloat.float_to_sfloat(v)
+
+
+if __name__ == "__main__":
+    print("比對", sweep(), "個數值，結果皆相同")
+
+    values = [100, 1.5, 0.05, 12.34, -2.5, 250000, 0.001, 1234.5] * 4
+
+    benchmark("float_to_sfloat", bench_float_to_sfloat, values)
+    benchmark("encode         ", bench_encode, values)
+    benchmark("encode_into    ", bench_encode_into, values)
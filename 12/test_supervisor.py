@@ -0,0 +1,201 @@
+import asyncio
+import time
+
+import pytest
+
+import common.supervisor
+
+
+def _busy_wait(us: int):
+    start = time.ticks_us()
+    while time.ticks_diff(time.ticks_us(), start) < us:
+        pass
+
+
+async def _run(sup: common.supervisor.Supervisor, seconds: float, before_stop=None):
+    task = asyncio.create_task(sup.run())
+    await asyncio.sleep(seconds)
+
+    if before_stop is not None:
+        before_stop()
+
+    sup.stop()
+    await asyncio.sleep(0.01)
+    assert task.done()
+
+
+def _states(sup) -> dict[str, str]:
+    return {
+        name: common.supervisor._STATE_NAMES[job.state]
+        for name, job in sup._jobs.items()
+    }
+
+
+@pytest.fixture(autouse=True)
+def fast_restart(monkeypatch):
+    monkeypatch.setattr(common.supervisor, "_RESTART_MIN_MS", 1)
+    monkeypatch.setattr(common.supervisor, "_RESTART_MAX_MS", 4)
+
+
+def test_duplicate_name():
+    sup = common.supervisor.Supervisor()
+    sup.add_periodic("gc", lambda: None, 10)
+
+    with pytest.raises(ValueError):
+        sup.add_task("gc", asyncio.sleep)
+
+
+def test_task_time_is_accounted():
+    async def worker():
+        for _ in range(5):
+            _busy_wait(1000)
+            await asyncio.sleep(0)
+
+    sup = common.supervisor.Supervisor()
+    job = sup.add_task("worker", worker)
+    asyncio.run(_run(sup, 0.05))
+
+    # 5 次讓出執行權，加上最後結束的一次
+    assert job.runs == 6
+    assert job.total_us >= 5000
+    assert job.max_us >= 1000
+    assert _states(sup) == {"worker": "done"}
+
+
+def test_periodic_and_event_jobs():
+    flag = asyncio.ThreadSafeFlag()
+    sup = common.supervisor.Supervisor()
+    periodic = sup.add_periodic("periodic", lambda: _busy_wait(200), 10)
+
+    async def handler():
+        await asyncio.sleep(0)
+
+    event = sup.add_event("event", handler, flag)
+
+    async def main():
+        task = asyncio.create_task(sup.run())
+        await asyncio.sleep(0.055)
+        flag.set()
+        await asyncio.sleep(0.01)
+        flag.set()
+        await asyncio.sleep(0.01)
+        sup.stop()
+        await asyncio.sleep(0.01)
+        assert task.done()
+
+    asyncio.run(main())
+
+    assert periodic.runs >= 3
+    assert periodic.total_us >= 200 * periodic.runs
+    assert event.runs == 2
+    assert _states(sup) == {"periodic": "cancelled", "event": "cancelled"}
+
+
+def test_restart_on_exception():
+    count = [0]
+
+    async def flaky():
+        count[0] += 1
+        if count[0] < 3:
+            raise RuntimeError("boom")
+
+        await asyncio.sleep(10)
+
+    sup = common.supervisor.Supervisor()
+    job = sup.add_task("flaky", flaky)
+    asyncio.run(_run(sup, 0.05))
+
+    assert job.restarts == 2
+    assert count[0] == 3
+
+
+def test_restart_delay_resets_after_stable_run(monkeypatch):
+    monkeypatch.setattr(common.supervisor, "_RESTART_MAX_MS", 64)
+    monkeypatch.setattr(common.supervisor, "_RESTART_STABLE_MS", 5)
+
+    delays = []
+    sleep_ms = asyncio.sleep_ms
+
+    def record_sleep_ms(ms):
+        delays.append(ms)
+        return sleep_ms(ms)
+
+    monkeypatch.setattr(asyncio, "sleep_ms", record_sleep_ms)
+
+    count = [0]
+
+    async def flaky():
+        count[0] += 1
+
+        # 第 3 次執行一段時間後才失敗
+        if count[0] == 3:
+            await asyncio.sleep(0.01)
+
+        if count[0] < 5:
+            raise RuntimeError("boom")
+
+        await asyncio.sleep(10)
+
+    sup = common.supervisor.Supervisor()
+    job = sup.add_task("flaky", flaky)
+    asyncio.run(_run(sup, 0.1))
+
+    assert job.restarts == 4
+    assert delays == [1, 2, 1, 2]
+
+
+def test_failed_job_is_not_restarted():
+    def fail():
+        raise RuntimeError("boom")
+
+    sup = common.supervisor.Supervisor()
+    job = sup.add_periodic("fail", fail, 1, restart=False)
+    asyncio.run(_run(sup, 0.02))
+
+    assert job.restarts == 0
+    assert _states(sup) == {"fail": "failed"}
+
+
+def test_cancel():
+    sup = common.supervisor.Supervisor()
+    sup.add_task("sleep", lambda: asyncio.sleep(10))
+    sup.add_periodic("tick", lambda: None, 1)
+
+    results = []
+    asyncio.run(
+        _run(
+            sup,
+            0.02,
+            lambda: results.extend((sup.cancel("tick"), sup.cancel("unknown"))),
+        )
+    )
+
+    assert results == [True, False]
+    assert _states(sup) == {"sleep": "cancelled", "tick": "cancelled"}
+
+
+def test_job_added_after_start():
+    sup = common.supervisor.Supervisor()
+    calls = []
+
+    async def main():
+        task = asyncio.create_task(sup.run())
+        await asyncio.sleep(0)
+        sup.add_periodic("late", lambda: calls.append(1), 1)
+        await asyncio.sleep(0.01)
+        sup.stop()
+        await asyncio.sleep(0.01)
+        assert task.done()
+
+    asyncio.run(main())
+    assert calls
+
+
+def test_dump(capsys):
+    sup = common.supervisor.Supervisor()
+    sup.add_periodic("gc", lambda: None, 1)
+    asyncio.run(_run(sup, 0.01))
+
+    sup.dump()
+    line = capsys.readouterr().out.strip()
+    assert line.startswith("#T gc cancelled runs ")
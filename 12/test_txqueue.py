@@ -0,0 +1,190 @@
+import asyncio
+import errno
+
+import bluetooth
+
+import ble.stack
+import ble.txqueue
+import common.supervisor
+
+
+_CONN = 0
+_HANDLE = 16
+
+
+def _sent():
+    log = bluetooth.BLE().log
+    result = [e for e in log if e[0] in ("notify", "indicate")]
+    log.clear()
+    return result
+
+
+def _queue(slots: int = 4) -> ble.txqueue.TxQueue:
+    _sent()
+    q = ble.txqueue.TxQueue(slots, 8)
+    q.conn_handle = _CONN
+    return q
+
+
+async def _run_until_empty(q: ble.txqueue.TxQueue):
+    task = asyncio.create_task(q.run())
+    for _ in range(100):
+        await asyncio.sleep(0)
+        if not len(q):
+            break
+
+    task.cancel()
+
+
+def test_rejects_when_full_or_too_long():
+    q = _queue(2)
+
+    assert not q.notify(_HANDLE, bytes(9))
+    assert q.notify(_HANDLE, b"\x01")
+    assert q.notify(_HANDLE, b"\x02")
+    assert not q.notify(_HANDLE, b"\x03")
+    assert q.rejected == 2
+
+    q.conn_handle = None
+    assert not q.notify(_HANDLE, b"\x04")
+
+
+def test_sends_in_order():
+    q = _queue()
+    data = bytearray(b"\x01")
+    q.notify(_HANDLE, data)
+
+    # 放入佇列時已複製資料
+    data[0] = 0x02
+    q.notify(_HANDLE, data)
+
+    asyncio.run(_run_until_empty(q))
+
+    assert _sent() == [
+        ("notify", _CONN, _HANDLE, b"\x01"),
+        ("notify", _CONN, _HANDLE, b"\x02"),
+    ]
+    assert q.latency.count == 2
+
+
+def test_indication_waits_for_confirm():
+    async def main():
+        q = _queue()
+        q.indicate(_HANDLE, b"\x01")
+        q.indicate(_HANDLE, b"\x02")
+
+        task = asyncio.create_task(q.run())
+        await asyncio.sleep(0.01)
+        assert _sent() == [("indicate", _CONN, _HANDLE, b"\x01")]
+
+        q._on_indicate_done(0)
+        await asyncio.sleep(0.01)
+        assert _sent() == [("indicate", _CONN, _HANDLE, b"\x02")]
+
+        task.cancel()
+        assert q.confirm_rtt.count == 1
+
+    asyncio.run(main())
+
+
+def test_retries_on_enomem(monkeypatch):
+    stub = bluetooth.BLE()
+    fails = [2]
+    notify = type(stub).gatts_notify
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        if fails[0]:
+            fails[0] -= 1
+            raise OSError(errno.ENOMEM)
+
+        notify(self, conn_handle, value_handle, data)
+
+    monkeypatch.setattr(type(stub), "gatts_notify", gatts_notify)
+
+    async def main():
+        q = _queue()
+        q.notify(_HANDLE, b"\x01")
+
+        task = asyncio.create_task(q.run())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        return q
+
+    q = asyncio.run(main())
+
+    assert q.retries == 2
+    assert _sent() == [("notify", _CONN, _HANDLE, b"\x01")]
+
+
+def test_drops_pdu_on_other_errors(monkeypatch):
+    stub = bluetooth.BLE()
+    notify = type(stub).gatts_notify
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        if data == b"\x01":
+            raise OSError(errno.ENOTCONN)
+
+        notify(self, conn_handle, value_handle, data)
+
+    monkeypatch.setattr(type(stub), "gatts_notify", gatts_notify)
+
+    async def main():
+        q = _queue()
+        q.notify(_HANDLE, b"\x01")
+        q.notify(_HANDLE, b"\x02")
+
+        # 送出失敗不會結束 run()，之後的資料照常送出
+        await _run_until_empty(q)
+        return q
+
+    q = asyncio.run(main())
+
+    assert q.dropped == 1
+    assert q.retries == 0
+    assert _sent() == [("notify", _CONN, _HANDLE, b"\x02")]
+
+
+def test_start_adds_supervised_tasks(monkeypatch):
+    monkeypatch.setattr(ble.txqueue, "_queues", [])
+    monkeypatch.setattr(ble.stack, "register_irq_handler", lambda *args: None)
+    sup = common.supervisor.Supervisor()
+
+    ble.txqueue.start(sup, max_connections=2)
+
+    assert [job.name for job in sup._jobs.values()] == ["tx0", "tx1"]
+    assert len(ble.txqueue._queues) == 2
+
+
+def test_put_waits_for_space():
+    async def main():
+        q = _queue(1)
+        q.notify(_HANDLE, b"\x01")
+
+        put = asyncio.create_task(q.put_notify(_HANDLE, b"\x02"))
+        await asyncio.sleep(0)
+        assert not put.done()
+
+        await _run_until_empty(q)
+        assert await put
+
+        await _run_until_empty(q)
+
+    asyncio.run(main())
+
+    assert [e[3] for e in _sent()] == [b"\x01", b"\x02"]
+
+
+def test_disconnect_drops_queued():
+    q = _queue()
+    q.notify(_HANDLE, b"\x01")
+    q.notify(_HANDLE, b"\x02")
+
+    ble.txqueue._queues.append(q)
+    try:
+        ble.txqueue._isr_txqueue(2, (_CONN, 0, b""))
+    finally:
+        ble.txqueue._queues.remove(q)
+
+    assert q.conn_handle is None
+    assert len(q) == 0
+    assert q.dropped == 2
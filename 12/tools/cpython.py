@@ -0,0 +1,70 @@
+"""讓專案的模組可在 CPython 上匯入執行，只供主機端工具使用。
+
+install() 將 tools/stubs 加入 sys.path，並在 time、gc 及 asyncio 補上
+MicroPython 特有的函數。在 MicroPython 上呼叫時不做任何事。"""
+
+import asyncio
+import gc
+import os
+import sys
+import time
+
+
+STUBS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs")
+
+# MicroPython 的 ticks 為 30 位元，會循環
+_TICKS_PERIOD = 1 << 30
+_TICKS_HALF_PERIOD = _TICKS_PERIOD >> 1
+
+
+class _ThreadSafeFlag(asyncio.Event):
+    async def wait(self):
+        # 與 MicroPython 相同，等到後自動清除
+        await super().wait()
+        self.clear()
+
+
+def _ticks_us() -> int:
+    return (time.perf_counter_ns() // 1000) % _TICKS_PERIOD
+
+
+def _ticks_ms() -> int:
+    return (time.perf_counter_ns() // 1_000_000) % _TICKS_PERIOD
+
+
+def _ticks_diff(a: int, b: int) -> int:
+    return ((a - b + _TICKS_HALF_PERIOD) % _TICKS_PERIOD) - _TICKS_HALF_PERIOD
+
+
+def _ticks_add(a: int, b: int) -> int:
+    return (a + b) % _TICKS_PERIOD
+
+
+async def _sleep_ms(ms: int):
+    await asyncio.sleep(ms / 1000)
+
+
+async def _wait_for_ms(aw, ms: int):
+    return await asyncio.wait_for(aw, ms / 1000)
+
+
+def install():
+    if sys.implementation.name == "micropython":
+        return
+
+    if STUBS_PATH not in sys.path:
+        sys.path.insert(0, STUBS_PATH)
+
+    time.ticks_us = _ticks_us
+    time.ticks_ms = _ticks_ms
+    time.ticks_diff = _ticks_diff
+    time.ticks_add = _ticks_add
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+
+    # CPython 沒有 heap 大小的概念，記憶體用量請改用 tracemalloc
+    gc.mem_free = lambda: 0
+    gc.mem_alloc = lambda: 0
+
+    asyncio.ThreadSafeFlag = _ThreadSafeFlag
+    asyncio.sleep_ms = _sleep_ms
+    asyncio.wait_for_ms = _wait_for_ms
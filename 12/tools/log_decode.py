@@ -0,0 +1,100 @@
+"""將 common.logger.flush() 輸出的二進位 log 還原為文字。
+
+用法：python -m tools.log_decode serial.txt
+      其他程式的輸出行會原樣保留。
+
+#A 行為 RTC 錨點：time.ticks_us() 及 machine.RTC().datetime()
+#L 行為記錄：訊息 ID、time.ticks_us()、3 個整數參數
+#D 行為丟棄的記錄數
+"""
+
+import datetime
+import os
+import re
+import sys
+
+
+# MicroPython 的 ticks_us() 為 30 位元，會循環
+_TICKS_PERIOD = 1 << 30
+
+_LOGMSG_PATH = os.path.join(os.path.dirname(__file__), "..", "common", "logmsg.py")
+
+_MSG_PATTERN = re.compile(
+    r"^(\w+)\s*=\s*micropython\.const\((\d+)\)\s*#\s*(.*)$", re.MULTILINE
+)
+
+
+def load_messages(path: str = _LOGMSG_PATH) -> dict[int, tuple[str, str]]:
+    """從 common/logmsg.py 讀取訊息 ID 對應的名稱及文字格式"""
+
+    with open(path, encoding="utf-8") as fp:
+        source = fp.read()
+
+    return {int(m[2]): (m[1], m[3].strip()) for m in _MSG_PATTERN.finditer(source)}
+
+
+class Decoder:
+    def __init__(self, messages: dict[int, tuple[str, str]]):
+        self._messages = messages
+        self._anchor_time: datetime.datetime | None = None
+        self._last_ticks = 0
+        self._elapsed_us = 0
+
+    def decode_line(self, line: str) -> str | None:
+        """返回還原後的文字，錨點行返回 None"""
+
+        fields = line.split()
+
+        if not fields or fields[0] not in ("#A", "#L", "#D"):
+            return line
+
+        if fields[0] == "#A":
+            ticks = int(fields[1])
+            year, month, day, _, hour, minute, second, us = map(int, fields[2:10])
+            self._anchor_time = datetime.datetime(
+                year, month, day, hour, minute, second, us
+            )
+            self._last_ticks = ticks
+            self._elapsed_us = 0
+            return None
+
+        if fields[0] == "#D":
+            return f"({fields[1]} log records dropped)"
+
+        msg_id, ticks, a, b, c = map(int, fields[1:6])
+
+        # 以前一筆記錄或錨點為基準展開循環的 ticks。
+        # 錨點於 flush() 時才輸出，所以緊接其後的記錄可能早於錨點
+        half = _TICKS_PERIOD // 2
+        self._elapsed_us += (ticks - self._last_ticks + half) % _TICKS_PERIOD - half
+        self._last_ticks = ticks
+
+        _, fmt = self._messages.get(msg_id, (None, "Unknown message {3}: {0} {1} {2}"))
+        text = fmt.format(a, b, c, msg_id, a & 0xFFFF, (a >> 16) & 0xFFFF)
+
+        if self._anchor_time is None:
+            return f"[{ticks} us]  {text}"
+
+        t = self._anchor_time + datetime.timedelta(microseconds=self._elapsed_us)
+        return f"{t:%Y-%m-%d %H:%M:%S.%f}  {text}"
+
+
+def _decode_stream(decoder: Decoder, fp):
+    for line in fp:
+        text = decoder.decode_line(line.rstrip("\n"))
+        if text is not None:
+            print(text)
+
+
+def main(argv: list[str]):
+    decoder = Decoder(load_messages())
+
+    if len(argv) > 1:
+        with open(argv[1], encoding="utf-8", errors="replace") as fp:
+            _decode_stream(decoder, fp)
+    else:
+        _decode_stream(decoder, sys.stdin)
+
+
+if __name__ == "__main__":
+    main(sys.argv)
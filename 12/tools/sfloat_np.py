@@ -0,0 +1,178 @@
+"""主機端（CPython）使用的 IEEE-11073 SFLOAT/FLOAT 向量化編解碼，需要 NumPy。
+
+結果與裝置端的 common.sfloat 相同，用來解析 log 及歷史資料中大量的數值。
+特殊值（NaN、NRes、±INF）預設會轉為 float 的 nan 及 ±inf；
+specials=False 時則與 common.sfloat.sfloat_to_float 一樣，當成一般數值。
+
+執行 python -m tools.sfloat_np 可比對全部 65536 個 SFLOAT 值。
+"""
+
+import numpy as np
+
+
+class _Format:
+    def __init__(self, mantissa_bits: int, exponent_bits: int):
+        self.mantissa_bits = mantissa_bits
+        self.mantissa_mask = (1 << mantissa_bits) - 1
+        self.exponent_mask = (1 << exponent_bits) - 1
+        self.exponent_sign = 1 << (exponent_bits - 1)
+
+        self.max_mantissa = (1 << (mantissa_bits - 1)) - 1
+        self.min_mantissa = 1 << (mantissa_bits - 1)
+        self.min_special_mantissa = self.max_mantissa - 1
+        self.max_exponent = (1 << (exponent_bits - 1)) - 1
+        self.min_exponent = -(1 << (exponent_bits - 1))
+
+        self.nan = self.max_mantissa
+        self.nres = self.min_mantissa
+        self.pos_infinity = self.max_mantissa - 1
+        self.neg_infinity = self.min_mantissa + 2
+
+        # 與 common.sfloat.sfloat_to_float 的 10**exponent 相同
+        self.pow10 = np.array(
+            [10**e for e in range(self.min_exponent, self.max_exponent + 1)],
+            dtype=np.float64,
+        )
+
+
+SFLOAT = _Format(12, 4)
+FLOAT = _Format(24, 8)
+
+
+def _decode(fmt: _Format, codes, specials: bool) -> np.ndarray:
+    codes = np.asarray(codes, dtype=np.int64)
+
+    raw = codes & fmt.mantissa_mask
+    mantissa = raw - ((raw & fmt.min_mantissa) << 1)
+
+    exponent = (codes >> fmt.mantissa_bits) & fmt.exponent_mask
+    exponent = exponent - ((exponent & fmt.exponent_sign) << 1)
+
+    result = mantissa * fmt.pow10[exponent - fmt.min_exponent]
+
+    if specials:
+        is_special = (exponent == 0) & (raw >= fmt.min_special_mantissa)
+        is_special &= raw <= fmt.neg_infinity
+        result = np.where(is_special, np.nan, result)
+        result = np.where(is_special & (raw == fmt.pos_infinity), np.inf, result)
+        result = np.where(is_special & (raw == fmt.neg_infinity), -np.inf, result)
+
+    return result
+
+
+def _encode(fmt: _Format, values) -> np.ndarray:
+    """逐步對應 common.sfloat.float_to_sfloat 的運算，以得到相同的結果"""
+
+    values = np.asarray(values, dtype=np.float64)
+
+    is_negative = values < 0
+    value = np.abs(values)
+    mantissa_max = np.where(is_negative, fmt.min_mantissa, fmt.max_mantissa)
+    exponent = np.zeros(values.shape, dtype=np.int64)
+
+    is_nan = np.isnan(values)
+    is_inf = np.isinf(values)
+    is_finite = ~(is_nan | is_inf)
+    value = np.where(is_finite, value, 0.0)
+
+    # 放大數值，好儘量保存小數部分
+    active = is_finite.copy()
+    for _ in range(-fmt.min_exponent):
+        scale_up = value * 10
+        active &= (np.floor(value) != value) & (scale_up <= mantissa_max)
+        active &= exponent > fmt.min_exponent
+        if not active.any():
+            break
+
+        value = np.where(active, scale_up, value)
+        exponent -= active
+
+    # 縮小數值，好讓數值不超出規範
+    while True:
+        active = (value > mantissa_max) & (exponent < fmt.max_exponent)
+        if not active.any():
+            break
+
+        value = np.where(active, value / 10, value)
+        exponent += active
+
+    # 超出 int64 的數值，最後必為 NRes
+    is_too_large = value >= 2.0**62
+    mantissa = np.floor(np.where(is_too_large, 0.0, value) + 0.5).astype(np.int64)
+
+    # 處理特殊值
+    active = (exponent == 0) & (mantissa >= fmt.min_special_mantissa)
+    exponent += active
+    mantissa = np.where(active, (mantissa + 5) // 10, mantissa)
+
+    # 縮小數值，以儲存最少的 mantissa
+    while True:
+        active = (mantissa % 10 == 0) & (exponent < fmt.max_exponent)
+        if not active.any():
+            break
+
+        mantissa = np.where(active, mantissa // 10, mantissa)
+        exponent += active
+
+    mantissa = np.where(is_negative, -mantissa, mantissa)
+    result = ((exponent & fmt.exponent_mask) << fmt.mantissa_bits) | (
+        mantissa & fmt.mantissa_mask
+    )
+
+    is_nres = is_finite & ((np.abs(mantissa) > mantissa_max) | is_too_large)
+    result = np.where(is_nres, fmt.nres, result)
+    result = np.where(values == 0, 0, result)
+    result = np.where(is_nan, fmt.nan, result)
+    result = np.where(is_inf & ~is_negative, fmt.pos_infinity, result)
+    result = np.where(is_inf & is_negative, fmt.neg_infinity, result)
+
+    return result
+
+
+def sfloat_to_float(codes, specials: bool = True) -> np.ndarray:
+    """將 16 位元的 SFLOAT 陣列轉為 float64 陣列"""
+    return _decode(SFLOAT, codes, specials)
+
+
+def float_to_sfloat(values) -> np.ndarray:
+    """將 float 陣列轉為 16 位元的 SFLOAT 陣列，
+    NaN 及 ±INF 會轉為對應的特殊值"""
+    return _encode(SFLOAT, values).astype(np.uint16)
+
+
+def float32_to_float(codes, specials: bool = True) -> np.ndarray:
+    """將 32 位元的 FLOAT 陣列轉為 float64 陣列"""
+    return _decode(FLOAT, codes, specials)
+
+
+def float_to_float32(values) -> np.ndarray:
+    """將 float 陣列轉為 32 位元的 FLOAT 陣列，
+    NaN 及 ±INF 會轉為對應的特殊值"""
+    return _encode(FLOAT, values).astype(np.uint32)
+
+
+def _check_all_sfloat():
+    import sys
+
+    try:
+        import micropython  # noqa: F401
+    except ImportError:
+        sys.path.insert(0, __file__.rsplit("/", 1)[0] + "/stubs")
+
+    import common.sfloat
+
+    codes = np.arange(0x10000)
+
+    decoded = sfloat_to_float(codes, specials=False)
+    expected = np.array([common.sfloat.sfloat_to_float(c) for c in range(0x10000)])
+    assert np.array_equal(decoded, expected), "sfloat_to_float"
+
+    encoded = float_to_sfloat(decoded)
+    expected = np.array([common.sfloat.float_to_sfloat(v) for v in expected])
+    assert np.array_equal(encoded, expected), "float_to_sfloat"
+
+    print("All 65536 SFLOAT codes match common.sfloat")
+
+
+if __name__ == "__main__":
+    _check_all_sfloat()
@@ -0,0 +1,74 @@
+"""在 CPython 或沒有藍芽的 unix port 上代替 bluetooth 模組，只供主機端工具使用。
+
+不會真的收發資料，送出的 notification / indication 及廣播記錄在 BLE().log，
+gatts_write() 寫入的值存於 BLE().values。"""
+
+
+class UUID:
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return f"UUID({self.value!r})"
+
+
+class BLE:
+    _instance = None
+
+    def __new__(cls):
+        # 與 MicroPython 相同，BLE() 都是同一個物件
+        if cls._instance is None:
+            obj = super().__new__(cls)
+            obj.log = []
+            obj.values = {}
+            obj._handler = None
+            cls._instance = obj
+
+        return cls._instance
+
+    def irq(self, handler):
+        self._handler = handler
+
+    def active(self, *args):
+        return True
+
+    def config(self, *args, **kwargs):
+        if args == ("mac",):
+            return (0, b"\x01\x02\x03\x04\x05\x06")
+
+        if args == ("mtu",):
+            return 23
+
+    def gatts_register_services(self, services):
+        # 每個 characteristic 佔用宣告及數值兩個 handle
+        handle = 1
+        result = []
+
+        for service in services:
+            handles = []
+            for _ in service[1]:
+                handle += 1
+                handles.append(handle)
+                handle += 1
+
+            result.append(tuple(handles))
+
+        return tuple(result)
+
+    def gap_advertise(self, *args, **kwargs):
+        self.log.append(("advertise", args))
+
+    def gap_passkey(self, *args):
+        pass
+
+    def gatts_write(self, value_handle, data, send_update=False):
+        self.values[value_handle] = bytes(data)
+
+    def gatts_read(self, value_handle):
+        return self.values.get(value_handle, b"")
+
+    def gatts_notify(self, conn_handle, value_handle, data=None):
+        self.log.append(("notify", conn_handle, value_handle, data and bytes(data)))
+
+    def gatts_indicate(self, conn_handle, value_handle, data=None):
+        self.log.append(("indicate", conn_handle, value_handle, data and bytes(data)))
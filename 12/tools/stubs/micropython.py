@@ -0,0 +1,25 @@
+"""在 CPython 上代替 MicroPython 的 micropython 模組，只供主機端工具使用"""
+
+
+def const(value):
+    return value
+
+
+def native(func):
+    return func
+
+
+def viper(func):
+    return func
+
+
+def schedule(func, arg):
+    func(arg)
+
+
+def mem_info(verbose=False):
+    pass
+
+
+def alloc_emergency_exception_buf(size):
+    pass